@@ -9,5 +9,8 @@ from .collector import (
     CollectedItem,
     CollectionStats
 )
+from .sinks import ItemSink, ListSink, JSONLSink
+from .checkpoint import CheckpointStore
+from .dedup import NearDuplicateIndex
 
 __version__ = "0.1.0"
\ No newline at end of file
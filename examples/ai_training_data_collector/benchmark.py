@@ -0,0 +1,128 @@
+"""
+Throughput benchmark for DataCollector against a local stub Firecrawl server
+
+The stub server answers batch scrape requests after a fixed overhead plus a
+per-URL delay, so the benchmark shows how much of the network wait the
+pipelined async mode hides compared to sequential batches.
+
+Usage:
+    python benchmark.py --urls 300 --overhead 0.2 --per-url 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from collector import DataCollector
+
+class StubFirecrawlHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/batch/scrape with synthetic extraction results"""
+
+    overhead = 0.2
+    per_url = 0.01
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        urls = body["urls"]
+        time.sleep(self.overhead + self.per_url * len(urls))
+
+        rng = random.Random(len(urls))
+        data = [
+            {
+                "metadata": {"sourceURL": url},
+                "extract": {
+                    "content": f"Article text for {url}. " * 20,
+                    "title": f"Article {url}",
+                    "author": "Stub Author",
+                    "quality_metrics": {
+                        "coherence": rng.uniform(0.5, 1.0),
+                        "relevance": rng.uniform(0.5, 1.0),
+                        "toxicity": rng.uniform(0.0, 0.4)
+                    }
+                }
+            }
+            for url in urls
+        ]
+        payload = json.dumps({"success": True, "data": data}).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubFirecrawlClient:
+    """Minimal client exposing the batch_scrape call used by DataCollector"""
+
+    def __init__(self, api_url: str):
+        self.api_url = api_url
+
+    def batch_scrape(self, urls, params=None):
+        request = urllib.request.Request(
+            f"{self.api_url}/v1/batch/scrape",
+            data=json.dumps({"urls": urls, **(params or {})}).encode("utf-8"),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+def make_collector(api_url: str) -> DataCollector:
+    collector = DataCollector(api_key="stub")
+    collector.app = StubFirecrawlClient(api_url)
+    return collector
+
+def report(name: str, urls: int, elapsed: float, result: dict):
+    stats = result["stats"]
+    print(
+        f"{name:<28} {elapsed:6.2f}s  {urls / elapsed:8.1f} URLs/sec  "
+        f"processed={stats['total_processed']} passed={stats['passed_safety']} "
+        f"quality p50/p90/p99={'/'.join(str(v) for v in stats['quality_percentiles'].values())}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="DataCollector throughput benchmark")
+    parser.add_argument("--urls", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--in-flight", type=int, default=4)
+    parser.add_argument("--overhead", type=float, default=0.2, help="Seconds per batch request")
+    parser.add_argument("--per-url", type=float, default=0.01, help="Seconds per URL in a batch")
+    args = parser.parse_args()
+
+    StubFirecrawlHandler.overhead = args.overhead
+    StubFirecrawlHandler.per_url = args.per_url
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubFirecrawlHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    urls = [f"https://example.com/article/{i}" for i in range(args.urls)]
+
+    try:
+        start = time.perf_counter()
+        result = make_collector(api_url).collect_from_urls(urls, batch_size=args.batch_size)
+        report("sequential", len(urls), time.perf_counter() - start, result)
+
+        start = time.perf_counter()
+        result = asyncio.run(make_collector(api_url).collect_from_urls_async(
+            urls, batch_size=args.batch_size, max_in_flight=args.in_flight, adaptive=False
+        ))
+        report(f"async, {args.in_flight} in flight", len(urls), time.perf_counter() - start, result)
+
+        start = time.perf_counter()
+        result = asyncio.run(make_collector(api_url).collect_from_urls_async(
+            urls, batch_size=args.batch_size, max_in_flight=args.in_flight,
+            adaptive=True, target_batch_seconds=1.0
+        ))
+        report(f"async adaptive, {args.in_flight} in flight", len(urls), time.perf_counter() - start, result)
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Durable checkpoints for long collection runs
+
+Completed URLs, failed URLs and the running CollectionStats are stored in a
+SQLite database, so a restarted run can skip finished work. A Bloom filter
+in front of the on-disk URL index answers most "not done yet" lookups
+without touching the disk.
+"""
+
+import hashlib
+import json
+import math
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+class CheckpointStore:
+    """Checkpoint log of completed URLs, failed URLs and collection stats"""
+
+    def __init__(self, path: str, expected_urls: int = 1_000_000, error_rate: float = 0.01):
+        """
+        Args:
+            path: SQLite database file for the checkpoint
+            expected_urls: Number of URLs the Bloom filter is sized for
+            error_rate: Target Bloom filter false positive rate
+        """
+        self.path = path
+        # Async collection writes checkpoints from a worker thread, one at a time
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS completed (url TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS failed (
+                url TEXT PRIMARY KEY,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB) WITHOUT ROWID;
+            """
+        )
+        self._conn.commit()
+        self.bloom = self._load_bloom(expected_urls, error_rate)
+
+    def _load_bloom(self, expected_urls: int, error_rate: float) -> BloomFilter:
+        """Reuse the Bloom filter saved on close, or rebuild it from the URL index"""
+        completed = self._conn.execute("SELECT COUNT(*) FROM completed").fetchone()[0]
+        bloom = BloomFilter(max(expected_urls, completed * 2), error_rate)
+
+        saved = self._get_state("bloom")
+        if saved is not None:
+            header = json.loads(self._get_state("bloom_header"))
+            if header["count"] == completed and header["num_bits"] == bloom.num_bits \
+                    and header["num_hashes"] == bloom.num_hashes:
+                bloom.bits = bytearray(saved)
+                return bloom
+
+        for (url,) in self._conn.execute("SELECT url FROM completed"):
+            bloom.add(url)
+        return bloom
+
+    def _get_state(self, key: str) -> Optional[bytes]:
+        row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value):
+        self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def is_done(self, url: str) -> bool:
+        """Whether URL was completed by this or an earlier run"""
+        if url not in self.bloom:
+            return False
+        return self._conn.execute("SELECT 1 FROM completed WHERE url = ?", (url,)).fetchone() is not None
+
+    def pending(self, urls: Iterable[str], chunk_size: int = 500) -> List[str]:
+        """URLs not yet completed, in their original order"""
+        result = []
+        candidates = []
+
+        def resolve():
+            placeholders = ",".join("?" * len(candidates))
+            done = {
+                url for (url,) in self._conn.execute(
+                    f"SELECT url FROM completed WHERE url IN ({placeholders})", candidates
+                )
+            }
+            result.extend(url for url in candidates if url not in done)
+            candidates.clear()
+
+        for url in urls:
+            if url not in self.bloom:
+                # Definitely not done; keep order by resolving earlier candidates first
+                if candidates:
+                    resolve()
+                result.append(url)
+            else:
+                candidates.append(url)
+                if len(candidates) >= chunk_size:
+                    resolve()
+        if candidates:
+            resolve()
+        return result
+
+    def mark_done(self, urls: List[str], stats: Optional[Dict] = None, histograms: Optional[bytes] = None):
+        """Durably record completed URLs together with the current stats and, if given, score histograms"""
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO completed (url) VALUES (?)", ((u,) for u in urls))
+            self._conn.executemany("DELETE FROM failed WHERE url = ?", ((u,) for u in urls))
+            if stats is not None:
+                self._set_state("stats", json.dumps(stats))
+            if histograms is not None:
+                self._set_state("histograms", histograms)
+        for url in urls:
+            self.bloom.add(url)
+
+    def mark_failed(self, urls: List[str], error: str, attempts: int):
+        """Record URLs of a batch that failed after all retries"""
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO failed (url, attempts, last_error, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET attempts = attempts + excluded.attempts, "
+                "last_error = excluded.last_error, updated_at = excluded.updated_at",
+                ((url, attempts, error, now) for url in urls)
+            )
+
+    def failed_urls(self) -> List[str]:
+        """URLs whose last batch failed"""
+        return [url for (url,) in self._conn.execute("SELECT url FROM failed ORDER BY updated_at")]
+
+    def load_stats(self) -> Optional[Dict]:
+        """Stats saved with the last completed batch"""
+        saved = self._get_state("stats")
+        return json.loads(saved) if saved else None
+
+    def load_histograms(self) -> Optional[bytes]:
+        """Score histograms saved with the last completed batch"""
+        return self._get_state("histograms")
+
+    def close(self):
+        """Save the Bloom filter for a fast restart and close the database"""
+        completed = self._conn.execute("SELECT COUNT(*) FROM completed").fetchone()[0]
+        with self._conn:
+            self._set_state("bloom", bytes(self.bloom.bits))
+            self._set_state("bloom_header", json.dumps({
+                "count": completed,
+                "num_bits": self.bloom.num_bits,
+                "num_hashes": self.bloom.num_hashes
+            }))
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
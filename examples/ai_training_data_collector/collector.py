@@ -5,16 +5,30 @@ This module demonstrates how to safely collect and validate training data
 using Firecrawl's batch processing capabilities.
 """
 
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from uuid import uuid4
 
+import numpy as np
 from dotenv import load_dotenv
 from firecrawl import FirecrawlApp
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from tqdm import tqdm
 
+try:
+    from .checkpoint import CheckpointStore
+    from .dedup import NearDuplicateIndex
+    from .sinks import ItemSink, ListSink
+except ImportError:
+    # Running as a script rather than as part of the package
+    from checkpoint import CheckpointStore
+    from dedup import NearDuplicateIndex
+    from sinks import ItemSink, ListSink
+
 # Load environment variables
 load_dotenv()
 
@@ -37,12 +51,58 @@ class CollectedItem(BaseModel):
     metadata: Dict
     quality_metrics: QualityMetrics
 
+HISTOGRAM_BINS = 100
+PERCENTILES = (50, 90, 99)
+
+def _histogram_percentiles(histogram: np.ndarray) -> Dict[str, float]:
+    """Percentiles interpolated within the bins of a histogram over [0, 1]"""
+    counts = histogram.astype(np.float64)
+    total = counts.sum()
+    if not total:
+        return {}
+    cumulative = np.cumsum(counts)
+    width = 1 / len(counts)
+    percentiles = {}
+    for p in PERCENTILES:
+        rank = total * p / 100
+        index = int(np.searchsorted(cumulative, rank))
+        below = cumulative[index - 1] if index else 0.0
+        fraction = (rank - below) / counts[index]
+        percentiles[f"p{p}"] = round(float((index + fraction) * width), 4)
+    return percentiles
+
 class CollectionStats(BaseModel):
     """Statistics about the collection process"""
     total_processed: int = 0
     passed_safety: int = 0
     failed_safety: int = 0
+    duplicates_dropped: int = 0
     average_quality: float = 0.0
+    # Distributions over every item that had quality metrics, passing or not
+    quality_percentiles: Dict[str, float] = Field(default_factory=dict)
+    toxicity_percentiles: Dict[str, float] = Field(default_factory=dict)
+    # Quality and toxicity counts per bin; kept out of model_dump() and
+    # checkpointed alongside it with histograms()
+    _histograms: np.ndarray = PrivateAttr(default_factory=lambda: np.zeros((2, HISTOGRAM_BINS), dtype=np.int64))
+
+    def record_quality(self, score: float):
+        """Add the quality score of a written item, already counted in passed_safety, to the average"""
+        self.average_quality += (score - self.average_quality) / self.passed_safety
+
+    def record_distribution(self, quality: np.ndarray, toxicity: np.ndarray):
+        """Update the score histograms and their percentiles"""
+        for histogram, values in zip(self._histograms, (quality, toxicity)):
+            bins = np.clip((values * HISTOGRAM_BINS).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+            histogram += np.bincount(bins, minlength=HISTOGRAM_BINS)
+        self.quality_percentiles = _histogram_percentiles(self._histograms[0])
+        self.toxicity_percentiles = _histogram_percentiles(self._histograms[1])
+
+    def histograms(self) -> bytes:
+        """Histogram counts in the form restore_histograms() takes"""
+        return self._histograms.tobytes()
+
+    def restore_histograms(self, data: bytes):
+        self._histograms = np.frombuffer(data, dtype=np.int64).reshape(2, HISTOGRAM_BINS).copy()
 
 class DataCollector:
     """Main collector class for gathering AI training data"""
@@ -50,9 +110,15 @@ class DataCollector:
     def __init__(
         self,
         safety_config: Optional[SafetyConfig] = None,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        deduplicator: Optional[NearDuplicateIndex] = None
     ):
         self.safety_config = safety_config or SafetyConfig()
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.deduplicator = deduplicator
         self.app = FirecrawlApp(api_key=api_key or os.getenv("FIRECRAWL_API_KEY"))
         self.stats = CollectionStats()
 
@@ -76,102 +142,306 @@ class DataCollector:
             "required": self.safety_config.required_attributes
         }
 
+    def _score_batch(self, items: List[dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score a batch of extracted items against the safety thresholds
+
+        Returns:
+            Quality scores, toxicity scores, a mask of items that have quality
+            metrics and a mask of items that pass
+        """
+        metrics = [item.get("quality_metrics") or {} for item in items]
+        count = len(metrics)
+
+        # One column per metric; the per-item Python work is just the dict lookups
+        has_metrics = np.fromiter([bool(m) for m in metrics], dtype=bool, count=count)
+        coherence = np.fromiter([m.get("coherence", 0) for m in metrics], dtype=np.float64, count=count)
+        relevance = np.fromiter([m.get("relevance", 0) for m in metrics], dtype=np.float64, count=count)
+        toxicity = np.fromiter([m.get("toxicity", 1) for m in metrics], dtype=np.float64, count=count)
+
+        quality = (coherence + relevance) / 2
+        passed = (
+            has_metrics
+            & (quality >= self.safety_config.min_quality_score)
+            & (toxicity <= self.safety_config.max_toxicity)
+        )
+        return quality, toxicity, has_metrics, passed
+
     def _passes_safety_checks(self, item: dict) -> bool:
         """Check if an item passes safety and quality thresholds"""
-        metrics = item.get("quality_metrics", {})
-        
-        if not metrics:
-            return False
-            
-        # Check quality thresholds
-        quality_score = (
-            metrics.get("coherence", 0) +
-            metrics.get("relevance", 0)
-        ) / 2
-        
-        if quality_score < self.safety_config.min_quality_score:
-            return False
-            
-        if metrics.get("toxicity", 1) > self.safety_config.max_toxicity:
+        return bool(self._score_batch([item])[3][0])
+
+    def _scrape_batch(self, batch_urls: List[str], schema: dict) -> dict:
+        """Batch scrape URLs with extraction"""
+        return self.app.batch_scrape(
+            urls=batch_urls,
+            params={
+                "extract": {"schema": schema}
+            }
+        )
+
+    def _scrape_batch_with_retry(self, batch_urls: List[str], schema: dict) -> Tuple[dict, int]:
+        """
+        Batch scrape, retrying failures with exponential backoff
+
+        Returns:
+            The batch results and the number of attempts it took
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._scrape_batch(batch_urls, schema), attempt + 1
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                print(f"Batch failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _resume(self, urls: List[str], checkpoint: Optional[CheckpointStore]) -> List[str]:
+        """Restore stats from a checkpoint and drop URLs that are already done"""
+        if checkpoint is None:
+            return urls
+        saved_stats = checkpoint.load_stats()
+        if saved_stats:
+            self.stats = CollectionStats(**saved_stats)
+            histograms = checkpoint.load_histograms()
+            if histograms:
+                self.stats.restore_histograms(histograms)
+        return checkpoint.pending(urls)
+
+    def _commit_batch(
+        self,
+        batch_urls: List[str],
+        items: List[Dict],
+        stats: CollectionStats,
+        sink: ItemSink,
+        checkpoint: Optional[CheckpointStore]
+    ):
+        """Write a processed batch's items and adopt its stats, then checkpoint the batch"""
+        for item in items:
+            sink.write(item)
+        self.stats = stats
+        if self.deduplicator is not None:
+            self.deduplicator.commit()
+        if checkpoint is not None:
+            sink.flush()
+            checkpoint.mark_done(batch_urls, stats.model_dump(), stats.histograms())
+
+    def _batch_failed(
+        self,
+        batch_urls: List[str],
+        error: Exception,
+        attempts: int,
+        checkpoint: Optional[CheckpointStore]
+    ):
+        """Report a batch that failed, after `attempts` scrapes"""
+        print(f"Error processing batch: {str(error)}")
+        if self.deduplicator is not None:
+            # Forget documents the failed batch added to the index
+            self.deduplicator.rollback()
+        if checkpoint is not None:
+            checkpoint.mark_failed(batch_urls, str(error), attempts)
+
+    def _is_near_duplicate(self, result: dict) -> bool:
+        """Check an item against the near-duplicate index, indexing it if new"""
+        if self.deduplicator is None:
             return False
-            
-        return True
+        return self.deduplicator.is_duplicate(
+            result["extract"]["content"],
+            key=result["metadata"]["sourceURL"]
+        )
+
+    def _process_batch_results(self, batch_results: dict) -> Tuple[List[Dict], CollectionStats]:
+        """
+        Run safety and near-duplicate checks on a batch
+
+        Nothing reaches the sink or self.stats here, so a batch that fails
+        partway leaves no trace; _commit_batch applies the result.
+
+        Returns:
+            The items that pass and the stats including this batch
+        """
+        results = batch_results.get("data", [])
+        quality, toxicity, has_metrics, passed = self._score_batch([result["extract"] for result in results])
+        stats = self.stats.model_copy(deep=True)
+        items = []
+
+        stats.total_processed += len(results)
+        stats.failed_safety += int(len(results) - passed.sum())
+        stats.record_distribution(quality[has_metrics], toxicity[has_metrics])
+
+        for index in np.flatnonzero(passed):
+            result = results[index]
+            if self._is_near_duplicate(result):
+                stats.duplicates_dropped += 1
+            else:
+                # Create collected item
+                item = CollectedItem(
+                    id=str(uuid4()),
+                    content=result["extract"]["content"],
+                    metadata={
+                        "source_url": result["metadata"]["sourceURL"],
+                        "extraction_date": datetime.utcnow().isoformat(),
+                        "title": result["extract"].get("title", ""),
+                        "author": result["extract"].get("author", "")
+                    },
+                    quality_metrics=QualityMetrics(
+                        **result["extract"]["quality_metrics"]
+                    )
+                )
+
+                items.append(item.model_dump())
+                stats.passed_safety += 1
+                stats.record_quality(float(quality[index]))
+
+        return items, stats
+
+    def _collection_result(self, sink: ItemSink) -> Dict:
+        """Flush the sink and build the result dictionary"""
+        sink.flush()
+        return {
+            **sink.result(),
+            "stats": self.stats.model_dump()
+        }
 
     def collect_from_urls(
         self,
         urls: List[str],
-        batch_size: int = 10
+        batch_size: int = 10,
+        sink: Optional[ItemSink] = None,
+        checkpoint: Optional[CheckpointStore] = None
     ) -> Dict:
         """
         Collect and validate content from a list of URLs
-        
+
         Args:
             urls: List of URLs to process
             batch_size: Number of URLs to process in each batch
-            
+            sink: Where to write collected items; defaults to an in-memory list
+                returned under "items"
+            checkpoint: Checkpoint to resume from and record progress in
+
         Returns:
-            Dictionary containing collected items and stats
+            Dictionary containing collected items (or the sink's output) and stats
         """
-        collected_items = []
-        
+        sink = sink or ListSink()
+        urls = self._resume(urls, checkpoint)
+
         # Create extraction schema
         schema = self._create_extraction_schema()
-        
+
         # Process URLs in batches
         for i in tqdm(range(0, len(urls), batch_size)):
             batch_urls = urls[i:i + batch_size]
-            
+
             try:
-                # Batch scrape with extraction
-                batch_results = self.app.batch_scrape(
-                    urls=batch_urls,
-                    params={
-                        "extract": {"schema": schema}
-                    }
-                )
-                
-                # Process results
-                for result in batch_results.get("data", []):
-                    self.stats.total_processed += 1
-                    
-                    if self._passes_safety_checks(result["extract"]):
-                        self.stats.passed_safety += 1
-                        
-                        # Create collected item
-                        item = CollectedItem(
-                            id=str(uuid4()),
-                            content=result["extract"]["content"],
-                            metadata={
-                                "source_url": result["metadata"]["sourceURL"],
-                                "extraction_date": datetime.utcnow().isoformat(),
-                                "title": result["extract"].get("title", ""),
-                                "author": result["extract"].get("author", "")
-                            },
-                            quality_metrics=QualityMetrics(
-                                **result["extract"]["quality_metrics"]
-                            )
-                        )
-                        
-                        collected_items.append(item.model_dump())
-                    else:
-                        self.stats.failed_safety += 1
-                        
+                batch_results, attempts = self._scrape_batch_with_retry(batch_urls, schema)
             except Exception as e:
-                print(f"Error processing batch: {str(e)}")
+                self._batch_failed(batch_urls, e, self.max_retries + 1, checkpoint)
                 continue
-                
-        # Calculate final stats
-        if self.stats.passed_safety > 0:
-            self.stats.average_quality = sum(
-                item["quality_metrics"]["coherence"] +
-                item["quality_metrics"]["relevance"]
-                for item in collected_items
-            ) / (2 * self.stats.passed_safety)
-            
-        return {
-            "items": collected_items,
-            "stats": self.stats.model_dump()
-        }
+            try:
+                items, stats = self._process_batch_results(batch_results)
+                self._commit_batch(batch_urls, items, stats, sink, checkpoint)
+            except Exception as e:
+                self._batch_failed(batch_urls, e, attempts, checkpoint)
+
+        return self._collection_result(sink)
+
+    async def collect_from_urls_async(
+        self,
+        urls: List[str],
+        batch_size: int = 10,
+        max_in_flight: int = 4,
+        adaptive: bool = True,
+        target_batch_seconds: float = 10.0,
+        min_batch_size: int = 1,
+        max_batch_size: int = 100,
+        sink: Optional[ItemSink] = None,
+        checkpoint: Optional[CheckpointStore] = None
+    ) -> Dict:
+        """
+        Collect content with several batches in flight at once
+
+        Batch scrapes run in worker threads while completed batches are
+        safety-checked on the event loop. With ``adaptive`` the size of each
+        new batch is tuned from the observed per-URL latency so a batch takes
+        about ``target_batch_seconds``. Items are collected in completion
+        order rather than URL order.
+
+        Args:
+            urls: List of URLs to process
+            batch_size: Size of the first batches (and all batches if not adaptive)
+            max_in_flight: Number of batch scrapes running concurrently
+            adaptive: Whether to adjust the batch size from observed latency
+            target_batch_seconds: Desired duration of one batch scrape
+            min_batch_size: Lower bound for the adaptive batch size
+            max_batch_size: Upper bound for the adaptive batch size
+            sink: Where to write collected items; defaults to an in-memory list
+            checkpoint: Checkpoint to resume from and record progress in
+
+        Returns:
+            Dictionary containing collected items (or the sink's output) and stats
+        """
+        sink = sink or ListSink()
+        urls = self._resume(urls, checkpoint)
+        schema = self._create_extraction_schema()
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        in_flight = {}
+        position = 0
+        # Exponentially weighted average of seconds per URL
+        seconds_per_url = None
+
+        async def timed_scrape(batch_urls: List[str]):
+            start = time.perf_counter()
+            scraped = await loop.run_in_executor(
+                executor, self._scrape_batch_with_retry, batch_urls, schema
+            )
+            return scraped, time.perf_counter() - start
+
+        with tqdm(total=len(urls)) as progress:
+            try:
+                while position < len(urls) or in_flight:
+                    # Keep the pipeline full
+                    while position < len(urls) and len(in_flight) < max_in_flight:
+                        batch_urls = urls[position:position + batch_size]
+                        position += len(batch_urls)
+                        in_flight[asyncio.ensure_future(timed_scrape(batch_urls))] = batch_urls
+
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        batch_urls = in_flight.pop(task)
+                        progress.update(len(batch_urls))
+                        try:
+                            (batch_results, attempts), elapsed = task.result()
+                        except Exception as e:
+                            await loop.run_in_executor(
+                                None, self._batch_failed, batch_urls, e, self.max_retries + 1, checkpoint
+                            )
+                            continue
+                        try:
+                            items, stats = self._process_batch_results(batch_results)
+                            # Sink and checkpoint writes block, so they run off the event loop
+                            await loop.run_in_executor(
+                                None, self._commit_batch, batch_urls, items, stats, sink, checkpoint
+                            )
+                        except Exception as e:
+                            await loop.run_in_executor(
+                                None, self._batch_failed, batch_urls, e, attempts, checkpoint
+                            )
+                            continue
+
+                        if adaptive:
+                            observed = elapsed / len(batch_urls)
+                            seconds_per_url = observed if seconds_per_url is None else (
+                                0.7 * seconds_per_url + 0.3 * observed
+                            )
+                            batch_size = int(target_batch_seconds / max(seconds_per_url, 1e-6))
+                            batch_size = max(min_batch_size, min(max_batch_size, batch_size))
+            finally:
+                executor.shutdown(wait=False)
+
+        return await loop.run_in_executor(None, self._collection_result, sink)
 
 if __name__ == "__main__":
     # Example usage
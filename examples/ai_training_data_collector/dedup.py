@@ -0,0 +1,224 @@
+"""
+Near-duplicate detection with MinHash signatures and an LSH index
+
+Each document is reduced to a MinHash signature over its word shingles.
+Signatures are split into bands and stored in a SQLite-backed LSH index.
+With the index in a database file, memory use stays flat however many
+documents have been seen and the index survives restarts; an in-memory
+(":memory:") index has neither property.
+"""
+
+import hashlib
+import re
+import sqlite3
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+def _lsh_params(threshold: float, num_perm: int, false_negative_weight: float = 0.7) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) minimising the weighted false positive and false negative areas
+
+    Candidates are verified against their full signatures, so a false
+    positive only costs a lookup and false negatives are weighted higher.
+    """
+    step = 0.005
+    similarities = np.arange(0, 1 + step, step)
+    below, above = similarities[similarities < threshold], similarities[similarities >= threshold]
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        false_positive = (1 - (1 - below ** rows) ** bands).sum() * step
+        false_negative = ((1 - above ** rows) ** bands).sum() * step
+        error = (1 - false_negative_weight) * false_positive + false_negative_weight * false_negative
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+class MinHasher:
+    """Computes MinHash signatures of word shingles with multiply-shift hashing"""
+
+    BLOCK_SIZE = 1024
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        # Random 64-bit (a, b) for multiply-shift hashing of 32-bit shingle hashes
+        self._a = rng.randint(0, 2 ** 64, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2 ** 64, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """32-bit hashes of the word shingles of text"""
+        words = _WORD.findall(text.lower())
+        k = self.shingle_size
+        if len(words) <= k:
+            grams = [" ".join(words)]
+        else:
+            grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+        return np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) for gram in grams),
+            dtype=np.uint64,
+            count=len(grams)
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of text as uint32 values"""
+        hashes = np.unique(self.shingles(text))
+        signature = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        # Permute BLOCK_SIZE shingles at a time, so long documents need no
+        # shingles x num_perm matrix
+        for start in range(0, len(hashes), self.BLOCK_SIZE):
+            block = hashes[start:start + self.BLOCK_SIZE]
+            # (a * h + b) mod 2^64, keeping the high 32 bits, for every permutation
+            permuted = (np.outer(block, self._a) + self._b) >> np.uint64(32)
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+class NearDuplicateIndex:
+    """Incremental, persistable MinHash LSH index"""
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        seed: int = 1
+    ):
+        """
+        Args:
+            path: SQLite database file for the index; ":memory:" keeps it
+                in memory for this process only
+            threshold: Estimated Jaccard similarity at or above which a document is a duplicate
+            num_perm: Number of MinHash permutations
+            shingle_size: Number of words per shingle
+            seed: Seed for the hash permutations
+        """
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS params (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                key TEXT,
+                signature BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                hash INTEGER NOT NULL,
+                document_id INTEGER NOT NULL,
+                PRIMARY KEY (hash, document_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS documents_key ON documents (key);
+            """
+        )
+        self._check_params({
+            "num_perm": num_perm,
+            "shingle_size": shingle_size,
+            "seed": seed,
+            "bands": self.bands,
+        })
+
+    def _check_params(self, params: dict):
+        """Refuse to reuse an index built with different hashing parameters"""
+        stored = dict(self._conn.execute("SELECT key, value FROM params"))
+        if not stored:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO params (key, value) VALUES (?, ?)",
+                    ((key, str(value)) for key, value in params.items())
+                )
+        elif stored != {key: str(value) for key, value in params.items()}:
+            raise ValueError(f"Index at this path was built with different parameters: {stored}")
+
+    def _band_hashes(self, signature: np.ndarray) -> List[int]:
+        """One signed 64-bit bucket hash per band, salted with the band number"""
+        bands = signature.reshape(self.bands, self.rows)
+        return [
+            int.from_bytes(
+                hashlib.blake2b(band.tobytes(), digest_size=8, salt=number.to_bytes(8, "little")).digest(),
+                "little",
+                signed=True
+            )
+            for number, band in enumerate(bands)
+        ]
+
+    def _similarity(self, signature: np.ndarray, other: bytes) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return float(np.mean(signature == np.frombuffer(other, dtype=np.uint32)))
+
+    def find_duplicate(self, text: str, key: Optional[str] = None) -> Optional[str]:
+        """
+        Key of an indexed near-duplicate of text, adding text to the index if there is none
+
+        Args:
+            text: Document text
+            key: Identifier of the document, such as its URL. A match with the
+                same key is not a duplicate, so re-processing a document after a
+                restart does not drop it.
+
+        Returns:
+            Key of the matching document (or "" if it had none), or None if text is new
+        """
+        signature = self.hasher.signature(text)
+        band_hashes = self._band_hashes(signature)
+
+        candidates = self._conn.execute(
+            "SELECT d.id, d.key, d.signature FROM documents d WHERE d.id IN "
+            f"(SELECT document_id FROM buckets WHERE hash IN ({','.join('?' * len(band_hashes))}))",
+            band_hashes
+        ).fetchall()
+
+        seen_before = False
+        for _, candidate_key, candidate_signature in candidates:
+            if self._similarity(signature, candidate_signature) >= self.threshold:
+                if key is not None and candidate_key == key:
+                    # An earlier copy of this document; another one may still match
+                    seen_before = True
+                    continue
+                return candidate_key or ""
+        if seen_before:
+            return None
+
+        document_id = self._conn.execute(
+            "INSERT INTO documents (key, signature) VALUES (?, ?)", (key, signature.tobytes())
+        ).lastrowid
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO buckets (hash, document_id) VALUES (?, ?)",
+            ((value, document_id) for value in band_hashes)
+        )
+        return None
+
+    def is_duplicate(self, text: str, key: Optional[str] = None) -> bool:
+        """Whether text nearly duplicates an indexed document; new text is indexed"""
+        return self.find_duplicate(text, key) is not None
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def commit(self):
+        """Persist documents added since the last commit"""
+        self._conn.commit()
+
+    def rollback(self):
+        """Forget documents added since the last commit"""
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
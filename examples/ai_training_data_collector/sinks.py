@@ -0,0 +1,160 @@
+"""
+Output sinks for collected training data
+
+Sinks receive each collected item as soon as it passes the safety checks,
+so a collection run does not need to keep every item in memory.
+"""
+
+import gzip
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+class ItemSink(ABC):
+    """Receives collected items one at a time"""
+
+    @abstractmethod
+    def write(self, item: Dict):
+        """Write a single collected item"""
+
+    def flush(self):
+        """Flush buffered items to their destination"""
+
+    def close(self):
+        """Flush and release any open resources"""
+        self.flush()
+
+    def result(self) -> Dict:
+        """Entries describing the output, merged into the collection result"""
+        return {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class ListSink(ItemSink):
+    """Keeps items in memory; the default, for small collections"""
+
+    def __init__(self):
+        self.items: List[Dict] = []
+
+    def write(self, item: Dict):
+        self.items.append(item)
+
+    def result(self) -> Dict:
+        return {"items": self.items}
+
+class JSONLSink(ItemSink):
+    """
+    Appends items as JSON lines to size-rotated, optionally compressed files
+
+    Files are named ``{prefix}-00000.jsonl`` (plus ``.gz`` or ``.zst``) in
+    ``directory``. A new file is started before a line could take the file
+    past ``max_bytes`` on disk. Input the compressor still buffers is
+    counted at its uncompressed size until a file gets close to the limit,
+    when the compressor is flushed to measure it exactly. Numbering
+    continues after existing files with the same prefix, so a resumed run
+    never overwrites output.
+    """
+
+    EXTENSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "items",
+        compression: Optional[str] = None,
+        max_bytes: Optional[int] = 256 * 1024 * 1024
+    ):
+        if compression not in self.EXTENSIONS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                raise ImportError("zstd compression requires the 'zstandard' package")
+
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.paths: List[str] = []
+        self.items_written = 0
+        self._file = None
+        # The file on disk, under the compressor when there is one
+        self._raw = None
+        self._lines_in_file = 0
+        # Uncompressed bytes the compressor may not have written out yet
+        self._unflushed = 0
+        os.makedirs(directory, exist_ok=True)
+        self._next_index = self._first_free_index()
+
+    def _first_free_index(self) -> int:
+        """Index after the highest existing file with this prefix"""
+        pattern = re.compile(rf"{re.escape(self.prefix)}-(\d+)\.jsonl")
+        indexes = [
+            int(match.group(1))
+            for match in map(pattern.match, os.listdir(self.directory))
+            if match
+        ]
+        return max(indexes) + 1 if indexes else 0
+
+    def _open_next(self):
+        """Close the current file and start the next one"""
+        self._close_file()
+        path = os.path.join(
+            self.directory,
+            f"{self.prefix}-{self._next_index:05d}.jsonl{self.EXTENSIONS[self.compression]}"
+        )
+        self._next_index += 1
+        self._raw = open(path, "wb")
+        if self.compression == "gzip":
+            self._file = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif self.compression == "zstd":
+            import zstandard
+            self._file = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._file = self._raw
+        self.paths.append(path)
+        self._lines_in_file = 0
+        self._unflushed = 0
+
+    def _would_overflow(self, size: int) -> bool:
+        """Whether size more bytes might take the current file past max_bytes"""
+        if self._raw.tell() + self._unflushed + size <= self.max_bytes:
+            return False
+        if self._unflushed:
+            self._file.flush()
+            self._unflushed = 0
+        return self._raw.tell() + size > self.max_bytes
+
+    def write(self, item: Dict):
+        line = (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._file is None or (self.max_bytes and self._lines_in_file > 0
+                                  and self._would_overflow(len(line))):
+            self._open_next()
+        self._file.write(line)
+        self._lines_in_file += 1
+        if self._file is not self._raw:
+            self._unflushed += len(line)
+        self.items_written += 1
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+            self._file = self._raw = None
+
+    def close(self):
+        self._close_file()
+
+    def result(self) -> Dict:
+        return {"files": list(self.paths), "items_written": self.items_written}
@@ -0,0 +1,141 @@
+import random
+
+from checkpoint import BloomFilter, CheckpointStore
+from collector import DataCollector
+from dedup import NearDuplicateIndex
+from sinks import JSONLSink
+
+class Crash(BaseException):
+    """Stands in for the process dying; not caught as a batch failure"""
+
+class FakeApp:
+    """Answers batch scrapes, failing or crashing on the URLs it is told to"""
+
+    def __init__(self, fail_times=0, fail_urls=(), crash_url=None):
+        self.scraped = []
+        self.calls = 0
+        self.fail_times = fail_times
+        self.fail_urls = set(fail_urls)
+        self.crash_url = crash_url
+
+    def batch_scrape(self, urls, params):
+        self.calls += 1
+        if self.crash_url in urls:
+            raise Crash()
+        if self.fail_urls & set(urls) and self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("scrape failed")
+        self.scraped.extend(urls)
+        return {"success": True, "data": [make_result(url) for url in urls]}
+
+def make_result(url):
+    rng = random.Random(url)
+    return {
+        "metadata": {"sourceURL": url},
+        "extract": {
+            "content": f"Article text for {url}. " * 20,
+            "title": f"Article {url}",
+            "quality_metrics": {
+                "coherence": rng.uniform(0.4, 1.0),
+                "relevance": rng.uniform(0.4, 1.0),
+                "toxicity": rng.uniform(0.0, 0.5)
+            }
+        }
+    }
+
+def make_collector(app, **kwargs):
+    collector = DataCollector(api_key="test", retry_backoff=0, **kwargs)
+    collector.app = app
+    return collector
+
+URLS = [f"https://example.com/article-{i}" for i in range(40)]
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test every added value is found and unseen values are mostly rejected"""
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"seen-{i}")
+
+    assert all(f"seen-{i}" in bloom for i in range(1000))
+    assert sum(f"unseen-{i}" in bloom for i in range(10000)) < 300
+
+def test_pending_skips_done_urls_without_lookups(tmp_path):
+    """Test URLs the Bloom filter rejects are kept without querying the URL index"""
+    path = str(tmp_path / "checkpoint.db")
+    with CheckpointStore(path) as store:
+        store.mark_done(URLS[::2])
+
+    store = CheckpointStore(path)
+    queries = []
+    store._conn.set_trace_callback(queries.append)
+
+    assert store.pending(URLS) == URLS[1::2]
+    assert store.is_done(URLS[0]) and not store.is_done(URLS[1])
+
+    queries.clear()
+    assert store.pending([f"https://example.com/new-{i}" for i in range(100)])
+    assert queries == []
+    store.close()
+
+def test_resume_after_crash_matches_uninterrupted_run(tmp_path):
+    """Test a run that dies partway and is resumed scrapes each URL once and ends with the same stats"""
+    uninterrupted = make_collector(FakeApp()).collect_from_urls(URLS, batch_size=5)
+
+    path = str(tmp_path / "checkpoint.db")
+    crashed = FakeApp(crash_url=URLS[23])
+    try:
+        make_collector(crashed).collect_from_urls(
+            URLS, batch_size=5, sink=JSONLSink(str(tmp_path / "out")), checkpoint=CheckpointStore(path)
+        )
+    except Crash:
+        pass
+    assert crashed.scraped == URLS[:20]
+
+    resumed = FakeApp()
+    with CheckpointStore(path) as checkpoint, JSONLSink(str(tmp_path / "out")) as sink:
+        result = make_collector(resumed).collect_from_urls(URLS, batch_size=5, sink=sink, checkpoint=checkpoint)
+
+    assert resumed.scraped == URLS[20:]
+    assert result["stats"] == uninterrupted["stats"]
+    assert result["files"] == [str(tmp_path / "out" / "items-00001.jsonl")]
+
+def test_failed_batch_is_retried_then_recorded(tmp_path):
+    """Test a batch is retried within a run, recorded once out of retries and redone on the next run"""
+    app = FakeApp(fail_times=1, fail_urls=URLS[:1])
+    with CheckpointStore(str(tmp_path / "checkpoint.db")) as checkpoint:
+        result = make_collector(app, max_retries=2).collect_from_urls(URLS[:10], batch_size=5, checkpoint=checkpoint)
+        assert app.calls == 3
+        assert result["stats"]["total_processed"] == 10
+        assert checkpoint.failed_urls() == []
+
+        app = FakeApp(fail_times=10, fail_urls=URLS[10:11])
+        result = make_collector(app, max_retries=2).collect_from_urls(URLS[:20], batch_size=5, checkpoint=checkpoint)
+        assert app.calls == 4
+        assert result["stats"]["total_processed"] == 15
+        assert checkpoint.failed_urls() == URLS[10:15]
+        assert checkpoint._conn.execute("SELECT MIN(attempts) FROM failed").fetchone()[0] == 3
+
+        app = FakeApp()
+        result = make_collector(app).collect_from_urls(URLS[:20], batch_size=5, checkpoint=checkpoint)
+        assert app.scraped == URLS[10:15]
+        assert result["stats"]["total_processed"] == 20
+        assert checkpoint.failed_urls() == []
+
+def test_batch_failing_in_processing_leaves_no_trace(tmp_path):
+    """Test a batch that fails after some items were checked writes nothing and indexes nothing"""
+    class BrokenApp(FakeApp):
+        def batch_scrape(self, urls, params):
+            results = super().batch_scrape(urls, params)
+            for result in results["data"]:
+                result["extract"]["quality_metrics"] = {"coherence": 1, "relevance": 1, "toxicity": 0}
+            del results["data"][-1]["metadata"]
+            return results
+
+    with NearDuplicateIndex(":memory:") as dedup, CheckpointStore(str(tmp_path / "checkpoint.db")) as checkpoint:
+        collector = make_collector(BrokenApp(), deduplicator=dedup, max_retries=0)
+        result = collector.collect_from_urls(URLS[:5], batch_size=5, checkpoint=checkpoint)
+
+        assert result["items"] == []
+        assert result["stats"]["total_processed"] == 0
+        assert len(dedup) == 0
+        assert checkpoint.failed_urls() == URLS[:5]
@@ -0,0 +1,147 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+
+from checkpoint import CheckpointStore
+from collector import PERCENTILES, CollectionStats, DataCollector
+
+class FakeApp:
+    """Answers batch scrapes with extraction results derived from each URL"""
+
+    def __init__(self):
+        self.scraped = []
+
+    def batch_scrape(self, urls, params):
+        self.scraped.extend(urls)
+        return {"success": True, "data": [make_result(url) for url in urls]}
+
+def make_result(url):
+    rng = random.Random(url)
+    return {
+        "metadata": {"sourceURL": url},
+        "extract": {
+            "content": f"Article text for {url}. " * 20,
+            "title": f"Article {url}",
+            "author": "Author",
+            "quality_metrics": {
+                "coherence": rng.uniform(0.4, 1.0),
+                "relevance": rng.uniform(0.4, 1.0),
+                "toxicity": rng.uniform(0.0, 0.5)
+            }
+        }
+    }
+
+def make_collector():
+    collector = DataCollector(api_key="test")
+    collector.app = FakeApp()
+    return collector
+
+def item_fields(items):
+    """Items without their generated id and extraction date, by URL"""
+    return sorted(
+        (item["metadata"]["source_url"], item["content"], item["metadata"]["title"], item["quality_metrics"])
+        for item in items
+    )
+
+URLS = [f"https://example.com/article-{i}" for i in range(57)]
+
+def test_async_output_matches_sync():
+    """Test the pipelined async mode collects the same items and stats as sequential batches"""
+    sync = make_collector().collect_from_urls(URLS, batch_size=5)
+    collector = make_collector()
+    pipelined = asyncio.run(collector.collect_from_urls_async(URLS, batch_size=5, max_in_flight=4))
+
+    assert sorted(collector.app.scraped) == sorted(URLS)
+    assert 0 < len(sync["items"]) < len(URLS)
+    assert item_fields(pipelined["items"]) == item_fields(sync["items"])
+
+    sync_stats, async_stats = sync["stats"], pipelined["stats"]
+    for field in ("total_processed", "passed_safety", "failed_safety", "duplicates_dropped",
+                  "quality_percentiles", "toxicity_percentiles"):
+        assert async_stats[field] == sync_stats[field]
+    # The running average depends on the order batches complete in
+    assert async_stats["average_quality"] == pytest.approx(sync_stats["average_quality"])
+
+def test_adaptive_batches_cover_every_url():
+    """Test adaptive batch sizing still scrapes each URL exactly once"""
+    collector = make_collector()
+    result = asyncio.run(collector.collect_from_urls_async(
+        URLS, batch_size=3, max_in_flight=2, target_batch_seconds=1e-4, max_batch_size=7
+    ))
+
+    assert sorted(collector.app.scraped) == sorted(URLS)
+    assert result["stats"]["total_processed"] == len(URLS)
+
+def test_vectorized_scoring_matches_per_item_checks():
+    """Test batch scoring passes the same items as the thresholds applied one by one"""
+    collector = make_collector()
+    extracts = [make_result(url)["extract"] for url in URLS]
+    extracts[3]["quality_metrics"] = None
+    extracts[4].pop("quality_metrics")
+
+    _, _, has_metrics, passed = collector._score_batch(extracts)
+
+    config = collector.safety_config
+    expected = [
+        bool(m) and (m["coherence"] + m["relevance"]) / 2 >= config.min_quality_score
+        and m["toxicity"] <= config.max_toxicity
+        for m in (extract.get("quality_metrics") for extract in extracts)
+    ]
+    assert passed.tolist() == expected
+    assert has_metrics.sum() == len(URLS) - 2
+
+def test_streaming_percentiles_match_numpy():
+    """Test percentiles from batch-by-batch histograms agree with numpy.percentile to within a bin"""
+    rng = np.random.default_rng(0)
+    quality = rng.beta(5, 2, size=20000)
+    toxicity = rng.beta(1, 8, size=20000)
+    stats = CollectionStats()
+    for start in range(0, len(quality), 700):
+        stats.record_distribution(quality[start:start + 700], toxicity[start:start + 700])
+
+    for percentiles, values in ((stats.quality_percentiles, quality), (stats.toxicity_percentiles, toxicity)):
+        assert list(percentiles) == [f"p{p}" for p in PERCENTILES]
+        for p in PERCENTILES:
+            assert percentiles[f"p{p}"] == pytest.approx(np.percentile(values, p), abs=0.01)
+
+def test_collected_percentiles_cover_failing_items():
+    """Test run percentiles cover every item with quality metrics, passing or not"""
+    result = make_collector().collect_from_urls(URLS, batch_size=5)
+
+    metrics = [make_result(url)["extract"]["quality_metrics"] for url in URLS]
+    quality = [(m["coherence"] + m["relevance"]) / 2 for m in metrics]
+    stats = result["stats"]
+    assert stats["passed_safety"] + stats["failed_safety"] == len(URLS)
+    assert stats["quality_percentiles"]["p50"] == pytest.approx(np.percentile(quality, 50), abs=0.02)
+    assert stats["average_quality"] == pytest.approx(
+        np.mean([item["quality_metrics"]["coherence"] / 2 + item["quality_metrics"]["relevance"] / 2
+                 for item in result["items"]])
+    )
+
+def test_histograms_checkpointed_with_each_batch(tmp_path):
+    """Test the checkpoint holds the histograms of the last batch, so resuming keeps the percentiles"""
+    path = str(tmp_path / "checkpoint.db")
+    collector = make_collector()
+    with CheckpointStore(path) as checkpoint:
+        # Read the checkpoint back right after each batch is committed
+        original = collector._commit_batch
+        committed, saved = [], []
+
+        def commit_batch(batch_urls, items, stats, sink, checkpoint):
+            original(batch_urls, items, stats, sink, checkpoint)
+            committed.append(stats.histograms())
+            saved.append(checkpoint.load_histograms())
+
+        collector._commit_batch = commit_batch
+        collector.collect_from_urls(URLS[:15], batch_size=5, checkpoint=checkpoint)
+    assert len(committed) == 3
+    assert saved == committed
+
+    resumed = make_collector()
+    with CheckpointStore(path) as checkpoint:
+        result = resumed.collect_from_urls(URLS[:15], batch_size=5, checkpoint=checkpoint)
+    assert resumed.app.scraped == []
+    assert resumed.stats.histograms() == committed[-1]
+    assert result["stats"] == collector.stats.model_dump()
@@ -0,0 +1,87 @@
+import random
+
+import numpy as np
+import pytest
+
+from dedup import MinHasher, NearDuplicateIndex
+
+def make_document(seed, words=300):
+    rng = random.Random(seed)
+    return " ".join(f"w{rng.randrange(5000)}" for _ in range(words))
+
+def edit(document, changes, seed=0):
+    """document with `changes` words replaced"""
+    rng = random.Random(seed)
+    words = document.split()
+    for position in rng.sample(range(len(words)), changes):
+        words[position] = f"edit{rng.randrange(10 ** 6)}"
+    return " ".join(words)
+
+def jaccard(hasher, a, b):
+    """Exact Jaccard similarity of the shingle sets of two texts"""
+    x, y = set(hasher.shingles(a).tolist()), set(hasher.shingles(b).tolist())
+    return len(x & y) / len(x | y)
+
+def test_signature_estimates_jaccard():
+    """Test the share of equal signature values tracks the exact shingle Jaccard similarity"""
+    hasher = MinHasher(num_perm=256)
+    base = make_document(1)
+    for changes in (2, 10, 30):
+        other = edit(base, changes)
+        estimate = np.mean(hasher.signature(base) == hasher.signature(other))
+        assert estimate == pytest.approx(jaccard(hasher, base, other), abs=0.1)
+
+def test_signature_independent_of_block_size(monkeypatch):
+    """Test hashing shingles in blocks gives the same signature as one pass"""
+    hasher = MinHasher()
+    text = make_document(2, words=3000)
+    blocked = hasher.signature(text)
+    monkeypatch.setattr(MinHasher, "BLOCK_SIZE", 10 ** 6)
+
+    assert np.array_equal(hasher.signature(text), blocked)
+
+def test_threshold_separates_near_duplicates():
+    """Test copies above the threshold are duplicates and those well below it are not"""
+    hasher = MinHasher()
+    base = make_document(3)
+    near = edit(base, 3, seed=1)
+    far = edit(base, 60, seed=2)
+    assert jaccard(hasher, base, near) > 0.85
+    assert jaccard(hasher, base, far) < 0.5
+
+    with NearDuplicateIndex(":memory:", threshold=0.8) as index:
+        assert index.find_duplicate(base, key="base") is None
+        assert index.find_duplicate(near, key="near") == "base"
+        assert index.find_duplicate(far, key="far") is None
+        assert index.find_duplicate(make_document(4), key="other") is None
+        assert len(index) == 3
+
+def test_same_key_is_not_a_duplicate():
+    """Test re-processing a document under its own key keeps it"""
+    with NearDuplicateIndex(":memory:") as index:
+        document = make_document(5)
+        assert not index.is_duplicate(document, key="a")
+        assert not index.is_duplicate(document, key="a")
+        assert index.is_duplicate(document, key="b")
+
+def test_rollback_forgets_uncommitted_documents():
+    """Test rollback drops documents added since the last commit"""
+    with NearDuplicateIndex(":memory:") as index:
+        index.is_duplicate(make_document(6), key="kept")
+        index.commit()
+        index.is_duplicate(make_document(7), key="dropped")
+        index.rollback()
+
+        assert len(index) == 1
+        assert not index.is_duplicate(make_document(7), key="again")
+
+def test_file_index_persists_and_checks_params(tmp_path):
+    """Test a file-backed index survives a restart and refuses other hashing parameters"""
+    path = str(tmp_path / "dedup.db")
+    with NearDuplicateIndex(path) as index:
+        index.is_duplicate(make_document(8), key="a")
+
+    with NearDuplicateIndex(path) as index:
+        assert index.find_duplicate(edit(make_document(8), 2), key="b") == "a"
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(path, num_perm=64)
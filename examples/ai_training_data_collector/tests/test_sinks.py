@@ -0,0 +1,86 @@
+import gzip
+import json
+import os
+import random
+
+import pytest
+
+from sinks import JSONLSink, ListSink
+
+def make_items(count):
+    # Random words, so compressed files still need rotating
+    rng = random.Random(0)
+    words = [f"word{rng.randrange(10 ** 6)}" for _ in range(count * 8)]
+    return [{"id": str(i), "content": " ".join(words[i * 8:i * 8 + 3 + i % 6])} for i in range(count)]
+
+def read_lines(path):
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            data = f.read()
+    elif path.endswith(".zst"):
+        import zstandard
+        with open(path, "rb") as f:
+            data = zstandard.ZstdDecompressor().stream_reader(f).read()
+    else:
+        with open(path, "rb") as f:
+            data = f.read()
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+def line_size(item):
+    return len((json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8"))
+
+def test_list_sink_result():
+    """Test the default sink returns its items"""
+    sink = ListSink()
+    for item in make_items(3):
+        sink.write(item)
+
+    assert sink.result() == {"items": make_items(3)}
+
+@pytest.mark.parametrize("compression", [None, "gzip", "zstd"])
+def test_rotation_keeps_files_within_max_bytes(tmp_path, compression):
+    """Test every file stays within max_bytes on disk and the items read back in order"""
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    items = make_items(400)
+    with JSONLSink(str(tmp_path), compression=compression, max_bytes=4000) as sink:
+        for item in items:
+            sink.write(item)
+
+    assert len(sink.paths) > 1
+    assert all(path.endswith(".jsonl" + JSONLSink.EXTENSIONS[compression]) for path in sink.paths)
+    assert all(os.path.getsize(path) <= 4000 for path in sink.paths)
+    assert [item for path in sink.paths for item in read_lines(path)] == items
+    assert sink.result() == {"files": sink.paths, "items_written": 400}
+
+def test_rotation_boundaries(tmp_path):
+    """Test a line that exactly fills a file stays in it and an oversized line gets its own file"""
+    item = {"content": "x" * 20}
+    size = line_size(item)
+    big = {"content": "y" * (3 * size)}
+    with JSONLSink(str(tmp_path), max_bytes=2 * size) as sink:
+        sink.write(item)
+        sink.write(item)
+        sink.write(item)
+        sink.write(big)
+        sink.write(item)
+
+    assert [len(read_lines(path)) for path in sink.paths] == [2, 1, 1, 1]
+    assert read_lines(sink.paths[2]) == [big]
+    assert os.path.getsize(sink.paths[0]) == 2 * size
+
+def test_numbering_continues_after_existing_files(tmp_path):
+    """Test a second sink in the same directory never overwrites earlier output"""
+    with JSONLSink(str(tmp_path), compression="gzip") as sink:
+        sink.write({"run": 1})
+    with JSONLSink(str(tmp_path), compression="gzip") as sink:
+        sink.write({"run": 2})
+
+    assert sorted(os.listdir(tmp_path)) == ["items-00000.jsonl.gz", "items-00001.jsonl.gz"]
+    assert read_lines(str(tmp_path / "items-00000.jsonl.gz")) == [{"run": 1}]
+
+def test_unknown_compression_rejected(tmp_path):
+    """Test unsupported compressions fail before any file is created"""
+    with pytest.raises(ValueError):
+        JSONLSink(str(tmp_path / "out"), compression="bz2")
+    assert not os.path.exists(tmp_path / "out")
@@ -1,7 +1,7 @@
 from .crawler import EducationalCrawler
 from .validators import ContentValidator
 from .processors import ContentProcessor
-from .cache import CacheManager
+from .cache import CacheManager, MemoryBackend, SQLiteBackend
 from .metadata import MetadataExtractor
 
 __version__ = "0.1.0"
\ No newline at end of file
@@ -1,27 +1,581 @@
-from typing import Optional, Dict, List
-from .models import EducationalContent
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Optional, Dict, Iterable, List, Iterator, Set, Tuple, Union
+from pydantic import BaseModel
+from .models import EducationalContent, CompactContent
+
+def serialize_content(content: EducationalContent) -> bytes:
+    """Serialize content to compressed JSON bytes"""
+    return zlib.compress(content.model_dump_json().encode("utf-8"))
+
+def deserialize_content(data: bytes) -> EducationalContent:
+    """Deserialize content produced by serialize_content"""
+    return EducationalContent.model_validate_json(zlib.decompress(data))
+
+def _value_size(value) -> int:
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(key)) + _value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_value_size(item) for item in value)
+    return 8
+
+def estimate_size(content: EducationalContent, include_raw_data: bool = True) -> int:
+    """
+    Approximate size of content in bytes from the lengths of its fields
+
+    Much cheaper than serializing, which is only needed for storage.
+    """
+    size = len(content.title) + len(content.content)
+    size += sum(len(chunk.text) + len(chunk.type) + 8 for chunk in content.chunks)
+    if content.metadata:
+        metadata = content.metadata
+        size += len(metadata.subject) + len(metadata.grade_level) + len(metadata.license or "")
+        size += _value_size(metadata.learning_objectives) + _value_size(metadata.prerequisites)
+    if content.validation_result:
+        validation = content.validation_result
+        size += 16 + _value_size(validation.issues) + _value_size(validation.improvements)
+    if include_raw_data:
+        size += _value_size(content.raw_data)
+    return size
+
+# (is_valid, score, subject, grade_level) of one cached entry
+IndexRecord = Tuple[bool, Optional[float], Optional[str], Optional[str]]
+
+def _index_key(value: Optional[str]) -> Optional[str]:
+    return value.strip().lower() if value else None
+
+def index_record(content: EducationalContent) -> IndexRecord:
+    """Fields of content that CacheIndex filters on"""
+    validation = content.validation_result
+    metadata = content.metadata
+    return (
+        bool(validation and validation.is_valid),
+        validation.score if validation else None,
+        _index_key(metadata.subject) if metadata else None,
+        _index_key(metadata.grade_level) if metadata else None
+    )
+
+class CacheStats(BaseModel):
+    """Counters describing cache effectiveness"""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+class CacheBackend(ABC):
+    """Storage backend for CacheManager"""
+
+    def __init__(self, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.on_remove: Optional[Callable[[str], None]] = None
+        self._lock = threading.RLock()
+
+    def _removed(self, url: str):
+        """Notify the listener that an entry was evicted or expired"""
+        if self.on_remove:
+            self.on_remove(url)
+
+    def _expires_at(self) -> Optional[float]:
+        """Expiry time for an entry written now"""
+        return time.time() + self.ttl if self.ttl else None
+
+    @abstractmethod
+    def get(self, url: str) -> Optional[EducationalContent]:
+        """Get content for URL, or None if missing or expired"""
+
+    @abstractmethod
+    def peek(self, url: str) -> Optional[EducationalContent]:
+        """Get content for URL without updating recency or counters"""
+
+    @abstractmethod
+    def set(self, url: str, content: EducationalContent):
+        """Store content for URL, evicting old entries if over max_bytes"""
+
+    @abstractmethod
+    def items(self) -> Iterator[Tuple[str, EducationalContent]]:
+        """Iterate over all unexpired entries"""
+
+    @abstractmethod
+    def clear(self):
+        """Remove all entries"""
+
+    def values(self) -> Iterator[EducationalContent]:
+        """Iterate over all unexpired content"""
+        for _, content in self.items():
+            yield content
+
+    def index_records(self) -> Iterator[Tuple[str, IndexRecord]]:
+        """Index fields of all unexpired entries"""
+        for url, content in self.items():
+            yield url, index_record(content)
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU cache"""
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        compact: bool = False
+    ):
+        """
+        Args:
+            max_bytes: Maximum estimated size of all entries (see estimate_size)
+            ttl: Seconds after which entries expire
+            compact: Store entries as CompactContent without raw_data,
+                converting back to EducationalContent on read
+        """
+        super().__init__(max_bytes, ttl)
+        self.compact = compact
+        # url -> (content, size in bytes, expiry time)
+        self._entries: "OrderedDict[str, Tuple[Union[EducationalContent, CompactContent], int, Optional[float]]]" = OrderedDict()
+
+    def _load(self, stored: Union[EducationalContent, CompactContent]) -> EducationalContent:
+        return stored.to_content() if self.compact else stored
+
+    def _remove(self, url: str):
+        _, size, _ = self._entries.pop(url)
+        self.stats.entries -= 1
+        self.stats.size_bytes -= size
+
+    def get(self, url: str) -> Optional[EducationalContent]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            content, _, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(url)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                self._removed(url)
+                return None
+
+            self._entries.move_to_end(url)
+            self.stats.hits += 1
+        return self._load(content)
+
+    def peek(self, url: str) -> Optional[EducationalContent]:
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is None:
+            return None
+        content, _, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return self._load(content)
+
+    def set(self, url: str, content: EducationalContent):
+        # Compact entries do not keep raw_data
+        size = estimate_size(content, include_raw_data=not self.compact) if self.max_bytes else 0
+        with self._lock:
+            if url in self._entries:
+                self._remove(url)
+            stored = CompactContent.from_content(content) if self.compact else content
+            self._entries[url] = (stored, size, self._expires_at())
+            self.stats.entries += 1
+            self.stats.size_bytes += size
+
+            while self.max_bytes and self.stats.size_bytes > self.max_bytes and len(self._entries) > 1:
+                victim = next(iter(self._entries))
+                self._remove(victim)
+                self.stats.evictions += 1
+                self._removed(victim)
+
+    def items(self) -> Iterator[Tuple[str, EducationalContent]]:
+        now = time.time()
+        with self._lock:
+            entries = list(self._entries.items())
+        for url, (content, _, expires_at) in entries:
+            if expires_at is None or expires_at > now:
+                yield url, self._load(content)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats.entries = 0
+            self.stats.size_bytes = 0
+
+class SQLiteBackend(CacheBackend):
+    """
+    Persistent on-disk cache stored in a SQLite database
+
+    Entry and size totals are kept up to date as entries are written and
+    deleted, and access times of hits are written in batches of
+    `access_flush`, so neither reads nor writes scan the table.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        access_flush: int = 256
+    ):
+        super().__init__(max_bytes, ttl)
+        self.path = path
+        self.access_flush = access_flush
+        # url -> last access time not yet written to the database
+        self._accessed: Dict[str, float] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                url TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL,
+                is_valid INTEGER,
+                score REAL,
+                subject TEXT,
+                grade_level TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+        self._add_index_columns()
+        self._conn.commit()
+        self._refresh_totals()
+
+    def _add_index_columns(self):
+        """Add the index columns to caches written before they existed, and fill them once"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cache)")}
+        if "is_valid" in columns:
+            return
+        for column, column_type in (("is_valid", "INTEGER"), ("score", "REAL"),
+                                    ("subject", "TEXT"), ("grade_level", "TEXT")):
+            self._conn.execute(f"ALTER TABLE cache ADD COLUMN {column} {column_type}")
+        rows = self._conn.execute("SELECT url, data FROM cache").fetchall()
+        self._conn.executemany(
+            "UPDATE cache SET is_valid = ?, score = ?, subject = ?, grade_level = ? WHERE url = ?",
+            [(*index_record(deserialize_content(data)), url) for url, data in rows]
+        )
+
+    def _refresh_totals(self):
+        entries, size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        self.stats.entries = entries
+        self.stats.size_bytes = size
+
+    def _write_accessed(self):
+        """Write buffered access times, without committing"""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE cache SET accessed_at = ? WHERE url = ?",
+                [(accessed_at, url) for url, accessed_at in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def _deleted(self, url: str, size: int):
+        self._accessed.pop(url, None)
+        self.stats.entries -= 1
+        self.stats.size_bytes -= size
+
+    def get(self, url: str) -> Optional[EducationalContent]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, size, expires_at FROM cache WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            data, size, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM cache WHERE url = ?", (url,))
+                self._conn.commit()
+                self._deleted(url, size)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                self._removed(url)
+                return None
+
+            self._accessed[url] = now
+            if len(self._accessed) >= self.access_flush:
+                self._write_accessed()
+                self._conn.commit()
+            self.stats.hits += 1
+        return deserialize_content(data)
+
+    def peek(self, url: str) -> Optional[EducationalContent]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM cache WHERE url = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (url, time.time())
+            ).fetchone()
+        return deserialize_content(row[0]) if row else None
+
+    def set(self, url: str, content: EducationalContent):
+        data = serialize_content(content)
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM cache WHERE url = ?", (url,)).fetchone()
+            if previous:
+                self._deleted(url, previous[0])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache "
+                "(url, data, size, expires_at, accessed_at, is_valid, score, subject, grade_level) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, data, len(data), self._expires_at(), time.time(), *index_record(content))
+            )
+            self.stats.entries += 1
+            self.stats.size_bytes += len(data)
+            if self.max_bytes and self.stats.size_bytes > self.max_bytes:
+                self._evict(url)
+            self._conn.commit()
+
+    def _evict(self, keep: str):
+        """Drop least recently used entries until under max_bytes"""
+        # Buffered hits decide what is least recently used
+        self._write_accessed()
+        excess = self.stats.size_bytes - self.max_bytes
+        rows = self._conn.execute(
+            "SELECT url, size FROM cache WHERE url != ? ORDER BY accessed_at", (keep,)
+        )
+        victims = []
+        for url, size in rows:
+            if excess <= 0:
+                break
+            victims.append((url, size))
+            excess -= size
+        self._conn.executemany("DELETE FROM cache WHERE url = ?", [(url,) for url, _ in victims])
+        self.stats.evictions += len(victims)
+        for url, size in victims:
+            self._deleted(url, size)
+        for url, _ in victims:
+            self._removed(url)
+
+    def items(self) -> Iterator[Tuple[str, EducationalContent]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, data FROM cache WHERE expires_at IS NULL OR expires_at > ?",
+                (time.time(),)
+            ).fetchall()
+        for url, data in rows:
+            yield url, deserialize_content(data)
+
+    def index_records(self) -> Iterator[Tuple[str, IndexRecord]]:
+        """Index fields of all unexpired entries, read from their columns"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, is_valid, score, subject, grade_level FROM cache "
+                "WHERE expires_at IS NULL OR expires_at > ?",
+                (time.time(),)
+            ).fetchall()
+        for url, is_valid, score, subject, grade_level in rows:
+            yield url, (bool(is_valid), score, subject, grade_level)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self._accessed.clear()
+            self.stats.entries = 0
+            self.stats.size_bytes = 0
+
+    def flush(self):
+        """Write buffered access times"""
+        with self._lock:
+            self._write_accessed()
+            self._conn.commit()
+
+    def close(self):
+        """Write buffered access times and close the database connection"""
+        self.flush()
+        self._conn.close()
+
+class CacheIndex:
+    """Secondary indexes over cached content for filtered lookups"""
+
+    SCORE_BUCKETS = 10
+
+    def __init__(self):
+        self._records: Dict[str, IndexRecord] = {}
+        self._valid: Set[str] = set()
+        self._invalid: Set[str] = set()
+        self._score_buckets: Dict[int, Set[str]] = {}
+        self._subjects: Dict[str, Set[str]] = {}
+        self._grade_levels: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _bucket(cls, score: float) -> int:
+        return min(max(int(score * cls.SCORE_BUCKETS), 0), cls.SCORE_BUCKETS)
+
+    def add(self, url: str, content: EducationalContent):
+        """Index content stored under URL, replacing any previous entry"""
+        self.add_record(url, index_record(content))
+
+    def add_record(self, url: str, record: IndexRecord):
+        """Index the fields of an entry, replacing any previous entry"""
+        with self._lock:
+            self._discard(url)
+            self._records[url] = record
+            is_valid, score, subject, grade_level = record
+            (self._valid if is_valid else self._invalid).add(url)
+            if score is not None:
+                self._score_buckets.setdefault(self._bucket(score), set()).add(url)
+            if subject:
+                self._subjects.setdefault(subject, set()).add(url)
+            if grade_level:
+                self._grade_levels.setdefault(grade_level, set()).add(url)
+
+    def remove(self, url: str):
+        """Drop URL from all indexes"""
+        with self._lock:
+            self._discard(url)
+
+    def _discard(self, url: str):
+        record = self._records.pop(url, None)
+        if record is None:
+            return
+        _, score, subject, grade_level = record
+        self._valid.discard(url)
+        self._invalid.discard(url)
+        if score is not None:
+            self._score_buckets[self._bucket(score)].discard(url)
+        if subject:
+            self._subjects[subject].discard(url)
+        if grade_level:
+            self._grade_levels[grade_level].discard(url)
+
+    def clear(self):
+        """Drop all indexes"""
+        with self._lock:
+            self._records.clear()
+            self._valid.clear()
+            self._invalid.clear()
+            self._score_buckets.clear()
+            self._subjects.clear()
+            self._grade_levels.clear()
+
+    def query(
+        self,
+        valid: Optional[bool] = None,
+        min_score: Optional[float] = None,
+        subject: Optional[str] = None,
+        grade_level: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Lazily find URLs matching all given criteria
+
+        Only the smallest candidate set is copied under the lock: the
+        valid or invalid set, the subject or grade level set, or the score
+        buckets at or above min_score. Every other criterion is checked
+        per candidate, so cost follows the smallest candidate set rather
+        than the size of the cache.
+        """
+        subject = _index_key(subject)
+        grade_level = _index_key(grade_level)
+
+        with self._lock:
+            # (size, sets whose union is the candidates)
+            candidates: List[Tuple[int, List[Set[str]]]] = []
+            if valid is not None:
+                urls = self._valid if valid else self._invalid
+                candidates.append((len(urls), [urls]))
+            if subject is not None:
+                urls = self._subjects.get(subject, set())
+                candidates.append((len(urls), [urls]))
+            if grade_level is not None:
+                urls = self._grade_levels.get(grade_level, set())
+                candidates.append((len(urls), [urls]))
+            if min_score is not None:
+                first = self._bucket(min_score)
+                buckets = [urls for bucket, urls in self._score_buckets.items() if bucket >= first]
+                candidates.append((sum(len(urls) for urls in buckets), buckets))
+
+            if candidates:
+                _, sets = min(candidates, key=lambda candidate: candidate[0])
+                urls: Iterable[str] = [url for urls in sets for url in urls]
+            else:
+                urls = list(self._records)
+
+        for url in urls:
+            record = self._records.get(url)
+            if record is None:
+                continue
+            is_valid, score, record_subject, record_grade = record
+            if valid is not None and is_valid != valid:
+                continue
+            if min_score is not None and (score is None or score < min_score):
+                continue
+            if subject is not None and record_subject != subject:
+                continue
+            if grade_level is not None and record_grade != grade_level:
+                continue
+            yield url
 
 class CacheManager:
     """Manages caching of processed educational content"""
-    
-    def __init__(self):
-        self._cache: Dict[str, EducationalContent] = {}
-        
+
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self.backend = backend or MemoryBackend()
+        self.index = CacheIndex()
+        self.backend.on_remove = self.index.remove
+
+        # Persistent backends may already hold entries
+        for url, record in self.backend.index_records():
+            self.index.add_record(url, record)
+
     def get(self, url: str) -> Optional[EducationalContent]:
         """Get cached content for URL"""
-        return self._cache.get(url)
-        
+        return self.backend.get(url)
+
     def set(self, url: str, content: EducationalContent):
         """Cache content for URL"""
-        self._cache[url] = content
-        
+        self.backend.set(url, content)
+        self.index.add(url, content)
+
+    def query(
+        self,
+        valid: Optional[bool] = None,
+        min_score: Optional[float] = None,
+        subject: Optional[str] = None,
+        grade_level: Optional[str] = None
+    ) -> Iterator[EducationalContent]:
+        """
+        Lazily yield cached content matching all given criteria
+
+        Args:
+            valid: Only content whose validation result is (or is not) valid
+            min_score: Only content with a validation score >= min_score
+            subject: Only content with this subject (case-insensitive)
+            grade_level: Only content with this grade level (case-insensitive)
+        """
+        for url in self.index.query(valid, min_score, subject, grade_level):
+            content = self.backend.peek(url)
+            if content is None:
+                # Expired since it was indexed
+                self.index.remove(url)
+                continue
+            yield content
+
     def get_all_validated(self) -> List[EducationalContent]:
         """Get all validated content from cache"""
-        return [
-            content for content in self._cache.values()
-            if content.validation_result and content.validation_result.is_valid
-        ]
-        
+        return list(self.query(valid=True))
+
+    @property
+    def stats(self) -> CacheStats:
+        """Hit, miss and eviction counters of the backend"""
+        return self.backend.stats
+
     def clear(self):
         """Clear the cache"""
-        self._cache.clear()
\ No newline at end of file
+        self.backend.clear()
+        self.index.clear()
@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from firecrawl import FirecrawlApp
 from pydantic import BaseModel
@@ -6,8 +7,9 @@ from dotenv import load_dotenv
 
 from .validators import ContentValidator
 from .processors import ContentProcessor
-from .cache import CacheManager
+from .cache import CacheManager, MemoryBackend, SQLiteBackend
 from .metadata import MetadataExtractor
+from .ratelimit import HostRateLimiter
 from .models import EducationalContent, ContentMetadata
 
 load_dotenv()
@@ -19,6 +21,13 @@ class CrawlerConfig(BaseModel):
     content_types: List[str] = ["article", "lesson", "exercise", "video"]
     min_content_length: int = 100
     max_content_length: int = 50000
+    max_concurrent_requests: int = 1
+    requests_per_host_per_second: Optional[float] = None
+    host_burst: int = 1
+    cache_path: Optional[str] = None
+    cache_ttl_seconds: Optional[float] = None
+    cache_max_bytes: Optional[int] = None
+    cache_compact: bool = False
 
 class EducationalCrawler:
     """Main crawler class for educational content"""
@@ -39,9 +48,27 @@ class EducationalCrawler:
         # Initialize components
         self.app = FirecrawlApp(api_key=self.api_key)
         self.validator = ContentValidator(llm_api_key=self.llm_api_key)
-        self.processor = ContentProcessor()
-        self.cache = CacheManager()
+        self.processor = ContentProcessor(max_content_length=self.config.max_content_length)
+        self.cache = CacheManager(self._create_cache_backend())
         self.metadata = MetadataExtractor()
+        self.rate_limiter = HostRateLimiter(
+            self.config.requests_per_host_per_second,
+            self.config.host_burst
+        )
+
+    def _create_cache_backend(self):
+        """Create the cache backend described by the config"""
+        if self.config.cache_path:
+            return SQLiteBackend(
+                self.config.cache_path,
+                max_bytes=self.config.cache_max_bytes,
+                ttl=self.config.cache_ttl_seconds
+            )
+        return MemoryBackend(
+            max_bytes=self.config.cache_max_bytes,
+            ttl=self.config.cache_ttl_seconds,
+            compact=self.config.cache_compact
+        )
 
     def crawl_and_process(
         self, 
@@ -51,6 +78,9 @@ class EducationalCrawler:
     ) -> List[EducationalContent]:
         """
         Crawl educational content from provided URLs and process it
+
+        Cache misses are scraped by a pool of up to
+        ``config.max_concurrent_requests`` workers, throttled per host.
         
         Args:
             urls: List of URLs to crawl
@@ -58,10 +88,45 @@ class EducationalCrawler:
             extract_metadata: Whether to extract educational metadata
             
         Returns:
-            List of processed educational content
+            List of processed educational content, in the order of ``urls``
         """
-        results = []
-        
+        results: List[Optional[EducationalContent]] = [None] * len(urls)
+        pending: Dict[str, List[int]] = {}
+
+        for index, url in enumerate(urls):
+            # Check cache first
+            cached_content = self.cache.get(url)
+            if cached_content:
+                results[index] = cached_content
+            else:
+                pending.setdefault(url, []).append(index)
+
+        if self.config.max_concurrent_requests > 1 and len(pending) > 1:
+            workers = min(self.config.max_concurrent_requests, len(pending))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    url: executor.submit(self._crawl_url, url, validate, extract_metadata)
+                    for url in pending
+                }
+                for url, future in futures.items():
+                    processed_content = future.result()
+                    for index in pending[url]:
+                        results[index] = processed_content
+        else:
+            for url, indices in pending.items():
+                processed_content = self._crawl_url(url, validate, extract_metadata)
+                for index in indices:
+                    results[index] = processed_content
+
+        return results
+
+    def _crawl_url(
+        self,
+        url: str,
+        validate: bool,
+        extract_metadata: bool
+    ) -> EducationalContent:
+        """Scrape, process and cache a single URL"""
         # Define extraction schema for educational content
         schema = {
             "title": "string",
@@ -74,40 +139,34 @@ class EducationalCrawler:
             "license": "string"
         }
 
-        for url in urls:
-            # Check cache first
-            cached_content = self.cache.get(url)
-            if cached_content:
-                results.append(cached_content)
-                continue
-                
-            # Crawl content using firecrawl
-            crawled_data = self.app.scrape_url(
-                url,
-                params={
-                    "extractionSchema": schema,
-                    "maxPages": self.config.max_pages_per_site,
-                    "maxDepth": self.config.max_depth
-                }
-            )
-            
-            # Process raw content into educational content format
-            processed_content = self.processor.process(crawled_data)
-            
-            if validate:
-                # Validate content quality and educational value
-                processed_content = self.validator.validate(processed_content)
-                
-            if extract_metadata:
-                # Extract educational metadata
-                metadata = self.metadata.extract(processed_content)
-                processed_content.metadata = metadata
-                
-            # Cache the processed content
-            self.cache.set(url, processed_content)
-            results.append(processed_content)
-            
-        return results
+        # Wait for the host's rate limit before crawling
+        self.rate_limiter.acquire(url)
+
+        # Crawl content using firecrawl
+        crawled_data = self.app.scrape_url(
+            url,
+            params={
+                "extractionSchema": schema,
+                "maxPages": self.config.max_pages_per_site,
+                "maxDepth": self.config.max_depth
+            }
+        )
+
+        # Process raw content into educational content format
+        processed_content = self.processor.process(crawled_data)
+
+        if validate:
+            # Validate content quality and educational value
+            processed_content.validation_result = self.validator.validate(processed_content)
+
+        if extract_metadata:
+            # Extract educational metadata
+            metadata = self.metadata.extract(processed_content)
+            processed_content.metadata = metadata
+
+        # Cache the processed content
+        self.cache.set(url, processed_content)
+        return processed_content
 
     def get_validated_content(self) -> List[EducationalContent]:
         """Get all validated educational content"""
@@ -1,34 +1,275 @@
-from typing import Dict, Any, Optional
+import re
+from collections import Counter
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 from .models import EducationalContent, ContentMetadata
 
+# A pattern label is either fixed or computed from the match
+Label = Union[str, Callable[[re.Match], Optional[str]]]
+
+SUBJECT_KEYWORDS: Dict[str, List[str]] = {
+    "Mathematics": [
+        "algebra", "arithmetic", "calculus", "derivative", "integral", "equation",
+        "fraction", "geometry", "trigonometry", "polynomial", "theorem", "probability",
+        "statistics", "multiplication", "quadratic", "matrix", "linear function",
+    ],
+    "Physics": [
+        "physics", "velocity", "acceleration", "momentum", "newton", "gravity",
+        "kinetic energy", "electromagnetic", "quantum", "thermodynamics", "friction",
+    ],
+    "Chemistry": [
+        "chemistry", "molecule", "atom", "chemical reaction", "periodic table",
+        "electron", "compound", "acid", "covalent bond", "stoichiometry", "molar",
+    ],
+    "Biology": [
+        "biology", "cell", "photosynthesis", "dna", "evolution", "organism",
+        "ecosystem", "enzyme", "mitosis", "genetics", "protein", "species",
+    ],
+    "Computer Science": [
+        "programming", "algorithm", "python", "javascript", "variable", "function call",
+        "data structure", "recursion", "compiler", "database", "source code", "loop",
+    ],
+    "History": [
+        "history", "empire", "revolution", "civilization", "century", "dynasty",
+        "world war", "colonial", "ancient", "medieval", "treaty",
+    ],
+    "Language Arts": [
+        "grammar", "vocabulary", "poetry", "novel", "essay", "literature", "noun",
+        "verb", "paragraph", "punctuation", "narrative", "metaphor",
+    ],
+    "Geography": [
+        "geography", "continent", "climate", "latitude", "longitude", "river",
+        "mountain range", "population density", "map projection",
+    ],
+    "Economics": [
+        "economics", "supply and demand", "inflation", "market", "gdp", "interest rate",
+        "fiscal policy", "monetary policy", "opportunity cost",
+    ],
+}
+
+# Patterns are matched against lower-cased text and start with a literal so
+# the regex engine can skip ahead with a fast substring search
+LICENSE_PATTERNS: List[Tuple[str, Label]] = [
+    (r"\bcc[ -]?by(?:[ -]?(nc))?(?:[ -]?(sa|nd))?\b", lambda m: "-".join(["CC-BY", *filter(None, m.groups())]).upper()),
+    (r"creativecommons\.org/licenses/(by(?:-nc)?(?:-sa|-nd)?)", lambda m: f"CC-{m.group(1)}".upper()),
+    (r"creative commons attribution", "CC-BY"),
+    (r"cc0\b", "CC0"),
+    (r"creativecommons\.org/publicdomain/zero", "CC0"),
+    (r"public domain", "Public Domain"),
+    (r"gnu free documentation license", "GFDL"),
+    (r"gfdl\b", "GFDL"),
+    (r"mit license", "MIT"),
+    (r"all rights reserved", "All Rights Reserved"),
+]
+
+GRADE_MENTIONS: List[Tuple[str, Label]] = [
+    (r"grades? (k|\d{1,2})\b", lambda m: GRADE_NUMBERS.get(m.group(1))),
+    (r" grade\b", lambda m: GRADE_NUMBERS.get(m.string[max(0, m.start() - 9):m.start()].rsplit(" ", 1)[-1])),
+    (r"kindergarten", "Grade K-2"),
+    (r"elementary school", "Grade 3-5"),
+    (r"middle school", "Grade 6-8"),
+    (r"high school", "Grade 9-12"),
+    (r"undergraduate", "Undergraduate"),
+    (r"college", "Undergraduate"),
+    (r"university", "Undergraduate"),
+    (r"graduate student", "Graduate"),
+    (r"ph\.?d\b", "Graduate"),
+]
+
+_GRADE_BANDS = [("Grade K-2", 2), ("Grade 3-5", 5), ("Grade 6-8", 8), ("Grade 9-12", 12)]
+_ORDINALS = [
+    "first", "second", "third", "fourth", "fifth", "sixth",
+    "seventh", "eighth", "ninth", "tenth", "eleventh", "twelfth",
+]
+GRADE_NUMBERS: Dict[str, str] = {"k": "Grade K-2"}
+for _number in range(1, 13):
+    _band = next(band for band, upper in _GRADE_BANDS if _number <= upper)
+    GRADE_NUMBERS[str(_number)] = _band
+    GRADE_NUMBERS[_ORDINALS[_number - 1]] = _band
+
+_OBJECTIVE_PATTERNS = [
+    re.compile(r" will(?: be able to)? ([^.\n;]{3,200})"),
+    re.compile(r"objectives?: *([^.\n;]{3,200})"),
+    re.compile(r"learn how to ([^.\n;]{3,200})"),
+]
+_OBJECTIVE_SUBJECTS = {"you", "students", "learners", "learner", "student"}
+_PREREQUISITE_PATTERNS = [
+    re.compile(r"prerequisites?[:, -]+([^.\n;]{3,200})"),
+    re.compile(r"before you begin[:, -]+([^.\n;]{3,200})"),
+    re.compile(r"familiar(?:ity)? with ([^.\n;]{3,200})"),
+    re.compile(r"knowledge of ([^.\n;]{3,200})"),
+]
+_LIST_SPLIT = re.compile(r"\s*(?:,|\band\b|/)\s*")
+
+# Translation tables for single-pass tokenizing and syllable counting
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+_NON_LETTERS = str.maketrans({chr(c): " " for c in range(128) if chr(c) not in _LETTERS})
+_VOWELS_ONLY = str.maketrans({chr(c): " " for c in range(128) if chr(c) not in "aeiouy"})
+
+class ScannedText:
+    """Lower-cased text and its tokens, computed once per document"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lower = text.lower()
+        self.clean = self.lower.translate(_NON_LETTERS)
+        self.tokens = self.clean.split()
+        self._token_counts: Optional[Counter] = None
+
+    @property
+    def token_counts(self) -> Counter:
+        """Occurrences of each token"""
+        if self._token_counts is None:
+            self._token_counts = Counter(self.tokens)
+        return self._token_counts
+
+    def span(self, match: re.Match, group: int = 1) -> str:
+        """Text of a match found in the lower-cased text, in its original case"""
+        source = self.text if len(self.text) == len(self.lower) else self.lower
+        return source[match.start(group):match.end(group)].strip()
+
+class KeywordTable:
+    """
+    Keyword vocabulary matched through a token hash table
+
+    Single-word keywords are looked up in a token count table built in one
+    pass; multi-word phrases are counted with substring search.
+    """
+
+    def __init__(self, vocabularies: Dict[str, List[str]]):
+        self.words: Dict[str, str] = {}
+        # first word -> [(padded phrase, label)]
+        self.phrases: Dict[str, List[Tuple[str, str]]] = {}
+        for label, keywords in vocabularies.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if " " in keyword:
+                    self.phrases.setdefault(keyword.split()[0], []).append((f" {keyword} ", label))
+                else:
+                    self.words[keyword] = label
+
+    def count(self, scan: ScannedText) -> Counter:
+        """Count keyword hits per label"""
+        hits = Counter()
+        tokens = scan.token_counts
+        # Set intersection runs in C and leaves only the matching keywords
+        for word in tokens.keys() & self.words.keys():
+            hits[self.words[word]] += tokens[word]
+
+        padded = None
+        for first in tokens.keys() & self.phrases.keys():
+            padded = padded or f" {scan.clean} "
+            for phrase, label in self.phrases[first]:
+                found = padded.count(phrase)
+                if found:
+                    hits[label] += found
+        return hits
+
+class PatternTable:
+    """Ordered literal-prefixed regex patterns; the first match wins"""
+
+    def __init__(self, patterns: List[Tuple[str, Label]]):
+        self._patterns = [(re.compile(pattern), label) for pattern, label in patterns]
+
+    def first(self, lower_text: str) -> Optional[str]:
+        """Label of the first pattern found in lower-cased text"""
+        for pattern, label in self._patterns:
+            for match in pattern.finditer(lower_text):
+                found = label(match) if callable(label) else label
+                if found:
+                    return found
+        return None
+
+def readability_grade(text: str) -> float:
+    """Flesch-Kincaid grade level estimated in a single tokenizing pass"""
+    return _readability_grade(ScannedText(text))
+
+def _readability_grade(scan: ScannedText) -> float:
+    words = len(scan.tokens)
+    if not words:
+        return 0.0
+    text = scan.text
+    sentences = max(1, text.count(".") + text.count("!") + text.count("?"))
+    # Vowel groups approximate syllables; a trailing "e" is usually silent
+    vowel_groups = len(scan.lower.translate(_VOWELS_ONLY).split())
+    silent_e = f"{scan.clean} ".count("e ")
+    syllables = max(words, vowel_groups - silent_e)
+    return 0.39 * (words / sentences) + 11.8 * (syllables / words) - 15.59
+
+def grade_band(grade: float) -> str:
+    """Map a numeric grade level to a grade band"""
+    if grade < 3:
+        return "Grade K-2"
+    if grade < 6:
+        return "Grade 3-5"
+    if grade < 9:
+        return "Grade 6-8"
+    if grade < 13:
+        return "Grade 9-12"
+    if grade < 17:
+        return "Undergraduate"
+    return "Graduate"
+
 class MetadataExtractor:
     """Extracts educational metadata from content"""
-    
+
+    UNKNOWN = "unknown"
+
+    def __init__(
+        self,
+        llm_fallback: Optional[Callable[[EducationalContent], Dict[str, Any]]] = None,
+        min_confidence: float = 0.5,
+        max_scan_chars: int = 10000
+    ):
+        """
+        Args:
+            llm_fallback: Optional function returning metadata fields for content;
+                only called for fields whose heuristic confidence is below min_confidence
+            min_confidence: Confidence below which the LLM fallback is used
+            max_scan_chars: Number of leading characters scanned by the heuristics
+        """
+        self.llm_fallback = llm_fallback
+        self.min_confidence = min_confidence
+        self.max_scan_chars = max_scan_chars
+        self.subjects = KeywordTable(SUBJECT_KEYWORDS)
+        self.licenses = PatternTable(LICENSE_PATTERNS)
+        self.grade_mentions = PatternTable(GRADE_MENTIONS)
+
     def extract(self, content: EducationalContent) -> ContentMetadata:
         """
         Extract educational metadata from content
-        
+
         Args:
             content: Educational content to analyze
-            
+
         Returns:
             Extracted metadata
         """
+        # Lower-case and tokenize the scanned text once for all extractors
+        scan = ScannedText(content.content[:self.max_scan_chars])
+
         # Extract subject area
-        subject = self._extract_subject(content)
-        
+        subject, subject_confidence = self._extract_subject(content, scan)
+
         # Extract grade level
-        grade_level = self._extract_grade_level(content)
-        
+        grade_level, grade_confidence = self._extract_grade_level(content, scan)
+
         # Extract learning objectives
-        objectives = self._extract_learning_objectives(content)
-        
+        objectives = self._extract_learning_objectives(content, scan)
+
         # Extract prerequisites
-        prerequisites = self._extract_prerequisites(content)
-        
+        prerequisites = self._extract_prerequisites(content, scan)
+
         # Extract license information
-        license_info = self._extract_license(content)
-        
+        license_info = self._extract_license(content, scan)
+
+        # Fall back to the LLM only for low-confidence fields
+        if self.llm_fallback and min(subject_confidence, grade_confidence) < self.min_confidence:
+            suggested = self.llm_fallback(content) or {}
+            if subject_confidence < self.min_confidence:
+                subject = suggested.get("subject") or subject
+            if grade_confidence < self.min_confidence:
+                grade_level = suggested.get("grade_level") or grade_level
+
         return ContentMetadata(
             subject=subject,
             grade_level=grade_level,
@@ -36,33 +277,96 @@ class MetadataExtractor:
             prerequisites=prerequisites,
             license=license_info
         )
-        
-    def _extract_subject(self, content: EducationalContent) -> str:
-        """Extract subject area from content"""
-        # Implement subject extraction logic
-        # This could use keyword analysis or LLM classification
-        pass
-        
-    def _extract_grade_level(self, content: EducationalContent) -> str:
-        """Extract appropriate grade level"""
-        # Implement grade level extraction logic
-        # This could analyze content complexity
-        pass
-        
-    def _extract_learning_objectives(self, content: EducationalContent) -> List[str]:
+
+    def _extracted(self, content: EducationalContent, field: str) -> Optional[Any]:
+        """Value of a field from Firecrawl's schema extraction, if present"""
+        extracted = content.raw_data.get("extract") or content.raw_data.get("llm_extraction") or {}
+        return extracted.get(field) if isinstance(extracted, dict) else None
+
+    def _extract_subject(self, content: EducationalContent, scan: ScannedText) -> Tuple[str, float]:
+        """Extract subject area and a confidence score"""
+        extracted = self._extracted(content, "subject")
+        if extracted:
+            return extracted, 1.0
+
+        counts = self.subjects.count(scan)
+        # Title hits are strong evidence, count them twice
+        for subject, found in self.subjects.count(ScannedText(content.title)).items():
+            counts[subject] += 2 * found
+        if not counts:
+            return self.UNKNOWN, 0.0
+
+        (subject, top), *rest = counts.most_common(2)
+        runner_up = rest[0][1] if rest else 0
+        total = sum(counts.values())
+        # Share of hits, scaled down when there is little evidence
+        confidence = (top - runner_up / 2) / total * min(1.0, total / 5)
+        return subject, round(confidence, 3)
+
+    def _extract_grade_level(self, content: EducationalContent, scan: ScannedText) -> Tuple[str, float]:
+        """Extract appropriate grade level and a confidence score"""
+        extracted = self._extracted(content, "grade_level")
+        if extracted:
+            return extracted, 1.0
+
+        mentioned = self.grade_mentions.first(content.title.lower()) or self.grade_mentions.first(scan.lower)
+        if mentioned:
+            return mentioned, 0.9
+
+        if len(scan.tokens) < 40:
+            return self.UNKNOWN, 0.0
+        # Readability formulas are rough; trust them moderately
+        return grade_band(_readability_grade(scan)), 0.6
+
+    def _extract_learning_objectives(self, content: EducationalContent, scan: ScannedText) -> List[str]:
         """Extract learning objectives"""
-        # Implement learning objectives extraction
-        # This could use NLP to identify educational goals
-        pass
-        
-    def _extract_prerequisites(self, content: EducationalContent) -> List[str]:
+        extracted = self._extracted(content, "learning_objectives")
+        if extracted:
+            return list(extracted)
+
+        found = []
+        for pattern in _OBJECTIVE_PATTERNS:
+            for match in pattern.finditer(scan.lower):
+                if match.group(0).startswith(" will"):
+                    # Only "you will", "students will" and similar
+                    preceding = scan.lower[max(0, match.start() - 9):match.start()].rsplit(" ", 1)[-1]
+                    if preceding not in _OBJECTIVE_SUBJECTS:
+                        continue
+                found.append((match.start(1), -match.end(1), scan.span(match)))
+
+        # Patterns overlap ("will learn how to ..."), so skip an objective
+        # whose text lies inside one already taken
+        objectives = []
+        covered = 0
+        for start, neg_end, objective in sorted(found):
+            if -neg_end <= covered:
+                continue
+            covered = -neg_end
+            if objective not in objectives:
+                objectives.append(objective)
+        return objectives
+
+    def _extract_prerequisites(self, content: EducationalContent, scan: ScannedText) -> List[str]:
         """Extract prerequisite knowledge"""
-        # Implement prerequisites extraction
-        # This could analyze content dependencies
-        pass
-        
-    def _extract_license(self, content: EducationalContent) -> Optional[str]:
+        extracted = self._extracted(content, "prerequisites")
+        if extracted:
+            return list(extracted)
+
+        prerequisites = []
+        for pattern in _PREREQUISITE_PATTERNS:
+            for match in pattern.finditer(scan.lower):
+                for item in _LIST_SPLIT.split(scan.span(match)):
+                    item = item.strip()
+                    if item and item not in prerequisites:
+                        prerequisites.append(item)
+        return prerequisites
+
+    def _extract_license(self, content: EducationalContent, scan: ScannedText) -> Optional[str]:
         """Extract content license information"""
-        # Implement license extraction logic
-        # This could look for common license patterns
-        pass
\ No newline at end of file
+        extracted = self._extracted(content, "license")
+        if extracted:
+            return extracted
+
+        # License notices usually sit in the footer, so check the tail as well
+        tail = content.content[-2000:] if len(content.content) > self.max_scan_chars else ""
+        return self.licenses.first(scan.lower) or self.licenses.first(tail.lower())
@@ -1,4 +1,5 @@
-from typing import List, Dict, Any, Optional
+from array import array
+from typing import List, Dict, Any, Iterator, Optional
 from pydantic import BaseModel, Field
 
 class ContentChunk(BaseModel):
@@ -29,4 +30,127 @@ class EducationalContent(BaseModel):
     chunks: List[ContentChunk]
     metadata: Optional[ContentMetadata] = None
     validation_result: Optional[ValidationResult] = None
-    raw_data: Dict[str, Any]
\ No newline at end of file
+    raw_data: Dict[str, Any]
+
+class CompactContent:
+    """
+    Memory-efficient form of EducationalContent
+
+    Chunks are stored as offsets into the shared content string in parallel
+    arrays instead of as separate pydantic objects, and raw_data is kept only
+    on request. Convert back with to_content() when the full model is needed.
+    """
+
+    __slots__ = (
+        "title", "content", "metadata", "validation_result", "raw_data",
+        "_starts", "_ends", "_types", "_type_names", "_importance", "_spilled"
+    )
+
+    # Importance is stored as an integer in 1/10000ths while every value
+    # fits exactly, and as floats otherwise
+    IMPORTANCE_SCALE = 10000
+
+    def __init__(
+        self,
+        title: str,
+        content: str,
+        metadata: Optional[ContentMetadata] = None,
+        validation_result: Optional[ValidationResult] = None,
+        raw_data: Optional[Dict[str, Any]] = None
+    ):
+        self.title = title
+        self.content = content
+        self.metadata = metadata
+        self.validation_result = validation_result
+        self.raw_data = raw_data
+        self._starts = array("I")
+        self._ends = array("I")
+        # Chunk types are stored as indexes into this content's own table
+        self._types = array("B")
+        self._type_names: List[str] = []
+        self._importance = array("H")
+        # chunk index -> text, for chunks that are not slices of content
+        self._spilled: Optional[Dict[int, str]] = None
+
+    def _append_type(self, name: str):
+        try:
+            type_id = self._type_names.index(name)
+        except ValueError:
+            type_id = len(self._type_names)
+            self._type_names.append(name)
+            if type_id > 0xFF and self._types.typecode == "B":
+                self._types = array("I", self._types)
+        self._types.append(type_id)
+
+    def _append_importance(self, importance: float):
+        if self._importance.typecode == "H":
+            scaled = round(importance * self.IMPORTANCE_SCALE)
+            if 0 <= scaled <= 0xFFFF and scaled / self.IMPORTANCE_SCALE == importance:
+                self._importance.append(scaled)
+                return
+            self._importance = array("d", (value / self.IMPORTANCE_SCALE for value in self._importance))
+        self._importance.append(importance)
+
+    @classmethod
+    def from_content(cls, content: "EducationalContent", keep_raw_data: bool = False) -> "CompactContent":
+        """Build the compact form of content"""
+        compact = cls(
+            title=content.title,
+            content=content.content,
+            metadata=content.metadata,
+            validation_result=content.validation_result,
+            raw_data=content.raw_data if keep_raw_data else None
+        )
+        cursor = 0
+        for index, chunk in enumerate(content.chunks):
+            start = content.content.find(chunk.text, cursor) if chunk.text else -1
+            if start == -1:
+                start = end = 0
+                if compact._spilled is None:
+                    compact._spilled = {}
+                compact._spilled[index] = chunk.text
+            else:
+                end = start + len(chunk.text)
+                cursor = end
+            compact._starts.append(start)
+            compact._ends.append(end)
+            compact._append_type(chunk.type)
+            compact._append_importance(chunk.importance)
+        return compact
+
+    def __len__(self) -> int:
+        """Number of chunks"""
+        return len(self._starts)
+
+    def chunk_text(self, index: int) -> str:
+        """Text of one chunk"""
+        if self._spilled and index in self._spilled:
+            return self._spilled[index]
+        return self.content[self._starts[index]:self._ends[index]]
+
+    def chunk(self, index: int) -> ContentChunk:
+        """Materialize one chunk as a ContentChunk"""
+        importance = self._importance[index]
+        if self._importance.typecode == "H":
+            importance /= self.IMPORTANCE_SCALE
+        return ContentChunk(
+            text=self.chunk_text(index),
+            type=self._type_names[self._types[index]],
+            importance=importance
+        )
+
+    def iter_chunks(self) -> Iterator[ContentChunk]:
+        """Lazily materialize all chunks"""
+        for index in range(len(self)):
+            yield self.chunk(index)
+
+    def to_content(self) -> "EducationalContent":
+        """Convert back to the full pydantic model"""
+        return EducationalContent(
+            title=self.title,
+            content=self.content,
+            chunks=list(self.iter_chunks()),
+            metadata=self.metadata,
+            validation_result=self.validation_result,
+            raw_data=self.raw_data or {}
+        )
@@ -1,49 +1,336 @@
-from typing import List, Dict, Any
+import re
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from .models import EducationalContent, ContentChunk
 
+# A block is a (kind, text) pair where kind is "heading", "text" or "code"
+Block = Tuple[str, str]
+
+_WHITESPACE = re.compile(r"\s+")
+_MD_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_MD_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_MD_CODE_SPAN = re.compile(r"(`+)(.+?)\1")
+# Emphasis needs a matching closing delimiter and text that starts and ends
+# next to it, so "2 * 3 * 4" keeps its asterisks. Underscores only emphasize
+# text with a space in it, so identifiers like __init__ are left alone.
+_MD_EMPHASIS = re.compile(
+    r"(?<![\w*])(\*{1,3})(?=[^\s*])(.+?)(?<=[^\s*])\1(?![\w*])"
+    r"|(?<![\w_])(__|_)(?=[^\s_])([^_]*?\s[^_]*?)(?<=[^\s_])\3(?![\w_])"
+)
+_MD_HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+_MD_LIST_MARKER = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+_CHUNK_TYPES = [
+    ("definition", re.compile(r"\b(is defined as|refers to|is called|means that|definition)\b", re.I)),
+    ("example", re.compile(r"\b(for example|for instance|e\.g\.|example)\b", re.I)),
+    ("exercise", re.compile(r"\b(exercise|practice|try it|quiz|question)\b", re.I)),
+    ("summary", re.compile(r"\b(in summary|to summarize|key takeaways?|summary|in conclusion)\b", re.I)),
+]
+
+_IMPORTANCE = {
+    "definition": 0.9,
+    "summary": 0.8,
+    "exercise": 0.7,
+    "example": 0.6,
+    "code": 0.6,
+    "explanation": 0.5,
+}
+
+def _strip_emphasis(text: str) -> str:
+    """Remove emphasis and code span delimiters, keeping code spans verbatim"""
+    pieces = []
+    start = 0
+    for span in _MD_CODE_SPAN.finditer(text):
+        pieces.append(_MD_EMPHASIS.sub(_emphasis_text, text[start:span.start()]))
+        pieces.append(span.group(2))
+        start = span.end()
+    pieces.append(_MD_EMPHASIS.sub(_emphasis_text, text[start:]))
+    return "".join(pieces)
+
+def _emphasis_text(match: "re.Match[str]") -> str:
+    return match.group(2) if match.group(1) else match.group(4)
+
+def _iter_lines(text: str) -> Iterator[str]:
+    """Yield lines of text without building a list of all lines"""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find("\n", start)
+        if end == -1:
+            end = length
+        yield text[start:end]
+        start = end + 1
+
+class _HTMLBlockParser(HTMLParser):
+    """Incremental HTML parser that emits text blocks at block-level tags"""
+
+    BLOCK_TAGS = {
+        "p", "div", "section", "article", "main", "li", "ul", "ol", "table",
+        "tr", "td", "th", "blockquote", "br", "dd", "dt", "figcaption",
+        "h1", "h2", "h3", "h4", "h5", "h6", "pre",
+    }
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "footer"}
+    HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Block] = []
+        self._buffer: List[str] = []
+        self._kind = "text"
+        self._skip_depth = 0
+
+    def _flush(self):
+        if self._buffer:
+            self.blocks.append((self._kind, "".join(self._buffer)))
+            self._buffer = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS and not self._skip_depth:
+            self._flush()
+            if tag in self.HEADING_TAGS:
+                self._kind = "heading"
+            elif tag == "pre":
+                self._kind = "code"
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS and not self._skip_depth:
+            self._flush()
+            self._kind = "text"
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._buffer.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
 class ContentProcessor:
     """Processes raw crawled content into structured educational content"""
-    
+
+    def __init__(
+        self,
+        max_content_length: int = 50000,
+        chunk_size: int = 1000,
+        html_feed_size: int = 65536
+    ):
+        self.max_content_length = max_content_length
+        self.chunk_size = chunk_size
+        self.html_feed_size = html_feed_size
+
     def process(self, raw_content: Dict[str, Any]) -> EducationalContent:
         """
         Process raw crawled content into educational content format
-        
+
         Args:
             raw_content: Raw content from crawler
-            
+
         Returns:
             Processed educational content
         """
-        # Extract relevant fields from raw content
-        content = self._extract_content(raw_content)
-        
-        # Clean and normalize content
-        content = self._clean_content(content)
-        
-        # Split content into propositions for better retrieval
-        chunks = self._create_chunks(content)
-        
+        parts: List[str] = []
+
+        def record(blocks: Iterable[Block]) -> Iterator[Block]:
+            for block in blocks:
+                parts.append(block[1])
+                yield block
+
+        # Extract, clean and chunk in a single pass over the blocks
+        blocks = self._clean_content(self._extract_content(raw_content))
+        chunks = list(self._create_chunks(record(blocks)))
+
         return EducationalContent(
-            title=raw_content.get("title", ""),
-            content=content,
+            title=self._extract_title(raw_content),
+            content="\n\n".join(parts),
             chunks=chunks,
             raw_data=raw_content
         )
-        
-    def _extract_content(self, raw_content: Dict[str, Any]) -> str:
-        """Extract main content from raw data"""
-        # Implement content extraction logic
-        # This could use BeautifulSoup or similar for HTML processing
-        pass
-        
-    def _clean_content(self, content: str) -> str:
-        """Clean and normalize content"""
-        # Implement content cleaning logic
-        # This could remove unwanted characters, normalize whitespace, etc.
-        pass
-        
-    def _create_chunks(self, content: str) -> List[ContentChunk]:
-        """Split content into semantic chunks/propositions"""
-        # Implement content chunking logic
-        # This could use NLP to split into semantic units
-        pass
\ No newline at end of file
+
+    def iter_chunks(self, raw_content: Dict[str, Any]) -> Iterator[ContentChunk]:
+        """
+        Lazily yield content chunks from raw crawled content
+
+        Only the block being parsed and the chunk being built are held in
+        memory, so this is suitable for very large pages.
+        """
+        return self._create_chunks(self._clean_content(self._extract_content(raw_content)))
+
+    def _extract_title(self, raw_content: Dict[str, Any]) -> str:
+        """Extract the page title from raw data"""
+        metadata = raw_content.get("metadata") or {}
+        return raw_content.get("title") or metadata.get("title") or ""
+
+    def _extract_content(self, raw_content: Dict[str, Any]) -> Iterator[Block]:
+        """Extract main content blocks from raw data"""
+        extracted = raw_content.get("extract") or raw_content.get("llm_extraction") or {}
+        if raw_content.get("markdown"):
+            return self._iter_markdown_blocks(raw_content["markdown"])
+        if raw_content.get("html"):
+            return self._iter_html_blocks(raw_content["html"])
+        if isinstance(extracted, dict) and extracted.get("content"):
+            return self._iter_markdown_blocks(extracted["content"])
+        return self._iter_markdown_blocks(raw_content.get("content") or "")
+
+    def _iter_markdown_blocks(self, markdown: str) -> Iterator[Block]:
+        """Split markdown into heading, paragraph and code blocks"""
+        paragraph: List[str] = []
+        code: Optional[List[str]] = None
+
+        for line in _iter_lines(markdown):
+            if code is not None:
+                if line.lstrip().startswith("```"):
+                    yield ("code", "\n".join(code))
+                    code = None
+                else:
+                    code.append(line)
+                continue
+
+            if line.lstrip().startswith("```"):
+                if paragraph:
+                    yield ("text", " ".join(paragraph))
+                    paragraph = []
+                code = []
+                continue
+
+            heading = _MD_HEADING.match(line)
+            if heading:
+                if paragraph:
+                    yield ("text", " ".join(paragraph))
+                    paragraph = []
+                yield ("heading", heading.group(2))
+            elif not line.strip():
+                if paragraph:
+                    yield ("text", " ".join(paragraph))
+                    paragraph = []
+            else:
+                if _MD_LIST_MARKER.match(line) and paragraph:
+                    yield ("text", " ".join(paragraph))
+                    paragraph = []
+                paragraph.append(_MD_LIST_MARKER.sub("", line))
+
+        if code:
+            yield ("code", "\n".join(code))
+        if paragraph:
+            yield ("text", " ".join(paragraph))
+
+    def _iter_html_blocks(self, html: str) -> Iterator[Block]:
+        """Parse HTML incrementally into heading, paragraph and code blocks"""
+        parser = _HTMLBlockParser()
+        for start in range(0, len(html), self.html_feed_size):
+            parser.feed(html[start:start + self.html_feed_size])
+            yield from parser.blocks
+            parser.blocks = []
+        parser.close()
+        yield from parser.blocks
+
+    def _clean_content(self, blocks: Iterable[Block]) -> Iterator[Block]:
+        """Clean and normalize blocks, stopping at max_content_length"""
+        remaining = self.max_content_length
+        for kind, text in blocks:
+            if kind == "code":
+                text = text.strip("\n")
+            else:
+                text = _MD_IMAGE.sub("", text)
+                text = _MD_LINK.sub(r"\1", text)
+                text = _strip_emphasis(text)
+                text = _WHITESPACE.sub(" ", text).strip()
+            if not text:
+                continue
+
+            if len(text) >= remaining:
+                yield (kind, text[:remaining])
+                return
+            yield (kind, text)
+            # Later blocks also need room for the blank line before them
+            remaining -= len(text) + 2
+            if remaining <= 0:
+                return
+
+    def _create_chunks(self, blocks: Iterable[Block]) -> Iterator[ContentChunk]:
+        """Group blocks into chunks of up to chunk_size characters"""
+        heading = ""
+        parts: List[str] = []
+        size = 0
+        section_start = True
+        starts_section = True
+
+        for kind, text in blocks:
+            if kind == "heading":
+                if parts:
+                    yield self._make_chunk(parts, heading, starts_section)
+                    parts, size = [], 0
+                heading = text
+                section_start = True
+                continue
+
+            for piece in self._split_block(kind, text):
+                # size counts each part with the blank line that follows it
+                if parts and (kind == "code" or size + len(piece) > self.chunk_size):
+                    yield self._make_chunk(parts, heading, starts_section)
+                    parts, size = [], 0
+                if not parts:
+                    starts_section = section_start
+                    section_start = False
+                parts.append(piece)
+                size += len(piece) + 2
+                if kind == "code":
+                    yield self._make_chunk(parts, heading, starts_section, "code")
+                    parts, size = [], 0
+
+        if parts:
+            yield self._make_chunk(parts, heading, starts_section)
+
+    def _split_block(self, kind: str, text: str) -> Iterator[str]:
+        """Split an oversized block at sentence boundaries"""
+        if len(text) <= self.chunk_size or kind == "code":
+            yield text
+            return
+
+        piece = ""
+        for sentence in _SENTENCE_END.split(text):
+            while len(sentence) > self.chunk_size:
+                if piece:
+                    yield piece
+                    piece = ""
+                yield sentence[:self.chunk_size]
+                sentence = sentence[self.chunk_size:]
+            if piece and len(piece) + len(sentence) + 1 > self.chunk_size:
+                yield piece
+                piece = ""
+            piece = f"{piece} {sentence}" if piece else sentence
+        if piece:
+            yield piece
+
+    def _make_chunk(
+        self,
+        parts: List[str],
+        heading: str,
+        starts_section: bool,
+        chunk_type: Optional[str] = None
+    ) -> ContentChunk:
+        """Build a chunk and score its type and importance"""
+        # Joined like the processed content, so chunks are slices of it
+        text = "\n\n".join(parts)
+        chunk_type = chunk_type or self._classify(f"{heading} {text[:200]}")
+
+        importance = _IMPORTANCE[chunk_type]
+        if starts_section and heading:
+            importance += 0.1
+
+        return ContentChunk(
+            text=text,
+            type=chunk_type,
+            importance=round(min(importance, 1.0), 2)
+        )
+
+    def _classify(self, text: str) -> str:
+        """Guess the chunk type from cue phrases"""
+        for chunk_type, pattern in _CHUNK_TYPES:
+            if pattern.search(text):
+                return chunk_type
+        return "explanation"
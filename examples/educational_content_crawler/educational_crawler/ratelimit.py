@@ -0,0 +1,88 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a fixed rate"""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        if capacity < 1:
+            raise ValueError("Token bucket capacity must be at least 1")
+
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Add tokens accrued since the last update"""
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available
+
+        Returns:
+            0.0 if a token was taken, otherwise seconds until one is available
+        """
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            self._sleep(wait)
+
+class HostRateLimiter:
+    """Keeps one token bucket per URL host"""
+
+    def __init__(
+        self,
+        rate: Optional[float],
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        """Get or create the bucket for a host"""
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst, self._clock, self._sleep)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str):
+        """Block until a request to the URL's host is allowed"""
+        if not self.rate:
+            return
+        self._bucket(urlparse(url).netloc.lower()).acquire()
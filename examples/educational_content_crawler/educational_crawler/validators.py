@@ -1,86 +1,275 @@
-from typing import List, Dict, Optional
-from pydantic import BaseModel
-from .models import EducationalContent
+import hashlib
+import json
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional
+from .models import EducationalContent, ValidationResult
 
-class ValidationResult(BaseModel):
-    """Result of content validation"""
-    is_valid: bool
-    score: float
-    issues: List[str] = []
-    improvements: List[str] = []
+CHECKS = ("educational_value", "accuracy", "age_appropriate")
+
+def content_hash(content: EducationalContent) -> str:
+    """Stable hash of the parts of content that validation looks at"""
+    digest = hashlib.sha256()
+    digest.update(content.title.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(content.content.encode("utf-8"))
+    # Scorers may use chunk types, e.g. HeuristicScorer's educational value
+    for chunk in content.chunks:
+        digest.update(b"\0")
+        digest.update(chunk.type.encode("utf-8"))
+    return digest.hexdigest()
+
+class ContentScorer(ABC):
+    """Scores content for a single validation check"""
+
+    @abstractmethod
+    def score(self, check: str, content: EducationalContent) -> ValidationResult:
+        """Score content for one of CHECKS"""
+
+    def score_batch(self, check: str, contents: List[EducationalContent]) -> List[ValidationResult]:
+        """Score several items for one check; override to batch remote calls"""
+        return [self.score(check, content) for content in contents]
+
+class HeuristicScorer(ContentScorer):
+    """Deterministic local scorer used when no LLM is configured"""
+
+    DEFINITION = re.compile(r"\b(is defined as|refers to|is called|means that|definition)\b", re.I)
+    EXAMPLE = re.compile(r"\b(for example|for instance|e\.g\.|example)\b", re.I)
+    EXERCISE = re.compile(r"\b(exercise|practice|quiz|question|try it)\b", re.I)
+    UNSOURCED = re.compile(r"(citation needed|\[\?\]|rumou?r has it|some people say)", re.I)
+    MATURE = re.compile(r"\b(gore|explicit|porn\w*|gambling|narcotics?)\b", re.I)
+
+    def score(self, check: str, content: EducationalContent) -> ValidationResult:
+        return getattr(self, f"_score_{check}")(content)
+
+    def _score_educational_value(self, content: EducationalContent) -> ValidationResult:
+        text = content.content
+        chunk_types = {chunk.type for chunk in content.chunks}
+        improvements = []
+
+        score = 0.3 + 0.2 * min(len(text) / 2000, 1.0)
+        if "definition" in chunk_types or self.DEFINITION.search(text):
+            score += 0.2
+        else:
+            improvements.append("Define the key concepts explicitly")
+        if "example" in chunk_types or self.EXAMPLE.search(text):
+            score += 0.2
+        else:
+            improvements.append("Add worked examples")
+        if "exercise" in chunk_types or self.EXERCISE.search(text):
+            score += 0.1
+        else:
+            improvements.append("Add practice exercises")
+
+        return ValidationResult(is_valid=score >= 0.7, score=round(score, 3), improvements=improvements)
+
+    def _score_accuracy(self, content: EducationalContent) -> ValidationResult:
+        flags = len(self.UNSOURCED.findall(content.content))
+        score = max(0.0, 0.9 - 0.1 * flags)
+        improvements = ["Cite sources for unsupported claims"] if flags else []
+        return ValidationResult(is_valid=score >= 0.8, score=score, improvements=improvements)
+
+    def _score_age_appropriate(self, content: EducationalContent) -> ValidationResult:
+        flags = len(self.MATURE.findall(content.content))
+        improvements = ["Remove mature themes"] if flags else []
+        return ValidationResult(
+            is_valid=flags == 0,
+            score=max(0.0, 1.0 - 0.25 * flags),
+            improvements=improvements
+        )
+
+class LLMScorer(ContentScorer):
+    """Scores content by prompting an LLM for a JSON verdict"""
+
+    PROMPTS = {
+        "educational_value": "Rate the educational value (clarity, learning objectives, depth)",
+        "accuracy": "Rate the factual accuracy",
+        "age_appropriate": "Rate how age-appropriate the content is for school students",
+    }
+
+    def __init__(self, complete: Callable[[str], str], max_chars: int = 8000):
+        """
+        Args:
+            complete: Function sending a prompt to the LLM and returning its reply
+            max_chars: Maximum number of content characters included in a prompt
+        """
+        self.complete = complete
+        self.max_chars = max_chars
+
+    def score(self, check: str, content: EducationalContent) -> ValidationResult:
+        prompt = (
+            f"{self.PROMPTS[check]} of the following educational content on a scale "
+            "from 0 to 1. Reply with JSON: "
+            '{"score": <float>, "is_valid": <bool>, "improvements": [<string>, ...]}\n\n'
+            f"Title: {content.title}\n\n{content.content[:self.max_chars]}"
+        )
+        try:
+            return ValidationResult.model_validate(json.loads(self.complete(prompt)))
+        except (ValueError, TypeError):
+            return ValidationResult(is_valid=False, score=0.0, issues=["Unparseable LLM response"])
 
 class ContentValidator:
     """Validates educational content quality and appropriateness"""
-    
-    def __init__(self, llm_api_key: Optional[str] = None):
+
+    def __init__(
+        self,
+        llm_api_key: Optional[str] = None,
+        scorer: Optional[ContentScorer] = None,
+        batch_size: int = 32,
+        max_cached_results: int = 100000
+    ):
         self.llm_api_key = llm_api_key
-        
+        self.scorer = scorer or HeuristicScorer()
+        self.batch_size = batch_size
+        self.max_cached_results = max_cached_results
+        self._results: "OrderedDict[str, ValidationResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
     def validate(self, content: EducationalContent) -> ValidationResult:
         """
         Validate educational content using multiple criteria
-        
+
         Args:
             content: Educational content to validate
-            
+
         Returns:
             ValidationResult with quality score and improvement suggestions
         """
+        return self.validate_many([content])[0]
+
+    def validate_many(self, contents: List[EducationalContent]) -> List[ValidationResult]:
+        """
+        Validate several items, running the three checks concurrently per batch
+
+        Results are memoized by content hash, so identical or re-crawled
+        pages are only scored once. The checks run on a thread pool that is
+        created on first use and reused until close().
+
+        Args:
+            contents: Educational content to validate
+
+        Returns:
+            ValidationResults in the same order as contents
+        """
+        hashes = [content_hash(content) for content in contents]
+        results: List[Optional[ValidationResult]] = [None] * len(contents)
+        pending: Dict[str, EducationalContent] = {}
+
+        with self._lock:
+            for index, key in enumerate(hashes):
+                cached = self._results.get(key)
+                if cached is not None:
+                    self._results.move_to_end(key)
+                    results[index] = cached
+                else:
+                    pending.setdefault(key, contents[index])
+
+        if pending:
+            # Results of this call are kept here, since the memo may evict
+            # them before the call ends when it scores more than it can hold
+            computed: Dict[str, ValidationResult] = {}
+            executor = self._get_executor()
+            keys = list(pending)
+            for start in range(0, len(keys), self.batch_size):
+                batch_keys = keys[start:start + self.batch_size]
+                batch = [pending[key] for key in batch_keys]
+                futures = [
+                    executor.submit(self.scorer.score_batch, check, batch)
+                    for check in CHECKS
+                ]
+                scores = [future.result() for future in futures]
+                for key, content, edu_value, accuracy, age_appropriate in zip(
+                    batch_keys, batch, *scores
+                ):
+                    computed[key] = self._combine(content, edu_value, accuracy, age_appropriate)
+                    self._remember(key, computed[key])
+
+            for index, key in enumerate(hashes):
+                if results[index] is None:
+                    results[index] = computed[key]
+
+        return results
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=len(CHECKS))
+            return self._executor
+
+    def close(self):
+        """Shut down the thread pool used to run checks"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _remember(self, key: str, result: ValidationResult):
+        """Memoize a result, dropping the least recently used beyond the limit"""
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_cached_results:
+                self._results.popitem(last=False)
+
+    def _combine(
+        self,
+        content: EducationalContent,
+        edu_value: ValidationResult,
+        accuracy: ValidationResult,
+        age_appropriate: ValidationResult
+    ) -> ValidationResult:
+        """Combine per-check results into an overall validation result"""
         issues = []
         improvements = []
-        
+
         # Check content length
         if len(content.content) < 100:
             issues.append("Content is too short")
             improvements.append("Expand content to provide more detail")
-            
-        # Validate educational value using LLM
-        edu_value = self._validate_educational_value(content)
+
+        # Validate educational value
         if edu_value.score < 0.7:
             issues.append("Low educational value")
             improvements.extend(edu_value.improvements)
-            
+
         # Check content accuracy
-        accuracy = self._validate_accuracy(content)
         if accuracy.score < 0.8:
             issues.append("Potential accuracy issues")
             improvements.extend(accuracy.improvements)
-            
+
         # Validate age-appropriateness
-        age_appropriate = self._validate_age_appropriate(content)
         if not age_appropriate.is_valid:
             issues.append("Content may not be age-appropriate")
             improvements.extend(age_appropriate.improvements)
-            
+
         # Calculate overall score
         score = self._calculate_score(edu_value.score, accuracy.score, len(issues))
-        
+
         return ValidationResult(
             is_valid=score >= 0.7 and len(issues) < 3,
             score=score,
             issues=issues,
             improvements=improvements
         )
-        
+
     def _validate_educational_value(self, content: EducationalContent) -> ValidationResult:
         """Validate educational value of content"""
-        # Implement educational value validation logic
-        # This could use LLMs to assess learning objectives, clarity, etc.
-        pass
-        
+        return self.scorer.score("educational_value", content)
+
     def _validate_accuracy(self, content: EducationalContent) -> ValidationResult:
         """Validate content accuracy"""
-        # Implement accuracy validation logic
-        # This could use fact-checking against reliable sources
-        pass
-        
+        return self.scorer.score("accuracy", content)
+
     def _validate_age_appropriate(self, content: EducationalContent) -> ValidationResult:
         """Validate age-appropriateness of content"""
-        # Implement age-appropriateness validation logic
-        # This could check language complexity, content themes, etc.
-        pass
-        
+        return self.scorer.score("age_appropriate", content)
+
     def _calculate_score(self, edu_value: float, accuracy: float, issue_count: int) -> float:
         """Calculate overall content quality score"""
         base_score = (edu_value * 0.5) + (accuracy * 0.5)
         penalty = issue_count * 0.1
-        return max(0.0, base_score - penalty)
\ No newline at end of file
+        return max(0.0, base_score - penalty)
@@ -0,0 +1,42 @@
+import gc
+import tracemalloc
+from educational_crawler import ContentProcessor
+from educational_crawler.models import CompactContent
+
+def make_page(i: int) -> dict:
+    """Build a synthetic scraped page of a few kilobytes"""
+    sections = []
+    for s in range(4):
+        sections.append(f"## Topic {i}.{s}")
+        sections.append(f"Concept {i}.{s} is defined as a building block of the unit. " * 6)
+        sections.append(f"For example, exercise {i}.{s} applies the concept step by step. " * 4)
+    markdown = "\n\n".join(sections)
+    return {"markdown": markdown, "metadata": {"title": f"Lesson {i}", "sourceURL": f"https://example.com/{i}"}}
+
+def measure(build) -> int:
+    """Bytes still allocated after build() returns its result"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+def main(count: int = 10000):
+    processor = ContentProcessor(chunk_size=300)
+
+    # Pages are scraped inside each measurement so raw_data is only held by the items
+    full = measure(lambda: [processor.process(make_page(i)) for i in range(count)])
+    compact = measure(lambda: [
+        CompactContent.from_content(processor.process(make_page(i))) for i in range(count)
+    ])
+
+    print(f"{count:,} items, {len(processor.process(make_page(0)).chunks)} chunks each")
+    print(f"EducationalContent: {full / 1024 / 1024:8.1f} MiB ({full / count:,.0f} bytes/item)")
+    print(f"CompactContent:     {compact / 1024 / 1024:8.1f} MiB ({compact / count:,.0f} bytes/item)")
+    print(f"Saved:              {1 - compact / full:8.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import random
+import time
+from educational_crawler import MetadataExtractor
+from educational_crawler.models import EducationalContent
+
+SENTENCES = [
+    "A derivative measures the rate of change of a function.",
+    "Photosynthesis converts light energy into chemical energy in the cell.",
+    "The French Revolution transformed European politics in the eighteenth century.",
+    "A variable in Python stores a reference to a value.",
+    "Supply and demand determine the market price of a good.",
+    "You will be able to explain how enzymes speed up reactions.",
+    "Prerequisites: basic algebra and fractions.",
+    "Students in middle school often find this topic challenging.",
+]
+
+def make_documents(count: int, sentences_per_doc: int = 40) -> list:
+    """Build synthetic lesson pages of a few thousand characters each"""
+    rng = random.Random(0)
+    documents = []
+    for i in range(count):
+        text = " ".join(rng.choice(SENTENCES) for _ in range(sentences_per_doc))
+        documents.append(EducationalContent(
+            title=f"Lesson {i}",
+            content=text + "\n\nLicensed under CC BY 4.0.",
+            chunks=[],
+            raw_data={}
+        ))
+    return documents
+
+def main():
+    extractor = MetadataExtractor()
+    for sentences_per_doc in (10, 40, 160):
+        documents = make_documents(10000, sentences_per_doc)
+        chars = sum(len(doc.content) for doc in documents) / len(documents)
+
+        start = time.perf_counter()
+        for doc in documents:
+            extractor.extract(doc)
+        elapsed = time.perf_counter() - start
+
+        print(f"{chars:>8,.0f} chars/doc  {len(documents) / elapsed:>10,.0f} docs/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import time
+import tracemalloc
+from educational_crawler import ContentProcessor
+
+def make_markdown(sections: int) -> str:
+    """Build a synthetic lesson page in markdown"""
+    parts = []
+    for i in range(sections):
+        parts.append(f"## Section {i}")
+        parts.append("A derivative is defined as the rate of change of a function. " * 8)
+        parts.append("For example, the derivative of x squared is 2x. " * 6)
+        parts.append("```\ndef f(x):\n    return x ** 2\n```")
+        parts.append("- Exercise: differentiate x cubed\n- Exercise: differentiate sin(x)")
+    return "\n\n".join(parts)
+
+def make_html(sections: int) -> str:
+    """Build a synthetic lesson page in HTML"""
+    parts = ["<html><head><script>trackPageView();</script></head><body>"]
+    for i in range(sections):
+        parts.append(f"<h2>Section {i}</h2>")
+        parts.append("<p>" + "A cell is the basic unit of life. " * 10 + "</p>")
+        parts.append("<p>" + "For example, <b>red blood cells</b> carry oxygen. " * 6 + "</p>")
+        parts.append("<ul><li>Exercise: label the nucleus</li><li>Quiz: name two organelles</li></ul>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+def bench(name: str, processor: ContentProcessor, raw_content: dict, field: str, rounds: int = 20):
+    """Report chars/sec and peak memory for streaming and full processing"""
+    chars = len(raw_content[field])
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _ in processor.iter_chunks(raw_content):
+            pass
+    elapsed = time.perf_counter() - start
+
+    # Peak memory is measured separately since tracing slows everything down
+    tracemalloc.start()
+    for _ in processor.iter_chunks(raw_content):
+        pass
+    _, stream_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        processor.process(raw_content)
+    process_elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<10} {chars:>10,} chars  "
+        f"iter_chunks {chars * rounds / elapsed:>14,.0f} chars/sec "
+        f"(peak {stream_peak / 1024:,.0f} KiB)  "
+        f"process {chars * rounds / process_elapsed:>14,.0f} chars/sec"
+    )
+
+def main():
+    for sections in (20, 100, 500):
+        markdown = make_markdown(sections)
+        html = make_html(sections)
+        processor = ContentProcessor(max_content_length=max(len(markdown), len(html)))
+        bench("markdown", processor, {"markdown": markdown}, "markdown")
+        bench("html", processor, {"html": html}, "html")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import time
+
+from educational_crawler.cache import (
+    CacheManager,
+    MemoryBackend,
+    SQLiteBackend,
+    estimate_size
+)
+from educational_crawler.models import (
+    EducationalContent,
+    ContentChunk,
+    ContentMetadata,
+    CompactContent,
+    ValidationResult
+)
+from educational_crawler.processors import ContentProcessor
+
+def make_content(title, size=10):
+    return EducationalContent(
+        title=title,
+        content="x" * size,
+        chunks=[],
+        raw_data={}
+    )
+
+def test_memory_backend_lru_eviction():
+    """Test least recently used entries are evicted over max_bytes"""
+    entry_size = estimate_size(make_content("a"))
+    cache = CacheManager(MemoryBackend(max_bytes=entry_size * 2))
+
+    cache.set("a", make_content("a"))
+    cache.set("b", make_content("b"))
+    cache.get("a")
+    cache.set("c", make_content("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a").title == "a"
+    assert cache.stats.evictions == 1
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 1
+
+def test_memory_backend_ttl():
+    """Test expired entries are treated as misses"""
+    cache = CacheManager(MemoryBackend(ttl=0.01))
+    cache.set("a", make_content("a"))
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats.expirations == 1
+
+def test_sqlite_backend_persists(tmp_path):
+    """Test the SQLite backend survives a restart"""
+    path = str(tmp_path / "cache.db")
+    backend = SQLiteBackend(path)
+    backend.set("a", make_content("a", size=1000))
+    backend.close()
+
+    cache = CacheManager(SQLiteBackend(path))
+    content = cache.get("a")
+
+    assert content.title == "a"
+    assert content.content == "x" * 1000
+    assert cache.stats.entries == 1
+
+def test_sqlite_backend_eviction(tmp_path):
+    """Test the SQLite backend evicts to stay under max_bytes"""
+    backend = SQLiteBackend(str(tmp_path / "cache.db"))
+    backend.set("a", make_content("a"))
+    backend.max_bytes = backend.stats.size_bytes
+
+    backend.set("b", make_content("b"))
+
+    assert backend.get("a") is None
+    assert backend.get("b").title == "b"
+    assert backend.stats.evictions == 1
+
+def test_sqlite_backend_running_totals(tmp_path):
+    """Test running totals match the table and buffered hits drive eviction"""
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), access_flush=100)
+    for title in "abc":
+        backend.set(title, make_content(title))
+    backend.set("b", make_content("b", size=500))
+    backend.get("a")
+    backend.max_bytes = backend.stats.size_bytes
+
+    backend.set("d", make_content("d"))
+
+    assert backend.get("a").title == "a"
+    assert backend.get("c") is None
+    entries, size = backend.stats.entries, backend.stats.size_bytes
+    backend._refresh_totals()
+    assert (entries, size) == (backend.stats.entries, backend.stats.size_bytes)
+
+def make_scored(title, is_valid, score, subject, grade_level="Grade 5"):
+    content = make_content(title)
+    content.validation_result = ValidationResult(is_valid=is_valid, score=score)
+    content.metadata = ContentMetadata(
+        subject=subject,
+        grade_level=grade_level,
+        learning_objectives=[],
+        prerequisites=[],
+        license=None
+    )
+    return content
+
+def test_query_uses_indexes():
+    """Test filtered queries over the validation and metadata indexes"""
+    cache = CacheManager()
+    cache.set("a", make_scored("a", True, 0.85, "Math"))
+    cache.set("b", make_scored("b", True, 0.75, "Math"))
+    cache.set("c", make_scored("c", False, 0.9, "Math"))
+    cache.set("d", make_scored("d", True, 0.95, "Science"))
+
+    results = cache.query(valid=True, subject="math", min_score=0.8)
+
+    assert not isinstance(results, list)
+    assert [item.title for item in results] == ["a"]
+    assert sorted(item.title for item in cache.get_all_validated()) == ["a", "b", "d"]
+
+    cache.set("a", make_scored("a", False, 0.85, "Math"))
+    assert list(cache.query(valid=True, subject="math", min_score=0.8)) == []
+
+def test_sqlite_backend_keeps_none_fields(tmp_path):
+    """Test fields that are None, like a missing license, survive storage"""
+    backend = SQLiteBackend(str(tmp_path / "cache.db"))
+    content = make_scored("a", True, 0.9, "Math")
+    backend.set("a", content)
+
+    assert backend.get("a") == content
+
+def test_query_invalid_and_sqlite_restart(tmp_path, monkeypatch):
+    """Test valid=False queries and index rebuilds from SQLite columns"""
+    path = str(tmp_path / "cache.db")
+    cache = CacheManager(SQLiteBackend(path))
+    cache.set("a", make_scored("a", True, 0.85, "Math"))
+    cache.set("b", make_scored("b", False, 0.4, "Math"))
+    cache.set("c", make_scored("c", False, 0.95, "Science"))
+    cache.backend.close()
+
+    def fail(data):
+        raise AssertionError("index rebuilt by deserializing entries")
+
+    monkeypatch.setattr("educational_crawler.cache.deserialize_content", fail)
+    cache = CacheManager(SQLiteBackend(path))
+    assert sorted(cache.index.query(valid=False)) == ["b", "c"]
+    assert list(cache.index.query(valid=False, min_score=0.9)) == ["c"]
+    assert list(cache.index.query(subject="math", min_score=0.5)) == ["a"]
+
+def test_index_follows_evictions():
+    """Test evicted entries disappear from the indexes"""
+    entry_size = estimate_size(make_scored("a", True, 0.9, "Math"))
+    cache = CacheManager(MemoryBackend(max_bytes=entry_size))
+
+    cache.set("a", make_scored("a", True, 0.9, "Math"))
+    cache.set("b", make_scored("b", True, 0.9, "Math"))
+
+    assert [item.title for item in cache.query(subject="Math")] == ["b"]
+
+def test_compact_memory_backend_round_trip():
+    """Test compact storage converts back to an equal model without raw_data"""
+    raw = {"markdown": "# Cells\n\nA cell is defined as the basic unit of life.\n\nFor example, neurons."}
+    content = ContentProcessor(chunk_size=40).process(raw)
+    cache = CacheManager(MemoryBackend(compact=True))
+
+    cache.set("a", content)
+    restored = cache.get("a")
+
+    assert restored.chunks == content.chunks
+    assert restored.content == content.content
+    assert restored.raw_data == {}
+
+def test_compact_content_keeps_chunks_outside_content():
+    """Test chunks that are not slices of the content survive compaction"""
+    content = EducationalContent(
+        title="a",
+        content="alpha beta",
+        chunks=[
+            ContentChunk(text="beta", type="example", importance=0.6),
+            ContentChunk(text="gamma", type="summary", importance=0.85),
+        ],
+        raw_data={"html": "<p>alpha beta</p>"}
+    )
+
+    compact = CompactContent.from_content(content, keep_raw_data=True)
+
+    assert compact.to_content() == content
+
+def test_compact_memory_backend_many_types_and_large_importance():
+    """Test compact cache entries keep many chunk types and wide importance values apart"""
+    chunks = [ContentChunk(text=f"c{i}", type=f"type-{i}", importance=0.5) for i in range(300)]
+    chunks.append(ContentChunk(text="big", type="type-0", importance=7.5))
+    chunks.append(ContentChunk(text="fine", type="type-1", importance=0.12345))
+    content = EducationalContent(title="a", content="", chunks=chunks, raw_data={})
+    other = EducationalContent(
+        title="b", content="x", chunks=[ContentChunk(text="x", type="code", importance=0.6)], raw_data={}
+    )
+    cache = CacheManager(MemoryBackend(compact=True))
+
+    cache.set("a", content)
+    cache.set("b", other)
+
+    assert cache.get("a") == content
+    assert cache.get("b") == other
+    assert CompactContent.from_content(other)._type_names == ["code"]
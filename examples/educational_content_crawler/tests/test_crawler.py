@@ -1,5 +1,6 @@
 import pytest
 from educational_crawler import EducationalCrawler
+from educational_crawler.crawler import CrawlerConfig
 from educational_crawler.models import EducationalContent, ValidationResult
 
 def test_crawler_initialization():
@@ -44,4 +45,40 @@ def test_content_validation():
     
     assert isinstance(validation, ValidationResult)
     assert isinstance(validation.score, float)
-    assert 0 <= validation.score <= 1
\ No newline at end of file
+    assert 0 <= validation.score <= 1
+
+
+def test_concurrent_crawl_preserves_order_and_skips_cache(monkeypatch):
+    """Test concurrent crawling returns results in input order"""
+    config = CrawlerConfig(max_concurrent_requests=4)
+    crawler = EducationalCrawler(api_key="test", llm_api_key="test", config=config)
+    scraped = []
+
+    def scrape_url(url, params=None):
+        scraped.append(url)
+        return {"title": url}
+
+    def process(raw_content):
+        return EducationalContent(
+            title=raw_content["title"],
+            content="",
+            chunks=[],
+            raw_data=raw_content
+        )
+
+    monkeypatch.setattr(crawler.app, "scrape_url", scrape_url)
+    monkeypatch.setattr(crawler.processor, "process", process)
+
+    cached = EducationalContent(title="cached", content="", chunks=[], raw_data={})
+    crawler.cache.set("https://test.com/cached", cached)
+
+    urls = [f"https://test.com/{i}" for i in range(10)]
+    urls.insert(3, "https://test.com/cached")
+    urls.append("https://test.com/0")
+
+    results = crawler.crawl_and_process(urls, validate=False, extract_metadata=False)
+
+    assert [item.title for item in results] == [
+        "cached" if url.endswith("cached") else url for url in urls
+    ]
+    assert sorted(scraped) == sorted(set(urls) - {"https://test.com/cached"})
@@ -0,0 +1,71 @@
+from educational_crawler.metadata import MetadataExtractor, readability_grade
+from educational_crawler.models import EducationalContent
+
+LESSON = """Solving Quadratic Equations
+
+By the end of this lesson, you will be able to solve a quadratic equation by factoring.
+Prerequisites: linear equations, polynomial multiplication and fractions.
+This algebra unit is written for high school students. A quadratic equation is a polynomial
+equation of degree two. Every quadratic has at most two roots.
+
+Content licensed under CC BY-NC-SA 4.0.
+"""
+
+def make_content(text, title="Solving Quadratic Equations", raw_data=None):
+    return EducationalContent(title=title, content=text, chunks=[], raw_data=raw_data or {})
+
+def test_extract_heuristic_metadata():
+    """Test metadata is extracted from keyword and pattern tables"""
+    metadata = MetadataExtractor().extract(make_content(LESSON))
+
+    assert metadata.subject == "Mathematics"
+    assert metadata.grade_level == "Grade 9-12"
+    assert metadata.learning_objectives == ["solve a quadratic equation by factoring"]
+    assert metadata.prerequisites == ["linear equations", "polynomial multiplication", "fractions"]
+    assert metadata.license == "CC-BY-NC-SA"
+
+def test_extraction_schema_takes_precedence():
+    """Test fields from Firecrawl's extraction are used as-is"""
+    content = make_content(LESSON, raw_data={"extract": {"subject": "Algebra", "license": "MIT"}})
+    metadata = MetadataExtractor().extract(content)
+
+    assert metadata.subject == "Algebra"
+    assert metadata.license == "MIT"
+
+def test_llm_fallback_only_on_low_confidence():
+    """Test the LLM fallback is only called when heuristics are unsure"""
+    calls = []
+
+    def fallback(content):
+        calls.append(content.title)
+        return {"subject": "Music", "grade_level": "Grade 3-5"}
+
+    extractor = MetadataExtractor(llm_fallback=fallback)
+    extractor.extract(make_content(LESSON))
+    assert calls == []
+
+    metadata = extractor.extract(make_content("Scales and chords.", title="Lesson 4"))
+    assert calls == ["Lesson 4"]
+    assert metadata.subject == "Music"
+    assert metadata.grade_level == "Grade 3-5"
+
+def test_readability_grade_orders_texts():
+    """Test harder text gets a higher readability grade"""
+    simple = "The cat sat. The dog ran. We had fun. " * 10
+    hard = (
+        "Thermodynamic equilibrium necessitates simultaneous mechanical, chemical, "
+        "and thermal equilibrium between interacting macroscopic subsystems. " * 5
+    )
+    assert readability_grade(simple) < 3 < 13 < readability_grade(hard)
+
+def test_overlapping_objective_patterns_give_one_objective():
+    """Test an objective found by two patterns is only reported once"""
+    metadata = MetadataExtractor().extract(make_content("Students will learn how to add fractions."))
+
+    assert metadata.learning_objectives == ["learn how to add fractions"]
+
+def test_license_needs_word_boundary():
+    """Test "cc by" inside another word is not read as a CC-BY license"""
+    metadata = MetadataExtractor().extract(make_content("Accby success by practice."))
+
+    assert metadata.license != "CC-BY"
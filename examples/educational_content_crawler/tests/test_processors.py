@@ -0,0 +1,74 @@
+from educational_crawler.processors import ContentProcessor
+
+MARKDOWN = """# Fractions
+
+A fraction is defined as a part of a whole.
+
+For example, [one half](https://example.com) is written as **1/2**.
+
+```
+print(1 / 2)
+```
+
+## Practice
+
+- Exercise: add 1/4 and 1/4
+"""
+
+def test_process_markdown():
+    """Test markdown is extracted, cleaned and chunked"""
+    content = ContentProcessor().process({"markdown": MARKDOWN, "metadata": {"title": "Fractions"}})
+
+    assert content.title == "Fractions"
+    assert "one half is written as 1/2." in content.content
+    assert [chunk.type for chunk in content.chunks] == ["definition", "code", "exercise"]
+    assert content.chunks[0].importance == 1.0
+    assert content.chunks[1].text == "print(1 / 2)"
+
+def test_process_html_skips_scripts():
+    """Test HTML blocks are extracted without script content"""
+    html = (
+        "<html><head><script>var x = 1;</script></head><body>"
+        "<h1>Cells</h1><p>The cell   is the\nbasic unit &amp; building block.</p>"
+        "</body></html>"
+    )
+    content = ContentProcessor().process({"html": html})
+
+    assert "var x" not in content.content
+    assert content.chunks[0].text == "The cell is the basic unit & building block."
+
+def test_iter_chunks_bounded_sizes():
+    """Test large pages stream as chunks of bounded size"""
+    processor = ContentProcessor(max_content_length=50000, chunk_size=500)
+    paragraph = "Photosynthesis converts light into chemical energy. " * 40
+    markdown = "\n\n".join([paragraph] * 100)
+
+    chunks = processor.iter_chunks({"markdown": markdown})
+    sizes = [len(chunk.text) for chunk in chunks]
+
+    assert max(sizes) <= 500
+    assert 49000 < sum(sizes) + len(sizes) <= 51000
+
+def test_process_stops_at_max_content_length():
+    """Test short limits never produce content longer than the limit"""
+    markdown = "abc\n\ndefghijkl\n\nmore text here"
+
+    assert ContentProcessor(max_content_length=5).process({"markdown": markdown}).content == "abc"
+    assert ContentProcessor(max_content_length=10).process({"markdown": markdown}).content == "abc\n\ndefgh"
+
+def test_process_keeps_unpaired_emphasis_characters():
+    """Test only paired emphasis delimiters are removed"""
+    markdown = "So 2 * 3 * 4 is 24, **bold** and *italic*, __init__ and `a*b*c` stay."
+    content = ContentProcessor().process({"markdown": markdown})
+
+    assert content.content == "So 2 * 3 * 4 is 24, bold and italic, __init__ and a*b*c stay."
+
+def test_chunks_count_paragraph_separators():
+    """Test chunks built from several short paragraphs stay within chunk_size"""
+    processor = ContentProcessor(chunk_size=100)
+    markdown = "\n\n".join(f"Paragraph {i} has a few words." for i in range(40))
+
+    chunks = list(processor.iter_chunks({"markdown": markdown}))
+
+    assert max(len(chunk.text) for chunk in chunks) <= 100
+    assert max(len(chunk.text) for chunk in chunks) > 90
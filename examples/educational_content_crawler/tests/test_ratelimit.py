@@ -0,0 +1,35 @@
+from educational_crawler.ratelimit import TokenBucket, HostRateLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_token_bucket_refills_at_rate():
+    """Test token bucket allows a burst then throttles"""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=clock, sleep=clock.sleep)
+
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.5
+
+    bucket.acquire()
+    assert clock.now == 0.5
+
+def test_host_rate_limiter_is_per_host():
+    """Test each host gets an independent bucket"""
+    clock = FakeClock()
+    limiter = HostRateLimiter(rate=1.0, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire("https://a.com/1")
+    limiter.acquire("https://b.com/1")
+    assert clock.now == 0.0
+
+    limiter.acquire("https://a.com/2")
+    assert clock.now == 1.0
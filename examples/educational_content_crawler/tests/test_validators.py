@@ -0,0 +1,76 @@
+from educational_crawler.models import ContentChunk, EducationalContent, ValidationResult
+from educational_crawler.validators import ContentScorer, ContentValidator, CHECKS
+
+class CountingScorer(ContentScorer):
+    """Deterministic scorer that records which checks ran"""
+
+    def __init__(self):
+        self.calls = []
+
+    def score(self, check, content):
+        self.calls.append((check, content.title))
+        return ValidationResult(is_valid=True, score=0.9)
+
+def make_content(title, text):
+    return EducationalContent(title=title, content=text, chunks=[], raw_data={})
+
+def test_validate_many_memoizes_by_content_hash():
+    """Test identical content is scored once and results keep input order"""
+    scorer = CountingScorer()
+    validator = ContentValidator(scorer=scorer, batch_size=2)
+    long_text = "Algebra lesson. " * 20
+    contents = [
+        make_content("a", long_text),
+        make_content("b", "short"),
+        make_content("a", long_text),
+        make_content("c", long_text),
+    ]
+
+    results = validator.validate_many(contents)
+
+    assert [result.issues for result in results] == [[], ["Content is too short"], [], []]
+    assert results[0] is results[2]
+    assert len(scorer.calls) == 3 * len(CHECKS)
+
+    validator.validate(make_content("a", long_text))
+    assert len(scorer.calls) == 3 * len(CHECKS)
+
+def test_default_scorer_is_deterministic():
+    """Test the heuristic scorer gives stable scores"""
+    content = make_content(
+        "Fractions",
+        "A fraction is defined as part of a whole. For example, 1/2. Exercise: add 1/4 and 1/4. " * 5
+    )
+
+    first = ContentValidator().validate(content)
+    second = ContentValidator().validate(content)
+
+    assert first == second
+    assert first.is_valid
+
+def test_validate_many_beyond_memo_size():
+    """Test a call scoring more items than the memo holds returns all results"""
+    scorer = CountingScorer()
+    validator = ContentValidator(scorer=scorer, batch_size=2, max_cached_results=2)
+    contents = [make_content(str(i), "Geometry lesson. " * 10) for i in range(5)]
+
+    results = validator.validate_many(contents)
+    validator.close()
+
+    assert len(results) == 5
+    assert all(result is not None for result in results)
+
+def test_memo_key_includes_chunk_types():
+    """Test content with different chunk types is scored separately"""
+    scorer = CountingScorer()
+    validator = ContentValidator(scorer=scorer)
+    text = "Algebra lesson. " * 20
+    plain = make_content("a", text)
+    typed = EducationalContent(
+        title="a", content=text, chunks=[ContentChunk(text=text, type="definition", importance=0.9)], raw_data={}
+    )
+
+    validator.validate(plain)
+    validator.validate(typed)
+
+    assert len(scorer.calls) == 2 * len(CHECKS)
@@ -0,0 +1,123 @@
+"""
+Vector index benchmark for GPTKnowledgeCrawler
+
+Builds a synthetic crawl whose pages each use mostly the vocabulary of one
+of a few hundred topics, as a docs site's sections do, splits it into
+records of a few paragraphs and builds the IVF index with the hashing
+embedder. It reports embedding and build
+throughput. For queries made of a random passage of a record, it reports
+latency at several nprobe settings against an exact scan of every
+vector, recall@k of the exact top k, and how often the source record is
+the top hit.
+
+Usage:
+    python benchmark_index.py --pages 5000 --queries 500
+"""
+
+import argparse
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_tokenization import make_vocabulary
+from embeddings import HashingEmbedder
+from vector_index import build_index
+
+def make_records(pages, topics, vocabulary, size=2000):
+    """
+    Records of about `size` characters from pages on `topics` topics
+
+    Each topic has its own 100 words. A page uses its topic's words for
+    about 40% of its text and common words for the rest.
+    """
+    topic_words = [random.sample(vocabulary, 100) for _ in range(topics)]
+    common = vocabulary[:300]
+    records = []
+    for i in range(pages):
+        url = f'https://example.com/docs/page-{i}'
+        own = topic_words[random.randrange(topics)]
+        words = int(min(random.lognormvariate(7.0, 1.0), 20000))
+        chunk = ''
+        chunk_index = 0
+        while words > 0:
+            n = min(words, random.randint(5, 20))
+            words -= n
+            chunk += ' '.join(random.choice(own) if random.random() < 0.4 else random.choice(common)
+                              for _ in range(n)) + '.\n'
+            if len(chunk) >= size or words <= 0:
+                records.append({'id': f'{url}#{chunk_index}', 'url': url, 'content': chunk})
+                chunk = ''
+                chunk_index += 1
+    return records
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Vector index benchmark')
+    parser.add_argument('--pages', type=int, default=5000)
+    parser.add_argument('--topics', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(0)
+    records = make_records(args.pages, args.topics, make_vocabulary())
+    total_chars = sum(len(record['content']) for record in records)
+    print(f'{len(records)} records, {total_chars / 1e6:.1f}M characters, dim={args.dim}')
+
+    embedder = HashingEmbedder(dim=args.dim)
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        index = build_index(iter(records), embedder, f'{directory}/index')
+        elapsed = time.perf_counter() - start
+        print(f'build  {elapsed:7.2f}s  {len(records) / elapsed:8.0f} records/sec  '
+              f'{total_chars / elapsed / 1e6:5.2f}M chars/sec  nlist={index.nlist}')
+
+        queries = []
+        for number in random.sample(range(len(records)), min(args.queries, len(records))):
+            words = records[number]['content'].split()
+            offset = random.randint(0, max(len(words) - 12, 0))
+            queries.append((number, ' '.join(words[offset:offset + 12])))
+        vectors = [embedder.embed([text])[0] for _, text in queries]
+
+        def exact(vector):
+            scores = np.asarray(index.vectors) @ vector
+            top = np.argpartition(-scores, args.k - 1)[:args.k]
+            return [int(index.row_ids[i]) for i in top[np.argsort(-scores[top])]]
+
+        latencies = []
+        truth = []
+        for vector in vectors:
+            start = time.perf_counter()
+            truth.append(exact(vector))
+            latencies.append(time.perf_counter() - start)
+        print(f'\n{"search":<12} {"p50 ms":>8} {"p99 ms":>8} {"recall@" + str(args.k):>10} {"top hit":>8}')
+        top_hits = sum(1 for (number, _), found in zip(queries, truth) if found[0] == number)
+        print(f'{"exact":<12} {percentile(latencies, 50):8.3f} {percentile(latencies, 99):8.3f} '
+              f'{1.0:10.3f} {top_hits / len(queries):8.3f}')
+
+        for nprobe in (1, 4, 8, 16, 32):
+            latencies = []
+            recall = top_hits = 0
+            for (number, _), vector, expected in zip(queries, vectors, truth):
+                start = time.perf_counter()
+                found = [record for _, record in index.search(vector, args.k, nprobe)]
+                latencies.append(time.perf_counter() - start)
+                recall += len(set(found) & set(expected)) / len(expected)
+                top_hits += bool(found) and found[0] == number
+            print(f'{"nprobe=" + str(nprobe):<12} {percentile(latencies, 50):8.3f} '
+                  f'{percentile(latencies, 99):8.3f} {recall / len(queries):10.3f} {top_hits / len(queries):8.3f}')
+
+        start = time.perf_counter()
+        for _, text in queries[:100]:
+            index.query(text, embedder, args.k, 16)
+        print(f'\nend-to-end query (embed, search, read records), nprobe=16: '
+              f'{(time.perf_counter() - start) / min(100, len(queries)) * 1000:.3f} ms')
+        index.close()
+
+if __name__ == '__main__':
+    main()
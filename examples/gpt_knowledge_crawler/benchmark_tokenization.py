@@ -0,0 +1,151 @@
+"""
+Tokenization benchmark for GPTKnowledgeCrawler._process_crawl_results
+
+Builds a synthetic crawl of 10k pages with lengths from a few hundred to
+hundreds of thousands of characters. It times the previous per-page
+encode/decode loop against the batched, prefix-truncating path, and checks
+that both produce the same content. It then times each chunk strategy
+over the same pages and checks that the chunks cover every page.
+
+tiktoken downloads its BPE files on first use. When they cannot be
+fetched (e.g. offline), a stand-in BPE encoding with cl100k_base's split
+pattern, built from the corpus vocabulary, is used instead.
+
+Usage:
+    python benchmark_tokenization.py --pages 10000 --max-tokens 4000
+"""
+
+import argparse
+import logging
+import os
+import random
+import time
+
+import tiktoken
+
+import main as knowledge_crawler
+from chunking import STRATEGIES
+from main import GPTKnowledgeCrawler
+
+CL100K_PATTERN = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+"""
+    r"""|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+)
+
+def make_vocabulary(size=3000):
+    letters = 'etaoinshrdlcumwfgypbvkjxqz'
+    weights = [len(letters) - i for i in range(len(letters))]
+    return [''.join(random.choices(letters, weights, k=random.randint(2, 10))) for _ in range(size)]
+
+def make_pages(count, vocabulary):
+    """Markdown-like pages with log-normally distributed lengths"""
+    pages = []
+    for i in range(count):
+        words = int(min(random.lognormvariate(7.5, 1.1), 60000))
+        lines = []
+        while words > 0:
+            n = min(words, random.randint(5, 20))
+            words -= n
+            line = ' '.join(random.choices(vocabulary, k=n))
+            prefix = random.choices(['', '- ', '`x = 1`, ', '## '], weights=[80, 10, 8, 2])[0]
+            suffix = random.choice(['.', ',', ':', ''])
+            lines.append(prefix + line + suffix + random.choice(['\n', '\n', '\n\n']))
+        pages.append({'url': f'https://example.com/docs/page-{i}', 'content': ''.join(lines)})
+    return pages
+
+def stand_in_encoding(vocabulary):
+    """Byte-level BPE over the corpus words, with cl100k_base's split pattern"""
+    ranks = {bytes([i]): i for i in range(256)}
+    for word in vocabulary:
+        for text in (word, ' ' + word):
+            data = text.encode('utf-8')
+            for end in range(2, len(data) + 1):
+                ranks.setdefault(data[:end], len(ranks))
+    return tiktoken.Encoding('stand-in', pat_str=CL100K_PATTERN, mergeable_ranks=ranks, special_tokens={})
+
+def process_per_page(pages, max_tokens, tokenizer):
+    """The previous implementation: a full encode per page and a re-decode to truncate"""
+    processed = []
+    for page in pages:
+        tokens = tokenizer.encode(page['content'])
+        if len(tokens) <= max_tokens:
+            processed.append({'url': page['url'], 'content': page['content']})
+        else:
+            processed.append({'url': page['url'], 'content': tokenizer.decode(tokens[:max_tokens])})
+    return processed
+
+def covers(text, chunks):
+    """Whether overlapping chunks, in order, cover all of text"""
+    position = reach = 0
+    for chunk in chunks:
+        index = text.find(chunk['content'], position)
+        if index == -1 or index > reach:
+            return False
+        reach = max(reach, index + len(chunk['content']))
+        position = index + 1
+    return reach == len(text)
+
+def main():
+    parser = argparse.ArgumentParser(description='Tokenization benchmark')
+    parser.add_argument('--pages', type=int, default=10000)
+    parser.add_argument('--max-tokens', type=int, default=4000)
+    parser.add_argument('--chunk-overlap', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--encoding', default='cl100k_base')
+    args = parser.parse_args()
+
+    random.seed(0)
+    logging.getLogger('main').setLevel(logging.WARNING)
+    vocabulary = make_vocabulary()
+    pages = make_pages(args.pages, vocabulary)
+
+    try:
+        tokenizer = knowledge_crawler.get_tokenizer(args.encoding)
+    except Exception as e:
+        print(f'Could not load {args.encoding} ({type(e).__name__}), using a stand-in encoding')
+        tokenizer = stand_in_encoding(vocabulary)
+        knowledge_crawler.get_tokenizer = lambda name: tokenizer
+
+    total_chars = sum(len(page['content']) for page in pages)
+    print(f'{len(pages)} pages, {total_chars / 1e6:.1f}M characters, max_tokens={args.max_tokens}')
+
+    crawler = GPTKnowledgeCrawler.__new__(GPTKnowledgeCrawler)
+    crawler.config = {'extraction': {
+        'max_tokens': args.max_tokens,
+        'tokenizer': args.encoding,
+        'tokenize_workers': args.workers
+    }}
+
+    start = time.perf_counter()
+    expected = process_per_page(pages, args.max_tokens, tokenizer)
+    per_page = time.perf_counter() - start
+
+    start = time.perf_counter()
+    processed = crawler._process_crawl_results({'pages': pages})
+    batched = time.perf_counter() - start
+
+    truncated = sum(1 for page, result in zip(pages, expected) if result['content'] != page['content'])
+    mismatches = sum(1 for a, b in zip(expected, processed) if a != b)
+    print(f'{truncated} pages truncated')
+    print(f'per-page encode/decode  {per_page:7.2f}s  {len(pages) / per_page:8.0f} pages/sec')
+    print(f'batched + prefix scan   {batched:7.2f}s  {len(pages) / batched:8.0f} pages/sec  '
+          f'({per_page / batched:.1f}x, {mismatches} mismatches)')
+
+    print(f'\nchunking with max_tokens={args.max_tokens}, chunk_overlap={args.chunk_overlap}')
+    crawler.config['extraction']['chunk_overlap'] = args.chunk_overlap
+    for strategy in STRATEGIES:
+        crawler.config['extraction']['chunk_strategy'] = strategy
+        start = time.perf_counter()
+        chunks = crawler._process_crawl_results({'pages': pages})
+        elapsed = time.perf_counter() - start
+
+        by_url = {}
+        for chunk in chunks:
+            by_url.setdefault(chunk['url'], []).append(chunk)
+        covered = sum(1 for page in pages if covers(page['content'], by_url.get(page['url'], [])))
+        print(f'{strategy:<18} {elapsed:7.2f}s  {total_chars / elapsed / 1e6:6.2f}M chars/sec  '
+              f'{len(chunks):7} chunks  {sum(c["tokens"] for c in chunks) / len(chunks):6.0f} tokens/chunk  '
+              f'{covered}/{len(pages)} pages covered')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+def content_hash(content):
+    """SHA-256 of a crawled page's content"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class BuildManifest:
+    """
+    Persistent URL -> content hash -> chunk ids map of a knowledge base
+
+    Each build writes either a full base file or a delta holding only the
+    records of new and changed pages, plus tombstones for records that no
+    longer exist. The builds table lists them in order, so the current
+    knowledge base is the latest base with every later delta applied.
+
+    Changes stay in one transaction until commit(), so a failed build
+    leaves the manifest as it was before that build.
+    """
+
+    def __init__(self, path='knowledge_base.builds.db'):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS builds (
+                build INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                paths TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                upserts INTEGER NOT NULL,
+                deletes INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def hashes(self):
+        """All URLs in the knowledge base and their content hashes"""
+        return dict(self.conn.execute('SELECT url, content_hash FROM pages'))
+
+    def chunk_ids(self, url):
+        row = self.conn.execute('SELECT chunk_ids FROM pages WHERE url = ?', (url,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def put(self, url, page_hash, chunk_ids):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO pages (url, content_hash, chunk_ids, updated_at) VALUES (?, ?, ?, ?)',
+            (url, page_hash, json.dumps(chunk_ids), time.time())
+        )
+
+    def remove(self, url):
+        self.conn.execute('DELETE FROM pages WHERE url = ?', (url,))
+
+    def reset(self):
+        """Forget every page, so the next build is a full one"""
+        self.conn.execute('DELETE FROM pages')
+
+    def last_build(self):
+        """(build, settings) of the latest build, or (0, None)"""
+        row = self.conn.execute('SELECT build, settings FROM builds ORDER BY build DESC LIMIT 1').fetchone()
+        return (row[0], json.loads(row[1])) if row else (0, None)
+
+    def builds(self):
+        """
+        Builds making up the current knowledge base, oldest first
+
+        Returns:
+            List of {'build', 'kind', 'paths', 'upserts', 'deletes'} from
+            the latest base build on
+        """
+        rows = self.conn.execute(
+            """
+            SELECT build, kind, paths, upserts, deletes FROM builds
+            WHERE build >= (SELECT COALESCE(MAX(build), 0) FROM builds WHERE kind = 'base')
+            ORDER BY build
+            """
+        ).fetchall()
+        return [
+            {'build': build, 'kind': kind, 'paths': json.loads(paths), 'upserts': upserts, 'deletes': deletes}
+            for build, kind, paths, upserts, deletes in rows
+        ]
+
+    def record_build(self, build, kind, paths, settings, upserts, deletes):
+        self.conn.execute(
+            'INSERT INTO builds (build, kind, paths, settings, upserts, deletes, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (build, kind, json.dumps(paths), json.dumps(settings), upserts, deletes, time.time())
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,278 @@
+import re
+from itertools import islice
+
+STRATEGIES = ('fixed', 'markdown-heading', 'semantic')
+
+HEADING_PATTERN = re.compile(r'(#{1,6})\s+(.*?)\s*#*\s*$')
+FENCE_PATTERN = re.compile(r'\s*(```|~~~)')
+# A space after sentence punctuation. tiktoken's split patterns never join
+# a non-space character with the space after it, so this is a token boundary
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])(?= \S)')
+# Any space after a non-space, the fallback for oversized segments
+WORD_PATTERN = re.compile(r'(?<=\S) ')
+
+# Strength of the boundary before a segment
+HEADING, PARAGRAPH, LINE, SENTENCE, CODE_LINE = 5, 4, 3, 2, 1
+
+def _lines(text):
+    """Lines of text split on newlines only, keeping the newline"""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start)
+        end = len(text) if end == -1 else end + 1
+        yield text[start:end]
+        start = end
+
+def split_segments(text):
+    """
+    Split markdown into segments at structural boundaries
+
+    Segments start at the beginning of lines whose first character is not
+    whitespace, and at sentence ends. Both are always token boundaries, so
+    encoding the segments one by one gives the same tokens as encoding the
+    whole text. Blank and indented lines stay with the segment before them.
+
+    Returns:
+        List of (start, level, section) where start is the segment's
+        character offset, level the strength of the boundary before it and
+        section the heading path the segment belongs to
+    """
+    segments = []
+    headings = []
+    section = ''
+    in_code = False
+    blank_before = True
+    position = 0
+
+    for line in _lines(text):
+        boundary = position == 0 or not line[:1].isspace()
+        if FENCE_PATTERN.match(line):
+            if boundary:
+                segments.append((position, CODE_LINE if in_code else PARAGRAPH, section))
+            in_code = not in_code
+        elif boundary and in_code:
+            segments.append((position, CODE_LINE, section))
+        elif boundary:
+            heading = HEADING_PATTERN.match(line)
+            if heading:
+                depth = len(heading.group(1))
+                headings = headings[:depth - 1] + [heading.group(2)]
+                section = ' > '.join(headings)
+                segments.append((position, HEADING, section))
+            else:
+                segments.append((position, PARAGRAPH if blank_before else LINE, section))
+                for match in SENTENCE_PATTERN.finditer(line):
+                    segments.append((position + match.start(), SENTENCE, section))
+        if not in_code:
+            blank_before = not line.strip() or (blank_before and not boundary)
+        position += len(line)
+
+    return segments
+
+def _char_starts(tokens, tokenizer, text):
+    """
+    Whether each token offset, and the end, falls between two characters
+
+    A byte-level BPE token can hold part of a multi-byte UTF-8 character,
+    so an offset is inside a character when the next token starts with a
+    continuation byte. ASCII text has no multi-byte characters to check.
+    """
+    if text.isascii():
+        return [True] * (len(tokens) + 1)
+    return [not 0x80 <= tokenizer.decode_single_token_bytes(token)[0] < 0xC0 for token in tokens] + [True]
+
+def _windows(tokens, tokenizer, text, max_tokens, overlap):
+    """
+    Text and token count of overlapping token windows covering tokens
+
+    Window edges are moved to the nearest character boundary, so no
+    window decodes a partial character, and each window is shrunk until
+    its text re-encodes within max_tokens. Only a single character that
+    takes more than max_tokens tokens gets a window of its own above it.
+    """
+    at_char = _char_starts(tokens, tokenizer, text)
+
+    def last_boundary(end, start):
+        while end > start and not at_char[end]:
+            end -= 1
+        return end
+
+    start = 0
+    while True:
+        end = last_boundary(min(start + max_tokens, len(tokens)), start)
+        if end == start:
+            end += 1
+            while not at_char[end]:
+                end += 1
+        content = tokenizer.decode(tokens[start:end])
+        count = len(tokenizer.encode(content))
+        while count > max_tokens and last_boundary(end - 1, start) > start:
+            end = last_boundary(end - 1, start)
+            content = tokenizer.decode(tokens[start:end])
+            count = len(tokenizer.encode(content))
+        yield content, count
+        if end == len(tokens):
+            return
+        # Step back up to `overlap` tokens, onto a character boundary past start
+        next_start = last_boundary(max(end - overlap, start + 1), start)
+        if next_start == start:
+            next_start += 1
+            while not at_char[next_start]:
+                next_start += 1
+        start = next_start
+
+def _split_oversized(text, section, tokenizer, max_tokens, overlap):
+    """
+    Chunks of one segment longer than max_tokens
+
+    The segment is split at word boundaries. Only a single word that is
+    longer than max_tokens is cut into token windows by _windows.
+    """
+    words = [(0, 0, section)] + [(match.start(), 0, section) for match in WORD_PATTERN.finditer(text)]
+    if len(words) > 1:
+        bounds = [start for start, _, _ in words] + [len(text)]
+        counts = [len(tokenizer.encode(text[bounds[i]:bounds[i + 1]])) for i in range(len(words))]
+        yield from chunk_structured(text, words, counts, tokenizer, max_tokens, overlap, False)
+        return
+
+    for content, count in _windows(tokenizer.encode(text), tokenizer, text, max_tokens, overlap):
+        yield {'section': section, 'tokens': count, 'content': content}
+
+def chunk_fixed(text, tokens, tokenizer, max_tokens, overlap):
+    """Overlapping windows of up to max_tokens tokens, ignoring structure"""
+    if not tokens:
+        return
+    for content, count in _windows(tokens, tokenizer, text, max_tokens, overlap):
+        yield {'section': '', 'tokens': count, 'content': content}
+
+def chunk_structured(text, segments, counts, tokenizer, max_tokens, overlap, split_headings, min_fill=0.5):
+    """
+    Group segments into chunks of at most max_tokens tokens
+
+    Each chunk ends at the strongest boundary that keeps it within
+    max_tokens and at least min_fill full, preferring the latest one on
+    ties. With split_headings every heading starts a new chunk. The next
+    chunk starts up to `overlap` tokens before the previous end, on a
+    segment boundary, except after a heading. A segment longer than
+    max_tokens on its own is split further by _split_oversized.
+
+    Args:
+        segments: (start, level, section) from split_segments
+        counts: Token count of each segment, from a single encode per segment
+    """
+    total = len(segments)
+    cumulative = [0]
+    for count in counts:
+        cumulative.append(cumulative[-1] + count)
+    starts = [start for start, _, _ in segments] + [len(text)]
+
+    s = 0
+    while s < total:
+        # Farthest end that fits
+        e = s
+        while e < total and cumulative[e + 1] - cumulative[s] <= max_tokens:
+            e += 1
+            if split_headings and e < total and segments[e][1] == HEADING:
+                break
+
+        if e == s:
+            yield from _split_oversized(
+                text[starts[s]:starts[s + 1]], segments[s][2], tokenizer, max_tokens, overlap
+            )
+            s += 1
+            continue
+
+        # Strongest boundary among those leaving the chunk at least min_fill full
+        cut = e
+        if e < total:
+            best_level = -1
+            for k in range(s + 1, e + 1):
+                if cumulative[k] - cumulative[s] < min_fill * max_tokens and k < e:
+                    continue
+                level = segments[k][1]
+                if level >= best_level:
+                    best_level, cut = level, k
+
+        yield {
+            'section': segments[s][2],
+            'tokens': cumulative[cut] - cumulative[s],
+            'content': text[starts[s]:starts[cut]]
+        }
+        if cut == total:
+            return
+
+        # Start the next chunk up to `overlap` tokens back, never across a heading
+        next_start = cut
+        if overlap and segments[cut][1] != HEADING:
+            while (next_start - 1 > s and segments[next_start][1] != HEADING
+                   and cumulative[cut] - cumulative[next_start - 1] <= overlap):
+                next_start -= 1
+        s = next_start
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def iter_chunks(pages, tokenizer, strategy='semantic', max_tokens=512, overlap=64,
+                batch_size=64, num_threads=1):
+    """
+    Stream chunks of crawled pages
+
+    Pages are read `batch_size` at a time and all of a batch's segments are
+    encoded together, so every character is tokenized once and token
+    counts are summed instead of re-encoding candidate chunks.
+
+    Args:
+        pages: Iterable of {'url', 'content'} dicts
+        tokenizer: tiktoken encoding
+        strategy: 'fixed', 'markdown-heading' or 'semantic'
+
+    Yields:
+        {'url', 'chunk_index', 'section', 'tokens', 'content'} for every
+        chunk, in page order
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown chunk strategy: {strategy}")
+    if not 0 <= overlap < max_tokens:
+        raise ValueError("Chunk overlap must be smaller than max_tokens")
+
+    def encode(texts):
+        if num_threads > 1:
+            return tokenizer.encode_batch(texts, num_threads=num_threads)
+        return [tokenizer.encode(text) for text in texts]
+
+    for batch in batched(pages, batch_size):
+        if strategy == 'fixed':
+            encoded = encode([page['content'] for page in batch])
+            chunk_lists = [
+                chunk_fixed(page['content'], tokens, tokenizer, max_tokens, overlap)
+                for page, tokens in zip(batch, encoded)
+            ]
+        else:
+            page_segments = [split_segments(page['content']) for page in batch]
+            texts = []
+            for page, segments in zip(batch, page_segments):
+                content = page['content']
+                bounds = [start for start, _, _ in segments] + [len(content)]
+                texts.extend(content[bounds[i]:bounds[i + 1]] for i in range(len(segments)))
+            counts = iter([len(tokens) for tokens in encode(texts)])
+            chunk_lists = [
+                chunk_structured(
+                    page['content'],
+                    segments,
+                    list(islice(counts, len(segments))),
+                    tokenizer,
+                    max_tokens,
+                    overlap,
+                    split_headings=strategy == 'markdown-heading'
+                )
+                for page, segments in zip(batch, page_segments)
+            ]
+
+        for page, chunks in zip(batch, chunk_lists):
+            for index, chunk in enumerate(chunks):
+                yield {'url': page['url'], 'chunk_index': index, **chunk}
@@ -0,0 +1,115 @@
+import hashlib
+import re
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r'\w+')
+
+class HashingEmbedder:
+    """
+    TF-IDF over feature-hashed words, and optionally word bigrams
+
+    A dependency-free stand-in for a neural model: each feature is hashed
+    to one of `dim` signed buckets, counts are damped with log1p, weighted
+    by the inverse document frequency of their bucket once fit() has seen
+    a sample, and rows are L2-normalized, so dot products are cosine
+    similarities. Texts are embedded a batch at a time with a single
+    bincount.
+    """
+
+    name = 'hashing'
+
+    def __init__(self, dim=384, bigrams=False, idf=None, cache_size=1000000):
+        self.dim = dim
+        self.bigrams = bigrams
+        self.idf = np.asarray(idf, dtype=np.float32) if idf is not None else None
+        self.cache_size = cache_size
+        self._buckets = {}
+
+    def settings(self):
+        idf = [round(float(weight), 6) for weight in self.idf] if self.idf is not None else None
+        return {'dim': self.dim, 'bigrams': self.bigrams, 'idf': idf}
+
+    def fit(self, texts):
+        """Learn bucket document frequencies from a sample of texts"""
+        frequencies = np.count_nonzero(self._counts(texts), axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + frequencies)) + 1).astype(np.float32)
+
+    def _bucket(self, feature):
+        """Bucket index * 2 + sign bit of a feature"""
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+            bucket = (digest >> 1) % self.dim * 2 + (digest & 1)
+            if len(self._buckets) >= self.cache_size:
+                self._buckets.clear()
+            self._buckets[feature] = bucket
+        return bucket
+
+    def _counts(self, texts):
+        """Signed feature counts per bucket, shape (len(texts), dim)"""
+        rows = []
+        buckets = []
+        for row, text in enumerate(texts):
+            words = WORD_PATTERN.findall(text.lower())
+            features = words + [f'{a} {b}' for a, b in zip(words, words[1:])] if self.bigrams else words
+            buckets.extend(self._bucket(feature) for feature in features)
+            rows.extend([row] * len(features))
+
+        buckets = np.asarray(buckets, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        return np.bincount(
+            rows * self.dim + (buckets >> 1),
+            weights=1.0 - 2.0 * (buckets & 1),
+            minlength=len(texts) * self.dim
+        ).reshape(len(texts), self.dim)
+
+    def embed(self, texts):
+        """Unit float32 vectors of texts, shape (len(texts), dim)"""
+        counts = self._counts(texts)
+        vectors = (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32)
+        if self.idf is not None:
+            vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model run on the CPU (needs sentence-transformers)"""
+
+    name = 'sentence-transformers'
+
+    def __init__(self, model_name='all-MiniLM-L6-v2', device='cpu'):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError(
+                "The sentence-transformers model requires sentence-transformers: "
+                "pip install sentence-transformers"
+            )
+        self.model_name = model_name
+        self.device = device
+        self.model = SentenceTransformer(model_name, device=device)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def settings(self):
+        return {'model_name': self.model_name, 'device': self.device}
+
+    def embed(self, texts):
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return vectors.astype(np.float32, copy=False)
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    SentenceTransformerEmbedder.name: SentenceTransformerEmbedder
+}
+
+def create_embedder(name='hashing', **options):
+    """Embedding model by name, with model-specific options"""
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedding model: {name}")
+    return EMBEDDERS[name](**options)
@@ -2,14 +2,22 @@ import os
 import sys
 import argparse
 import logging
+import time
 from dotenv import load_dotenv
 import yaml
-import json
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import tiktoken
 
 from firecrawl import FirecrawlApp
 import validators
 
+from build_manifest import BuildManifest, content_hash
+from chunking import STRATEGIES, batched, iter_chunks
+from embeddings import create_embedder
+from vector_index import VectorIndex, build_index
+from writer import FORMATS, KnowledgeBaseWriter, iter_records, read_records
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, 
@@ -17,21 +25,111 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(encoding_name="cl100k_base"):
+    """Load a tiktoken encoding once per process"""
+    return tiktoken.get_encoding(encoding_name)
+
+def _token_boundary(text, start):
+    """
+    First index at or after start where the text can be cut without
+    changing the tokens before it, or -1
+
+    tiktoken's split patterns never join a non-space character with a
+    following space, so a space after a non-space always starts a new piece.
+    """
+    position = text.find(' ', start)
+    while position > 0 and text[position - 1].isspace():
+        position = text.find(' ', position + 1)
+    return position
+
+def truncate_tokens(tokenizer, text, max_tokens, chars_per_token=4):
+    """
+    Text cut to its first max_tokens tokens, or None if it is not longer
+
+    The text is encoded in segments split at token boundaries, starting
+    with about max_tokens * chars_per_token characters and extending by an
+    estimate from the characters per token seen so far, until more than
+    max_tokens tokens are found. Long pages are never encoded in full, and
+    the result is the same as decoding the first max_tokens tokens of the
+    whole text.
+    """
+    tokens = []
+    position = 0
+    limit = max_tokens * chars_per_token
+    while position < len(text) and len(tokens) <= max_tokens:
+        cut = _token_boundary(text, limit) if limit < len(text) else -1
+        end = cut if cut != -1 else len(text)
+        tokens.extend(tokenizer.encode(text[position:end]))
+        position = end
+        # Aim 10% past max_tokens at the density seen so far
+        remaining = max_tokens - len(tokens)
+        limit = position + int(position / max(len(tokens), 1) * remaining * 1.1) + 1
+
+    return tokenizer.decode(tokens[:max_tokens]) if len(tokens) > max_tokens else None
+
+def truncate_batch(tokenizer, texts, max_tokens, num_threads=8, chars_per_token=4):
+    """
+    Truncate each text to at most max_tokens tokens
+
+    Texts longer than max_tokens * chars_per_token characters are almost
+    certainly over the limit and are truncated from a prefix on a thread
+    pool. The rest are encoded together with encode_batch. With a single
+    thread both run in this thread instead.
+    """
+    results = list(texts)
+    long_ids = [i for i, text in enumerate(texts) if len(text) > max_tokens * chars_per_token]
+    long_set = set(long_ids)
+    short_ids = [i for i in range(len(texts)) if i not in long_set]
+
+    short_texts = [texts[i] for i in short_ids]
+    if num_threads > 1:
+        encoded = tokenizer.encode_batch(short_texts, num_threads=num_threads)
+    else:
+        encoded = map(tokenizer.encode, short_texts)
+    for i, tokens in zip(short_ids, encoded):
+        if len(tokens) > max_tokens:
+            results[i] = tokenizer.decode(tokens[:max_tokens])
+
+    def truncate(text):
+        return truncate_tokens(tokenizer, text, max_tokens, chars_per_token)
+
+    long_texts = [texts[i] for i in long_ids]
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        truncated = executor.map(truncate, long_texts) if num_threads > 1 else map(truncate, long_texts)
+        for i, text in zip(long_ids, truncated):
+            if text is not None:
+                results[i] = text
+
+    return results
+
 class GPTKnowledgeCrawler:
     def __init__(self, config_path):
         load_dotenv()
         
-        # Initialize Firecrawl
-        self.firecrawl = FirecrawlApp(
-            api_key=os.getenv('FIRECRAWL_API_KEY')
-        )
-        
         # Load configuration
         with open(config_path, 'r') as file:
             self.config = yaml.safe_load(file)
         
         # Validate base configuration
         self._validate_config()
+        
+        # URL -> content hash -> chunk ids of previous builds, for incremental rebuilds
+        output = self.config.get('output', {})
+        self.manifest = None
+        self.build = None
+        if output.get('incremental'):
+            self.manifest = BuildManifest(output.get(
+                'manifest_path',
+                f"{os.path.splitext(output['filename'])[0]}.builds.db"
+            ))
+    
+    @functools.cached_property
+    def firecrawl(self):
+        """Firecrawl client, created on first use so querying needs no API key"""
+        return FirecrawlApp(
+            api_key=os.getenv('FIRECRAWL_API_KEY')
+        )
     
     def _validate_config(self):
         """Validate configuration parameters"""
@@ -43,6 +141,21 @@ class GPTKnowledgeCrawler:
         for key in required_keys:
             if key not in self.config['domain']:
                 raise KeyError(f"Missing required configuration key: {key}")
+        
+        extraction = self.config.get('extraction', {})
+        strategy = extraction.get('chunk_strategy')
+        if strategy not in (None, 'none') + STRATEGIES:
+            raise ValueError(f"Unknown chunk strategy: {strategy}")
+        if extraction.get('chunk_overlap', 200) >= extraction.get('max_tokens', 4000):
+            raise ValueError("chunk_overlap must be smaller than max_tokens")
+        
+        output_format = self.config.get('output', {}).get('format', 'json')
+        if output_format not in FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        if self.config.get('output', {}).get('incremental') and 'filename' not in self.config['output']:
+            raise KeyError("Incremental builds need output.filename")
+        if self.config.get('embeddings', {}).get('enabled') and 'filename' not in self.config.get('output', {}):
+            raise KeyError("Embeddings need output.filename")
     
     def crawl(self):
         """Crawl and extract content based on configuration"""
@@ -62,52 +175,281 @@ class GPTKnowledgeCrawler:
                 }
             )
             
-            return self._process_crawl_results(crawl_result)
+            if self.manifest is not None:
+                return self.iter_changes(crawl_result)
+            return self.iter_processed(crawl_result)
         
         except Exception as e:
             logger.error(f"Crawling error: {e}")
             return None
     
+    def chunk_pages(self, pages):
+        """Stream token-bounded, overlapping chunks of pages with the configured strategy"""
+        extraction = self.config.get('extraction', {})
+        return iter_chunks(
+            pages,
+            get_tokenizer(extraction.get('tokenizer', 'cl100k_base')),
+            strategy=extraction['chunk_strategy'],
+            max_tokens=extraction.get('max_tokens', 4000),
+            overlap=extraction.get('chunk_overlap', 200),
+            num_threads=extraction.get('tokenize_workers', os.cpu_count() or 1)
+        )
+    
+    def iter_processed(self, results, batch_size=64):
+        """Stream processed records of crawl results, `batch_size` pages at a time"""
+        extraction = self.config.get('extraction', {})
+        pages = results.get('pages', [])
+        if extraction.get('chunk_strategy', 'none') != 'none':
+            # Split every page into chunks instead of truncating it
+            yield from self.chunk_pages(pages)
+            return
+        
+        max_tokens = extraction.get('max_tokens', 4000)
+        tokenizer = get_tokenizer(extraction.get('tokenizer', 'cl100k_base'))
+        
+        for batch in batched(pages, batch_size):
+            contents = truncate_batch(
+                tokenizer,
+                [page['content'] for page in batch],
+                max_tokens,
+                num_threads=extraction.get('tokenize_workers', os.cpu_count() or 1)
+            )
+            for page, content in zip(batch, contents):
+                if content is not page['content']:
+                    logger.info(f"Truncating content from {page['url']}")
+                yield {
+                    'url': page['url'],
+                    'content': content
+                }
+    
     def _process_crawl_results(self, results):
         """Process and filter crawl results"""
-        max_tokens = self.config.get('extraction', {}).get('max_tokens', 4000)
-        tokenizer = tiktoken.get_encoding("cl100k_base")
+        return list(self.iter_processed(results))
+    
+    def _build_settings(self):
+        """Settings that shape the records; changing any of them forces a full build"""
+        extraction = self.config.get('extraction', {})
+        output = self.config.get('output', {})
+        return {
+            'max_tokens': extraction.get('max_tokens', 4000),
+            'tokenizer': extraction.get('tokenizer', 'cl100k_base'),
+            'chunk_strategy': extraction.get('chunk_strategy', 'none'),
+            'chunk_overlap': extraction.get('chunk_overlap', 200),
+            'format': output.get('format', 'json')
+        }
+    
+    def iter_changes(self, results):
+        """
+        Stream the records of new and changed pages since the last build
         
-        processed_content = []
-        for page in results.get('pages', []):
-            tokens = tokenizer.encode(page['content'])
-            
-            if len(tokens) <= max_tokens:
-                processed_content.append({
-                    'url': page['url'],
-                    'content': page['content']
-                })
-            else:
-                logger.info(f"Truncating content from {page['url']}")
-                truncated_content = tokenizer.decode(tokens[:max_tokens])
-                processed_content.append({
-                    'url': page['url'],
-                    'content': truncated_content
-                })
+        Pages whose content hash matches the manifest are skipped before
+        tokenization. Every record gets a stable id, `<url>#<chunk_index>`.
+        Ids that no longer exist, either because a page now has fewer
+        chunks or because the page is gone, are written as
+        `{'id', 'url', 'deleted': True}` tombstones. When the build settings
+        have changed since the last build, every page is rebuilt into a new
+        base file instead.
+        """
+        last_build, settings = self.manifest.last_build()
+        full = settings != self._build_settings()
+        if full:
+            self.manifest.reset()
+        self.build = {
+            'build': last_build + 1,
+            'kind': 'base' if full else 'delta',
+            'upserts': 0,
+            'deletes': 0
+        }
+        return self._iter_changed_records(results.get('pages', []))
+    
+    def _record_schema(self):
+        """
+        Columns of incremental build records in parquet and arrow output
+
+        Fixed up front, so every shard has the content and `deleted`
+        columns whether its first rows are records or tombstones.
+        """
+        columns = [('id', 'string'), ('url', 'string')]
+        if self.config.get('extraction', {}).get('chunk_strategy', 'none') != 'none':
+            columns += [('chunk_index', 'int64'), ('section', 'string'), ('tokens', 'int64')]
+        return columns + [('content', 'string'), ('deleted', 'bool')]
+    
+    def _tombstones(self, url, chunk_ids):
+        for chunk_id in chunk_ids:
+            self.build['deletes'] += 1
+            yield {'id': chunk_id, 'url': url, 'deleted': True}
+    
+    def _iter_changed_records(self, pages):
+        known = self.manifest.hashes()
+        changed = []
+        seen = set()
+        for page in pages:
+            if page['url'] in seen:
+                continue
+            seen.add(page['url'])
+            page_hash = content_hash(page['content'])
+            if known.get(page['url']) != page_hash:
+                changed.append((page, page_hash))
+        logger.info(f"{len(changed)} of {len(seen)} pages are new or changed")
         
-        return processed_content
+        # Records come in page order, so each page's records are contiguous
+        records = self.iter_processed({'pages': [page for page, _ in changed]})
+        record = next(records, None)
+        for page, page_hash in changed:
+            url = page['url']
+            chunk_ids = []
+            while record is not None and record['url'] == url:
+                chunk_id = f"{url}#{len(chunk_ids)}"
+                chunk_ids.append(chunk_id)
+                yield {'id': chunk_id, **record}
+                record = next(records, None)
+            yield from self._tombstones(url, self.manifest.chunk_ids(url)[len(chunk_ids):])
+            self.manifest.put(url, page_hash, chunk_ids)
+            self.build['upserts'] += len(chunk_ids)
+        
+        removed = set(known) - seen
+        max_pages = self.config.get('extraction', {}).get('max_pages', 50)
+        if removed and len(pages) >= max_pages:
+            # A crawl cut off by max_pages does not show which pages are gone
+            logger.warning(f"Crawl reached max_pages, keeping {len(removed)} missing pages")
+            return
+        for url in sorted(removed):
+            yield from self._tombstones(url, self.manifest.chunk_ids(url))
+            self.manifest.remove(url)
     
     def save_knowledge_base(self, content):
-        """Save processed content to knowledge base file"""
-        output_format = self.config.get('output', {}).get('format', 'json')
-        output_filename = self.config.get('output', {}).get(
+        """
+        Stream processed content to the knowledge base file(s)
+        
+        Records are written as they are read from `content`, which can be
+        any iterable, so the knowledge base is never held in memory. Output
+        is split into shards when `output.shard_max_records` or
+        `output.shard_max_bytes` is set. Incremental builds go to
+        `<name>.base-<build>.<ext>` or `<name>.delta-<build>.<ext>`, and the
+        build manifest is committed only once the output has been written.
+        
+        Returns:
+            Number of records written
+        """
+        output = self.config.get('output', {})
+        output_format = output.get('format', 'json')
+        output_filename = output.get(
             'filename', 
             f'knowledge_base_{int(time.time())}.{output_format}'
         )
         
-        with open(output_filename, 'w') as f:
-            if output_format == 'json':
-                json.dump(content, f, indent=2)
-            elif output_format == 'jsonl':
+        build = self.build if self.manifest is not None else None
+        if build:
+            # A new file per build, so a failed build never overwrites the last one
+            base, extension = os.path.splitext(output_filename)
+            output_filename = f"{base}.{build['kind']}-{build['build']:05d}{extension}"
+        
+        try:
+            with KnowledgeBaseWriter(
+                output_filename,
+                output_format,
+                max_records=output.get('shard_max_records'),
+                max_bytes=output.get('shard_max_bytes'),
+                compression=output.get('compression'),
+                row_group_size=output.get('row_group_size', 1000),
+                schema=self._record_schema() if build else None
+            ) as writer:
                 for item in content:
-                    f.write(json.dumps(item) + '\n')
+                    writer.write(item)
+        except Exception:
+            if self.manifest is not None:
+                self.manifest.rollback()
+            raise
         
-        logger.info(f"Knowledge base saved to {output_filename}")
+        if build and writer.records:
+            self.manifest.record_build(
+                build['build'],
+                build['kind'],
+                writer.paths,
+                self._build_settings(),
+                build['upserts'],
+                build['deletes']
+            )
+            self.manifest.commit()
+            logger.info(
+                f"Build {build['build']} ({build['kind']}) saved to {', '.join(writer.paths)}: "
+                f"{build['upserts']} records written, {build['deletes']} deleted"
+            )
+        elif build:
+            self.manifest.commit()
+            logger.info("Knowledge base is up to date")
+        elif writer.records:
+            logger.info(f"Knowledge base saved to {', '.join(writer.paths)} ({writer.records} records)")
+        else:
+            logger.warning("No content extracted")
+        return writer.records
+    
+    def iter_knowledge_base(self):
+        """
+        Stream the current records of the saved knowledge base
+        
+        With incremental builds, the latest base and its deltas are read
+        twice: once to find where the live version of each record id is,
+        and once to yield those records, so only ids are held in memory.
+        """
+        if self.manifest is None:
+            yield from iter_records(self.config['output']['filename'])
+            return
+        
+        builds = self.manifest.builds()
+        live = {}
+        for number, build in enumerate(builds):
+            for position, record in enumerate(r for path in build['paths'] for r in read_records(path)):
+                if record.get('deleted'):
+                    live.pop(record['id'], None)
+                else:
+                    live[record['id']] = (number, position)
+        
+        for number, build in enumerate(builds):
+            for position, record in enumerate(r for path in build['paths'] for r in read_records(path)):
+                if not record.get('deleted') and live.get(record['id']) == (number, position):
+                    yield record
+    
+    def _index_dir(self):
+        embeddings = self.config.get('embeddings', {})
+        if 'index_dir' in embeddings:
+            return embeddings['index_dir']
+        if 'filename' not in self.config.get('output', {}):
+            raise KeyError("The vector index needs embeddings.index_dir or output.filename")
+        return f"{os.path.splitext(self.config['output']['filename'])[0]}.index"
+    
+    def index_knowledge_base(self):
+        """Embed the saved knowledge base and rebuild its vector index"""
+        embeddings = self.config.get('embeddings', {})
+        embedder = create_embedder(
+            embeddings.get('model', 'hashing'),
+            **embeddings.get('model_options', {})
+        )
+        index_dir = self._index_dir()
+        
+        start = time.perf_counter()
+        index = build_index(
+            self.iter_knowledge_base(),
+            embedder,
+            index_dir,
+            batch_size=embeddings.get('batch_size', 256),
+            nlist=embeddings.get('nlist')
+        )
+        logger.info(
+            f"Indexed {index.count} records into {index.nlist} lists in {index_dir} "
+            f"({time.perf_counter() - start:.1f}s)"
+        )
+        index.close()
+    
+    def query(self, text, k=5, nprobe=None):
+        """Top k knowledge base records for a text query"""
+        index = VectorIndex(self._index_dir())
+        try:
+            embedder = create_embedder(**index.meta['embedder'])
+            nprobe = nprobe or self.config.get('embeddings', {}).get('nprobe', 16)
+            return index.query(text, embedder, k, nprobe)
+        finally:
+            index.close()
 
 def main():
     parser = argparse.ArgumentParser(description="GPT Knowledge Crawler")
@@ -116,15 +458,34 @@ def main():
         required=True, 
         help='Path to configuration YAML file'
     )
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('crawl', help='Crawl and save the knowledge base (default)')
+    subparsers.add_parser('index', help='Build the vector index of the saved knowledge base')
+    query_parser = subparsers.add_parser('query', help='Search the vector index')
+    query_parser.add_argument('text', help='Query text')
+    query_parser.add_argument('-k', type=int, default=5, help='Number of results')
+    query_parser.add_argument('--nprobe', type=int, help='Inverted lists to search')
     
     args = parser.parse_args()
     
     try:
         crawler = GPTKnowledgeCrawler(args.config)
+        if args.command == 'query':
+            for result in crawler.query(args.text, args.k, args.nprobe):
+                section = f" ({result['section']})" if result.get('section') else ''
+                print(f"{result['score']:.4f}  {result['url']}{section}")
+                print(f"        {' '.join(result['content'].split())[:200]}")
+            return
+        if args.command == 'index':
+            crawler.index_knowledge_base()
+            return
+        
         results = crawler.crawl()
         
-        if results:
-            crawler.save_knowledge_base(results)
+        if results is not None:
+            written = crawler.save_knowledge_base(results)
+            if written and crawler.config.get('embeddings', {}).get('enabled'):
+                crawler.index_knowledge_base()
         else:
             logger.warning("No content extracted")
     
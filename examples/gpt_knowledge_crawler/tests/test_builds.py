@@ -0,0 +1,52 @@
+import random
+
+import pytest
+import yaml
+
+import main as knowledge_crawler
+from benchmark_tokenization import make_vocabulary, stand_in_encoding
+from main import GPTKnowledgeCrawler
+from writer import read_records
+
+def make_crawler(tmp_path, output_format, monkeypatch):
+    random.seed(0)
+    tokenizer = stand_in_encoding(make_vocabulary(200))
+    monkeypatch.setattr(knowledge_crawler, 'get_tokenizer', lambda name: tokenizer)
+    config = {
+        'domain': {'base_url': 'https://example.com', 'allowed_paths': ['/docs']},
+        'extraction': {'max_tokens': 20, 'chunk_strategy': 'fixed', 'chunk_overlap': 0, 'max_pages': 50},
+        'output': {
+            'format': output_format,
+            'filename': str(tmp_path / f'kb.{output_format}'),
+            'incremental': True
+        }
+    }
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(yaml.safe_dump(config))
+    return GPTKnowledgeCrawler(str(config_path))
+
+def build(crawler, pages):
+    crawler.save_knowledge_base(crawler.iter_changes({'pages': pages}))
+    return [record for path in crawler.manifest.builds()[-1]['paths'] for record in read_records(path)]
+
+@pytest.mark.parametrize('output_format', ['jsonl', 'parquet', 'arrow'])
+def test_delta_tombstones_survive_every_format(tmp_path, output_format, monkeypatch):
+    """Test tombstones of shrunk and removed pages are read back as deleted"""
+    if output_format != 'jsonl':
+        pytest.importorskip('pyarrow')
+    crawler = make_crawler(tmp_path, output_format, monkeypatch)
+    long_page = {'url': 'https://example.com/docs/a', 'content': 'stream the docs ' * 40}
+    other_page = {'url': 'https://example.com/docs/b', 'content': 'kafka topics ' * 10}
+
+    base = build(crawler, [long_page, other_page])
+    delta = build(crawler, [{**long_page, 'content': 'stream the docs'}])
+
+    deleted = sorted(record['id'] for record in delta if record.get('deleted'))
+    base_ids = [record['id'] for record in base]
+    assert deleted == sorted(
+        record_id for record_id in base_ids if record_id != 'https://example.com/docs/a#0'
+    )
+    live = list(crawler.iter_knowledge_base())
+    assert [(record['id'], record['content']) for record in live] == [
+        ('https://example.com/docs/a#0', 'stream the docs')
+    ]
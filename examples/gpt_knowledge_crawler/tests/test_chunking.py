@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from benchmark_tokenization import covers, make_pages, make_vocabulary, stand_in_encoding
+from chunking import STRATEGIES, iter_chunks, split_segments
+
+MARKDOWN = """# Install
+
+Run the installer. It takes a minute.
+
+## Configure
+
+Edit `config.yaml`:
+
+```
+kafka:
+  topic: docs
+```
+
+# Usage
+
+Start the crawler and watch the log.
+"""
+
+def make_tokenizer():
+    random.seed(0)
+    vocabulary = make_vocabulary(500)
+    return stand_in_encoding(vocabulary), vocabulary
+
+def chunk(pages, tokenizer, strategy, max_tokens=40, overlap=8):
+    by_url = {}
+    for record in iter_chunks(pages, tokenizer, strategy, max_tokens, overlap, batch_size=4):
+        by_url.setdefault(record['url'], []).append(record)
+    return by_url
+
+def test_split_segments_sections():
+    """Test headings set the section path of the segments after them"""
+    sections = [section for _, _, section in split_segments(MARKDOWN)]
+
+    assert sections[0] == 'Install'
+    assert 'Install > Configure' in sections
+    assert sections[-1] == 'Usage'
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_chunks_within_max_tokens_and_cover_pages(strategy):
+    """Test every chunk fits max_tokens, reports its token count and pages are covered"""
+    tokenizer, vocabulary = make_tokenizer()
+    pages = make_pages(20, vocabulary) + [{'url': 'https://example.com/md', 'content': MARKDOWN}]
+
+    by_url = chunk(pages, tokenizer, strategy)
+
+    for page in pages:
+        chunks = by_url[page['url']]
+        assert [c['chunk_index'] for c in chunks] == list(range(len(chunks)))
+        assert covers(page['content'], chunks)
+        for c in chunks:
+            assert len(tokenizer.encode(c['content'])) == c['tokens'] <= 40
+
+def test_markdown_heading_starts_chunks():
+    """Test markdown-heading never lets a chunk run across a heading"""
+    tokenizer, _ = make_tokenizer()
+    chunks = chunk([{'url': 'u', 'content': MARKDOWN}], tokenizer, 'markdown-heading', max_tokens=200)['u']
+
+    assert [c['section'] for c in chunks] == ['Install', 'Install > Configure', 'Usage']
+
+@pytest.mark.parametrize('strategy', STRATEGIES)
+def test_non_ascii_chunks_keep_whole_characters(strategy):
+    """Test windows never split a multi-byte character of CJK text or emoji"""
+    tokenizer, _ = make_tokenizer()
+    random.seed(1)
+    cjk = ''.join(chr(random.randrange(0x4e00, 0x9fff)) for _ in range(600))
+    text = f'# 概要\n\n{cjk[:300]}。{cjk[300:]}\n\nCafé 🎉🎉 naïve ' + ' '.join(cjk[i:i + 5] for i in range(0, 200, 5))
+
+    chunks = chunk([{'url': 'u', 'content': text}], tokenizer, strategy, max_tokens=50, overlap=10)['u']
+
+    assert len(chunks) > 10
+    assert covers(text, chunks)
+    for c in chunks:
+        assert '�' not in c['content']
+        assert len(tokenizer.encode(c['content'])) == c['tokens'] <= 50
+
+def test_character_longer_than_max_tokens():
+    """Test a character of more tokens than max_tokens gets a window of its own"""
+    tokenizer, _ = make_tokenizer()
+    chunks = chunk([{'url': 'u', 'content': '🎉🎉🎉'}], tokenizer, 'fixed', max_tokens=3, overlap=1)['u']
+
+    assert [c['content'] for c in chunks] == ['🎉', '🎉', '🎉']
@@ -0,0 +1,74 @@
+import random
+
+import numpy as np
+import pytest
+
+from benchmark_index import make_records
+from benchmark_tokenization import make_vocabulary
+from embeddings import HashingEmbedder
+from vector_index import VectorIndex, build_index
+
+K = 10
+
+@pytest.fixture(scope='module')
+def built(tmp_path_factory):
+    random.seed(0)
+    records = make_records(300, 20, make_vocabulary(2000))
+    embedder = HashingEmbedder()
+    directory = str(tmp_path_factory.mktemp('index') / 'index')
+    index = build_index(iter(records), embedder, directory)
+    queries = []
+    for number in random.sample(range(len(records)), 100):
+        words = records[number]['content'].split()
+        offset = random.randint(0, max(len(words) - 12, 0))
+        queries.append(embedder.embed([' '.join(words[offset:offset + 12])])[0])
+    yield records, embedder, directory, index, queries
+    index.close()
+
+def exact(index, vector):
+    scores = np.asarray(index.vectors) @ vector
+    top = np.argsort(-scores, kind='stable')[:K]
+    return [int(index.row_ids[i]) for i in top]
+
+def recall(index, queries, nprobe):
+    found = 0
+    for vector in queries:
+        expected = exact(index, vector)
+        found += len({number for _, number in index.search(vector, K, nprobe)} & set(expected))
+    return found / (K * len(queries))
+
+def test_index_holds_every_record(built):
+    """Test every record is indexed once and row ids map back to it"""
+    records, _, _, index, _ = built
+
+    assert index.nlist > 1
+    assert sorted(int(number) for number in index.row_ids) == list(range(len(records)))
+    assert index.list_offsets[-1] == len(records)
+    assert index.record(7)['id'] == records[7]['id']
+
+def test_probing_every_list_is_exact(built):
+    """Test nprobe >= nlist scans every vector and matches the exact scores"""
+    _, _, _, index, queries = built
+    for vector in queries[:20]:
+        scores = np.asarray(index.vectors) @ vector
+        found = index.search(vector, K, index.nlist)
+        assert [score for score, _ in found] == pytest.approx(sorted(scores, reverse=True)[:K], abs=1e-5)
+
+def test_recall_grows_with_nprobe(built):
+    """Test IVF recall against exact search rises with nprobe and is high at 16"""
+    _, _, _, index, queries = built
+    recalls = [recall(index, queries, nprobe) for nprobe in (1, 4, 16)]
+
+    assert recalls == sorted(recalls)
+    assert recalls[-1] >= 0.9
+
+def test_reopened_index_queries(built):
+    """Test an index opened from disk finds a record from its own text"""
+    records, embedder, directory, _, _ = built
+    index = VectorIndex(directory)
+    results = index.query(records[3]['content'], embedder, k=3, nprobe=index.nlist)
+    index.close()
+
+    assert len(results) == 3
+    assert results[0]['id'] == records[3]['id']
+    assert results[0]['score'] >= results[1]['score']
@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from writer import KnowledgeBaseWriter, iter_records, read_records
+
+def make_records(count):
+    return [{'url': f'https://example.com/page-{i}', 'content': f'Page {i} ' * 20} for i in range(count)]
+
+def test_json_output_matches_json_dump(tmp_path):
+    """Test unsharded JSON output reads back as one array and needs no manifest"""
+    path = str(tmp_path / 'kb.json')
+    records = make_records(5)
+    with KnowledgeBaseWriter(path, 'json') as writer:
+        for record in records:
+            writer.write(record)
+
+    with open(path) as f:
+        assert json.load(f) == records
+    assert writer.paths == [path]
+    assert not os.path.exists(str(tmp_path / 'kb.manifest.json'))
+
+def test_sharded_jsonl_manifest(tmp_path):
+    """Test shards roll over at max_records and the manifest lists each one"""
+    path = str(tmp_path / 'kb.jsonl')
+    records = make_records(25)
+    with KnowledgeBaseWriter(path, 'jsonl', max_records=10) as writer:
+        for record in records:
+            writer.write(record)
+
+    with open(str(tmp_path / 'kb.manifest.json')) as f:
+        manifest = json.load(f)
+    assert manifest['records'] == 25
+    assert [shard['path'] for shard in manifest['shards']] == [
+        'kb-00000.jsonl', 'kb-00001.jsonl', 'kb-00002.jsonl'
+    ]
+    assert [shard['first_record'] for shard in manifest['shards']] == [0, 10, 20]
+    assert [shard['records'] for shard in manifest['shards']] == [10, 10, 5]
+    for shard in manifest['shards']:
+        assert shard['bytes'] == os.path.getsize(str(tmp_path / shard['path']))
+
+    shard = manifest['shards'][1]
+    assert list(read_records(str(tmp_path / shard['path'])))[0] == records[shard['first_record']]
+    assert list(iter_records(path)) == records
+
+def test_max_bytes_gzip_shards(tmp_path):
+    """Test the byte limit starts new gzip shards and reading follows them"""
+    path = str(tmp_path / 'kb.jsonl')
+    records = make_records(40)
+    with KnowledgeBaseWriter(path, 'jsonl', max_bytes=2000, compression='gzip') as writer:
+        for record in records:
+            writer.write(record)
+
+    assert len(writer.paths) > 1
+    assert all(shard_path.endswith('.jsonl.gz') for shard_path in writer.paths)
+    assert list(iter_records(path)) == records
+
+def test_unknown_format_rejected(tmp_path):
+    """Test unsupported formats and compressions fail before writing"""
+    with pytest.raises(ValueError):
+        KnowledgeBaseWriter(str(tmp_path / 'kb.csv'), 'csv')
+    with pytest.raises(ValueError):
+        KnowledgeBaseWriter(str(tmp_path / 'kb.jsonl'), 'jsonl', compression='zstd')
+
+def test_columnar_schema_keeps_tombstones(tmp_path):
+    """Test a fixed schema keeps `deleted` when the first row group has only records"""
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'kb.parquet')
+    schema = [('id', 'string'), ('url', 'string'), ('content', 'string'), ('deleted', 'bool')]
+    with KnowledgeBaseWriter(path, 'parquet', row_group_size=2, schema=schema) as writer:
+        writer.write({'id': 'a#0', 'url': 'a', 'content': 'alpha'})
+        writer.write({'id': 'a#1', 'url': 'a', 'content': 'beta'})
+        writer.write({'id': 'b#0', 'url': 'b', 'deleted': True})
+
+    records = list(iter_records(path))
+    assert [record['deleted'] for record in records] == [None, None, True]
+    assert records[2]['content'] is None
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_columnar_rejects_fields_outside_columns(tmp_path, output_format):
+    """Test a record with a field the first row group lacks fails instead of losing it"""
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / f'kb.{output_format}')
+    writer = KnowledgeBaseWriter(path, output_format, row_group_size=1)
+    writer.write({'id': 'a#0', 'url': 'a', 'content': 'alpha'})
+
+    with pytest.raises(ValueError, match='deleted'):
+        writer.write({'id': 'b#0', 'url': 'b', 'deleted': True})
@@ -0,0 +1,200 @@
+import json
+import os
+import shutil
+import time
+from itertools import chain, islice
+
+import numpy as np
+
+from chunking import batched
+
+RECORD_FIELDS = ('id', 'url', 'section', 'chunk_index', 'content')
+
+def _nearest(vectors, centroids, batch_size=8192):
+    """Index of the most similar centroid for each vector"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        block = np.asarray(vectors[start:start + batch_size])
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def _kmeans(sample, nlist, iterations=10, seed=0):
+    """Spherical k-means: unit centroids, compared by dot product"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest(sample, centroids)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.add.reduceat(sample[order], starts[filled], axis=0)
+        centroids[filled] = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        # Restart empty lists from random sample vectors
+        empty = np.flatnonzero(~filled)
+        centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+    return centroids
+
+def default_nlist(count):
+    """About 4 * sqrt(count) inverted lists, with at least 39 vectors each to train on"""
+    return max(1, min(int(4 * np.sqrt(count)), count // 39))
+
+def build_index(records, embedder, directory, batch_size=256, nlist=None, iterations=10, seed=0,
+                fit_size=4096):
+    """
+    Embed records and write an IVF vector index to `directory`
+
+    Records are embedded `batch_size` at a time and appended to a staging
+    float32 file, so memory use does not depend on the size of the
+    knowledge base. A coarse quantizer of `nlist` centroids is trained with
+    spherical k-means on a sample, and the vectors are then rewritten
+    grouped by their nearest centroid, so every inverted list is one
+    contiguous slice of the memory-mapped matrix. Models with a fit()
+    method, like the hashing model, are first fitted on the first
+    `fit_size` records.
+
+    The index is built next to `directory` and moved into place at the
+    end, so a failed build leaves the previous index untouched.
+
+    Args:
+        records: Iterable of knowledge base records; tombstones are skipped
+        embedder: Model from embeddings.create_embedder
+
+    Returns:
+        The new VectorIndex
+    """
+    building = f'{directory}.building'
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+    staging_path = os.path.join(building, 'vectors.staging')
+
+    count = 0
+    record_offsets = []
+    with open(staging_path, 'wb') as vectors_file, \
+            open(os.path.join(building, 'records.jsonl'), 'wb') as records_file:
+        live = (record for record in records if not record.get('deleted'))
+        if hasattr(embedder, 'fit'):
+            head = list(islice(live, fit_size))
+            if head:
+                embedder.fit([record['content'] for record in head])
+            live = chain(head, live)
+        for batch in batched(live, batch_size):
+            vectors = embedder.embed([record['content'] for record in batch])
+            vectors_file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            for record in batch:
+                record_offsets.append(records_file.tell())
+                line = json.dumps({field: record.get(field) for field in RECORD_FIELDS}) + '\n'
+                records_file.write(line.encode('utf-8'))
+            count += len(batch)
+    if not count:
+        shutil.rmtree(building)
+        raise ValueError("No records to index")
+
+    staging = np.memmap(staging_path, dtype=np.float32, mode='r', shape=(count, embedder.dim))
+    nlist = min(nlist or default_nlist(count), count)
+    rng = np.random.default_rng(seed)
+    sample_ids = np.sort(rng.choice(count, min(count, max(nlist * 64, 10000), 100000), replace=False))
+    centroids = _kmeans(np.asarray(staging[sample_ids]), nlist, iterations, seed)
+
+    assignments = _nearest(staging, centroids)
+    row_ids = np.argsort(assignments, kind='stable')
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))])
+
+    vectors = np.memmap(
+        os.path.join(building, 'vectors.f32'), dtype=np.float32, mode='w+', shape=(count, embedder.dim)
+    )
+    for start in range(0, count, 8192):
+        vectors[start:start + 8192] = staging[row_ids[start:start + 8192]]
+    vectors.flush()
+    del vectors, staging
+    os.remove(staging_path)
+
+    np.save(os.path.join(building, 'centroids.npy'), centroids.astype(np.float32))
+    np.save(os.path.join(building, 'list_offsets.npy'), list_offsets)
+    np.save(os.path.join(building, 'row_ids.npy'), row_ids)
+    np.save(os.path.join(building, 'record_offsets.npy'), np.asarray(record_offsets, dtype=np.int64))
+    with open(os.path.join(building, 'index.json'), 'w') as f:
+        json.dump({
+            'embedder': {'name': embedder.name, **embedder.settings()},
+            'dim': embedder.dim,
+            'count': count,
+            'nlist': nlist,
+            'created_at': time.time()
+        }, f, indent=2)
+
+    previous = f'{directory}.previous'
+    if os.path.exists(directory):
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(directory, previous)
+    os.replace(building, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+    return VectorIndex(directory)
+
+class VectorIndex:
+    """
+    Inverted-file (IVF) index over a memory-mapped float32 matrix
+
+    A query is compared with the centroids, and only the vectors of the
+    `nprobe` nearest inverted lists are scored. Vectors and records are
+    read from memory-mapped files, so opening an index costs little and
+    only the probed lists are paged in.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json')) as f:
+            self.meta = json.load(f)
+        self.count = self.meta['count']
+        self.nlist = self.meta['nlist']
+        self.vectors = np.memmap(
+            os.path.join(directory, 'vectors.f32'), dtype=np.float32, mode='r',
+            shape=(self.count, self.meta['dim'])
+        )
+        self.centroids = np.load(os.path.join(directory, 'centroids.npy'))
+        self.list_offsets = np.load(os.path.join(directory, 'list_offsets.npy'))
+        self.row_ids = np.load(os.path.join(directory, 'row_ids.npy'), mmap_mode='r')
+        self.record_offsets = np.load(os.path.join(directory, 'record_offsets.npy'), mmap_mode='r')
+        self._records = open(os.path.join(directory, 'records.jsonl'), 'rb')
+
+    def search(self, vector, k=5, nprobe=16):
+        """
+        Most similar records to a unit query vector
+
+        Returns:
+            List of (score, record number) pairs, best first
+        """
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        nprobe = min(nprobe, self.nlist)
+        if nprobe < self.nlist:
+            lists = np.argpartition(-(self.centroids @ vector), nprobe - 1)[:nprobe]
+        else:
+            lists = range(self.nlist)
+
+        scores = []
+        positions = []
+        for list_id in lists:
+            start, end = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+            if start < end:
+                scores.append(self.vectors[start:end] @ vector)
+                positions.append(np.arange(start, end))
+        if not scores:
+            return []
+        scores = np.concatenate(scores)
+        positions = np.concatenate(positions)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(self.row_ids[positions[i]])) for i in top]
+
+    def record(self, number):
+        self._records.seek(int(self.record_offsets[number]))
+        return json.loads(self._records.readline())
+
+    def query(self, text, embedder, k=5, nprobe=16):
+        """Top k records for a text query, each with its similarity `score`"""
+        vector = embedder.embed([text])[0]
+        return [{'score': score, **self.record(number)} for score, number in self.search(vector, k, nprobe)]
+
+    def close(self):
+        self._records.close()
@@ -0,0 +1,222 @@
+import gzip
+import json
+import os
+import textwrap
+
+FORMATS = ('json', 'jsonl', 'parquet', 'arrow')
+
+class KnowledgeBaseWriter:
+    """
+    Streams knowledge base records to one or more output files
+
+    Records are written as they arrive, so memory use does not depend on
+    the size of the crawl. With max_records or max_bytes set, output rolls
+    over to a new shard (`<name>-00000.<ext>`, `<name>-00001.<ext>`, ...)
+    once the current one reaches either limit. Sharded and columnar output
+    also gets a `<name>.manifest.json` listing every shard with its first
+    record offset, record count and size.
+
+    Formats:
+        json: a JSON array per file, indented like json.dump(..., indent=2)
+        jsonl: one JSON record per line, optionally gzip-compressed
+        parquet, arrow: columnar files written in row groups of
+            row_group_size records (needs pyarrow), compressed with zstd by
+            default. The columns are the (name, type) pairs of schema, with
+            pyarrow type aliases like 'string', 'int64' or 'bool', or else
+            those of each shard's first row group. A record with a field
+            outside the columns is rejected instead of losing the field.
+    """
+
+    def __init__(self, path, format='json', max_records=None, max_bytes=None,
+                 compression=None, row_group_size=1000, schema=None):
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported output format: {format}")
+        if compression not in (None, 'gzip') and format in ('json', 'jsonl'):
+            raise ValueError(f"Unsupported compression for {format}: {compression}")
+        if format in ('parquet', 'arrow'):
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError(f"Writing {format} output requires pyarrow: pip install pyarrow")
+
+        self.path = path
+        self.format = format
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.schema = schema
+        self.sharded = bool(max_records or max_bytes)
+
+        self.base, extension = os.path.splitext(path)
+        self.extension = extension or f'.{format}'
+        if compression == 'gzip' and format in ('json', 'jsonl'):
+            self.extension += '.gz'
+
+        self.records = 0
+        self.shards = []
+        self._file = None
+        self._writer = None
+        self._shard_schema = None
+        self._rows = []
+        self._shard_records = 0
+        self._shard_bytes = 0
+
+    @property
+    def paths(self):
+        return [shard['path'] for shard in self.shards]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record):
+        """Append a record, starting a new shard when the current one is full"""
+        if self._file is not None and self._shard_full():
+            self._close_shard()
+        if self._file is None:
+            self._open_shard()
+
+        if self.format == 'json':
+            data = textwrap.indent(json.dumps(record, indent=2), '  ')
+            data = ('[\n' if not self._shard_records else ',\n') + data
+            self._file.write(data)
+        elif self.format == 'jsonl':
+            data = json.dumps(record) + '\n'
+            self._file.write(data)
+        else:
+            data = json.dumps(record)
+            self._rows.append(record)
+            if len(self._rows) >= self.row_group_size:
+                self._flush_rows()
+
+        self._shard_records += 1
+        self._shard_bytes += len(data.encode('utf-8'))
+        self.records += 1
+
+    def _shard_full(self):
+        return (
+            (self.max_records and self._shard_records >= self.max_records)
+            or (self.max_bytes and self._shard_bytes >= self.max_bytes)
+        )
+
+    def _open_shard(self):
+        path = self.path if not self.sharded else f'{self.base}-{len(self.shards):05d}{self.extension}'
+        if not self.sharded and self.compression == 'gzip' and not path.endswith('.gz'):
+            path += '.gz'
+        self.shards.append({'path': path, 'first_record': self.records, 'records': 0, 'bytes': 0})
+
+        if self.format in ('json', 'jsonl'):
+            opener = gzip.open if self.compression == 'gzip' else open
+            self._file = opener(path, 'wt', encoding='utf-8')
+        else:
+            self._file = open(path, 'wb')
+        self._shard_records = 0
+        self._shard_bytes = 0
+
+    def _flush_rows(self):
+        """Write buffered rows as one row group or record batch"""
+        import pyarrow as pa
+
+        if not self._rows:
+            return
+        if self._writer is None:
+            if self.schema is not None:
+                schema = pa.schema([(name, pa.type_for_alias(alias)) for name, alias in self.schema])
+                table = pa.Table.from_pylist(self._rows, schema=schema)
+            else:
+                table = pa.Table.from_pylist(self._rows)
+            compression = self.compression or 'zstd'
+            if self.format == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self._file, table.schema, compression=compression)
+            else:
+                options = pa.ipc.IpcWriteOptions(compression=compression)
+                self._writer = pa.ipc.new_file(self._file, table.schema, options=options)
+            self._shard_schema = table.schema
+        else:
+            # Later batches follow the schema of the shard's first batch
+            table = pa.Table.from_pylist(self._rows, schema=self._shard_schema)
+        extra = {name for row in self._rows for name in row} - set(table.schema.names)
+        if extra:
+            raise ValueError(f"Fields not in the {self.format} columns: {sorted(extra)}")
+        self._writer.write_table(table)
+        self._rows = []
+
+    def _close_shard(self):
+        if self.format == 'json':
+            self._file.write('\n]' if self._shard_records else '[]')
+        elif self.format in ('parquet', 'arrow'):
+            self._flush_rows()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        self._file.close()
+        self._file = None
+
+        shard = self.shards[-1]
+        shard['records'] = self._shard_records
+        shard['bytes'] = os.path.getsize(shard['path'])
+
+    def close(self):
+        """Finish the current shard and write the manifest"""
+        if self._file is not None:
+            self._close_shard()
+        if self.shards and (self.sharded or self.format in ('parquet', 'arrow')):
+            directory = os.path.dirname(self.path)
+            manifest = {
+                'format': self.format,
+                'compression': self.compression,
+                'records': self.records,
+                'shards': [
+                    {**shard, 'path': os.path.relpath(shard['path'], directory or '.')}
+                    for shard in self.shards
+                ]
+            }
+            with open(f'{self.base}.manifest.json', 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+def read_records(path):
+    """Stream the records of one file written by KnowledgeBaseWriter"""
+    if path.endswith(('.jsonl', '.jsonl.gz')):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+    elif path.endswith(('.json', '.json.gz')):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            yield from json.load(f)
+    elif path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+    elif path.endswith('.arrow'):
+        import pyarrow as pa
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield from reader.get_batch(i).to_pylist()
+    else:
+        raise ValueError(f"Unknown knowledge base file type: {path}")
+
+def iter_records(path):
+    """
+    Stream the records written to `path`, following the shard manifest
+    when the output was sharded and the `.gz` suffix when it was compressed
+    """
+    base, _ = os.path.splitext(path)
+    manifest_path = f'{base}.manifest.json'
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        directory = os.path.dirname(path)
+        paths = [os.path.join(directory, shard['path']) for shard in manifest['shards']]
+    elif not os.path.exists(path) and os.path.exists(f'{path}.gz'):
+        paths = [f'{path}.gz']
+    else:
+        paths = [path]
+    for shard_path in paths:
+        yield from read_records(shard_path)
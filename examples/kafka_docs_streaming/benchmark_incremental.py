@@ -0,0 +1,209 @@
+"""
+Incremental re-crawl benchmark against a local documentation fixture
+
+Serves a small documentation site with a sitemap (lastmod on half of the
+pages) and ETag/Last-Modified validators on every page. The site changes
+between cycles, and each cycle reports how many pages were fetched and how
+many bytes the incremental mode saved compared with a full crawl.
+
+Usage:
+    python benchmark_incremental.py --pages 500 --churn 0.05
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import urllib.request
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml
+
+from benchmark_producer import InProcessBroker, StandInProducer
+from crawler import DocsCrawler
+from hash_store import ContentHashStore
+
+class DocsSite:
+    """Mutable set of pages with versions, lastmod dates and validators"""
+
+    def __init__(self, pages, page_bytes):
+        self.page_bytes = page_bytes
+        self.pages = {}
+        self.clock = 1_700_000_000
+        self.next_id = 0
+        for _ in range(pages):
+            self.add_page()
+
+    def add_page(self):
+        path = f'/documentation/page-{self.next_id}'
+        self.pages[path] = {'version': 0, 'modified': self.clock, 'with_lastmod': self.next_id % 2 == 0}
+        self.next_id += 1
+
+    def edit(self, path):
+        self.clock += 60
+        self.pages[path]['version'] += 1
+        self.pages[path]['modified'] = self.clock
+
+    def body(self, path):
+        page = self.pages[path]
+        line = f'{path} version {page["version"]}\n'
+        return (line * (self.page_bytes // len(line) + 1)).encode('utf-8')[:self.page_bytes]
+
+    def sitemap(self, base_url):
+        entries = []
+        for path, page in self.pages.items():
+            lastmod = f'<lastmod>{formatdate(page["modified"], usegmt=True)}</lastmod>' if page['with_lastmod'] else ''
+            entries.append(f'<url><loc>{base_url}{path}</loc>{lastmod}</url>')
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + ''.join(entries) + '</urlset>'
+        ).encode('utf-8')
+
+def make_handler(site, counters):
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self, include_body):
+            if self.path == '/sitemap.xml':
+                body = site.sitemap(f'http://{self.headers["Host"]}')
+                self._send(200, body, {}, include_body)
+                return
+
+            page = site.pages.get(self.path)
+            if page is None:
+                self._send(404, b'', {}, include_body)
+                return
+
+            headers = {
+                'ETag': f'"{self.path}-v{page["version"]}"',
+                'Last-Modified': formatdate(page['modified'], usegmt=True)
+            }
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                self._send(304, b'', headers, False)
+                return
+            self._send(200, site.body(self.path), headers, include_body)
+
+        def _send(self, status, body, headers, include_body):
+            counters[f'{self.command} {status}'] = counters.get(f'{self.command} {status}', 0) + 1
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if include_body:
+                counters['body_bytes'] = counters.get('body_bytes', 0) + len(body)
+                self.wfile.write(body)
+
+        def do_GET(self):
+            self._respond(True)
+
+        def do_HEAD(self):
+            self._respond(False)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+class FixtureCrawler(DocsCrawler):
+    """DocsCrawler that fetches pages from the fixture instead of Firecrawl"""
+
+    def _fetch(self, urls):
+        data = []
+        for url in urls:
+            with urllib.request.urlopen(url) as response:
+                data.append({'url': url, 'title': url.rsplit('/', 1)[-1], 'markdown': response.read().decode('utf-8')})
+        return {'data': data}
+
+    def crawl_docs(self):
+        base_url = self.config['crawler']['base_url']
+        with urllib.request.urlopen(f'{base_url}/sitemap.xml') as response:
+            sitemap = response.read().decode('utf-8')
+        urls = [part.split('</loc>')[0] for part in sitemap.split('<loc>')[1:]]
+        return self._fetch(urls)
+
+    def scrape_urls(self, urls):
+        return self._fetch(urls)
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental re-crawl benchmark')
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--page-bytes', type=int, default=20000)
+    parser.add_argument('--churn', type=float, default=0.05, help='Fraction of pages edited between cycles')
+    parser.add_argument('--cycles', type=int, default=6)
+    parser.add_argument('--full-crawl-every', type=int, default=4)
+    args = parser.parse_args()
+
+    random.seed(0)
+    logging.getLogger('crawler').setLevel(logging.WARNING)
+    os.environ.setdefault('FIRECRAWL_API_KEY', 'benchmark')
+
+    site = DocsSite(args.pages, args.page_bytes)
+    counters = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(site, counters))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    with open('config.yaml') as f:
+        config = yaml.safe_load(f)
+    config['crawler'].update({
+        'base_url': base_url,
+        'include_paths': ['/documentation/*'],
+        'exclude_paths': [],
+        'incremental': {
+            'enabled': True,
+            'sitemap_url': f'{base_url}/sitemap.xml',
+            'full_crawl_every': args.full_crawl_every,
+        }
+    })
+    config['kafka']['producer'] = {'mode': 'async', 'linger_ms': 5, 'compression_type': None}
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, 'config.yaml')
+        with open(config_path, 'w') as f:
+            yaml.safe_dump(config, f)
+
+        sent = []
+        crawler = FixtureCrawler(
+            config_path=config_path,
+            producer=object(),
+            hash_store=ContentHashStore(os.path.join(directory, 'hashes.db'))
+        )
+        crawler.producer = StandInProducer(
+            InProcessBroker(rtt_ms=1),
+            value_serializer=lambda x: sent.append(x['change_type']) or json.dumps(x).encode('utf-8'),
+            **crawler.producer_config()
+        )
+
+        print(f'{"cycle":>5} {"mode":<12} {"fetched":>8} {"HEAD":>6} {"304":>6} '
+              f'{"bytes fetched":>14} {"bytes saved":>12}  published')
+        try:
+            for cycle in range(args.cycles):
+                if cycle:
+                    # Edit some pages, remove one and add one
+                    for path in random.sample(list(site.pages), int(len(site.pages) * args.churn)):
+                        site.edit(path)
+                    site.pages.pop(random.choice(list(site.pages)))
+                    site.add_page()
+
+                counters.clear()
+                sent.clear()
+                docs, all_urls, validators, report = crawler.crawl_cycle()
+                failed = crawler.publish_changes(docs, all_urls)
+                if failed is not None:
+                    crawler.record_validators(docs, all_urls, validators, failed)
+
+                published = {kind: sent.count(kind) for kind in ('new', 'changed', 'deleted') if kind in sent}
+                print(f'{cycle:>5} {report["mode"]:<12} {report["pages_fetched"]:>8} '
+                      f'{counters.get("HEAD 200", 0) + counters.get("HEAD 304", 0):>6} '
+                      f'{counters.get("HEAD 304", 0):>6} {counters.get("body_bytes", 0):>14} '
+                      f'{report["bytes_saved"]:>12}  {published}')
+        finally:
+            crawler.producer.close()
+            server.shutdown()
+
+if __name__ == '__main__':
+    main()
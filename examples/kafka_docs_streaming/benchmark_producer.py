@@ -0,0 +1,254 @@
+"""
+Producer throughput benchmark for DocsCrawler.send_to_kafka
+
+Runs the sync and async send paths against an in-process broker stand-in,
+so no Kafka cluster is needed. The stand-in producer batches records like
+KafkaProducer (linger_ms / batch_size), compresses each batch and pays a
+fixed round trip per produce request to the broker.
+
+Usage:
+    python benchmark_producer.py --docs 2000 --rtt-ms 2
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from kafka.codec import gzip_encode, has_lz4, has_zstd, lz4_encode, zstd_encode
+from kafka.errors import KafkaTimeoutError, RequestTimedOutError
+from kafka.future import Future
+from kafka.partitioner.default import murmur2
+
+from crawler import DocsCrawler
+from hash_store import ContentHashStore
+
+CODECS = {
+    None: lambda data: data,
+    'gzip': gzip_encode,
+    'lz4': lz4_encode,
+    'zstd': zstd_encode,
+}
+
+class InProcessBroker:
+    """Partition log that charges a round trip per produce request"""
+
+    def __init__(self, rtt_ms=2.0, failure_rate=0.0):
+        self.rtt = rtt_ms / 1000
+        self.failure_rate = failure_rate
+        self.offset = 0
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def produce(self, payload, count):
+        """Append a (possibly compressed) batch of count records, returning its base offset"""
+        time.sleep(self.rtt)
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(payload)
+            if random.random() < self.failure_rate:
+                raise RequestTimedOutError()
+            base = self.offset
+            self.offset += count
+            return base
+
+class StandInFuture(Future):
+    """kafka.future.Future with the blocking get() of FutureRecordMetadata"""
+
+    def __init__(self):
+        super().__init__()
+        self._done = threading.Event()
+
+    def success(self, value):
+        super().success(value)
+        self._done.set()
+
+    def failure(self, error):
+        super().failure(error)
+        self._done.set()
+
+    def get(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise KafkaTimeoutError()
+        if self.failed():
+            raise self.exception
+        return self.value
+
+class RecordMetadata:
+    def __init__(self, topic, partition, offset):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+
+class StandInProducer:
+    """Subset of KafkaProducer: send, flush and close with batching"""
+
+    def __init__(self, broker, value_serializer, linger_ms=0, batch_size=16384, compression_type=None,
+                 key_serializer=None, partitions=1, **_):
+        self.broker = broker
+        self.value_serializer = value_serializer
+        self.key_serializer = key_serializer or (lambda k: k.encode('utf-8'))
+        self.partitions = partitions
+        self.linger = linger_ms / 1000
+        self.batch_size = batch_size
+        self.compress = CODECS[compression_type]
+        self._batch = []
+        self._batch_bytes = 0
+        self._batch_started = None
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._closed = False
+        self._sender = threading.Thread(target=self._run, daemon=True)
+        self._sender.start()
+
+    def send(self, topic, value=None, key=None):
+        # Tombstones (None values) are empty records
+        data = self.value_serializer(value) if value is not None else b''
+        # Keyed records go to the partition KafkaProducer's default partitioner picks
+        partition = 0
+        if key is not None:
+            partition = (murmur2(self.key_serializer(key)) & 0x7fffffff) % self.partitions
+        future = StandInFuture()
+        with self._condition:
+            if not self._batch:
+                self._batch_started = time.monotonic()
+            self._batch.append((topic, partition, data, future))
+            self._batch_bytes += len(data)
+            self._condition.notify()
+        return future
+
+    def _take_ready_batch(self, force):
+        """Batch to send now, or None if it should linger"""
+        if not self._batch:
+            return None
+        waited = time.monotonic() - self._batch_started
+        if not (force or self._batch_bytes >= self.batch_size or waited >= self.linger):
+            return None
+
+        # Take up to batch_size bytes, always at least one record
+        size, count = 0, 0
+        for _, _, data, _ in self._batch:
+            if count and size + len(data) > self.batch_size:
+                break
+            size += len(data)
+            count += 1
+        batch = self._batch[:count]
+        self._batch = self._batch[count:]
+        self._batch_bytes -= size
+        self._in_flight += 1
+        return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                batch = self._take_ready_batch(self._closed)
+                while batch is None:
+                    if self._closed and not self._batch:
+                        return
+                    timeout = None
+                    if self._batch:
+                        timeout = max(0.0, self.linger - (time.monotonic() - self._batch_started))
+                    self._condition.wait(timeout)
+                    batch = self._take_ready_batch(self._closed)
+
+            payload = self.compress(b''.join(data for _, _, data, _ in batch))
+            try:
+                base = self.broker.produce(payload, len(batch))
+                for i, (topic, partition, _, future) in enumerate(batch):
+                    future.success(RecordMetadata(topic, partition, base + i))
+            except Exception as e:
+                for _, _, _, future in batch:
+                    future.failure(e)
+
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            # Send whatever is lingering right away
+            self._batch_started = float('-inf') if self._batch else self._batch_started
+            self._condition.notify_all()
+            while self._batch or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise KafkaTimeoutError('Timeout waiting for flush')
+                self._condition.wait(remaining)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._sender.join()
+
+def make_docs(count, size):
+    words = ['kafka', 'broker', 'topic', 'partition', 'consumer', 'producer', 'offset', 'replica']
+    return [
+        {
+            'url': f'https://kafka.apache.org/documentation/page-{i}',
+            'title': f'Page {i}',
+            'content': ' '.join(random.choice(words) for _ in range(size // 8)),
+            'timestamp': '2025-01-17T00:00:00',
+            'metadata': {}
+        }
+        for i in range(count)
+    ]
+
+def run(mode, docs, args, compression):
+    crawler = DocsCrawler(producer=object(), hash_store=ContentHashStore(':memory:'))
+    crawler.config['kafka']['producer'] = {
+        'mode': mode,
+        'linger_ms': args.linger_ms,
+        'batch_size': args.batch_size,
+        'compression_type': compression,
+    }
+    broker = InProcessBroker(args.rtt_ms, args.failure_rate)
+    crawler.producer = StandInProducer(
+        broker,
+        value_serializer=lambda x: json.dumps(x).encode('utf-8'),
+        **crawler.producer_config()
+    )
+
+    start = time.perf_counter()
+    summary = crawler.send_to_kafka(docs)
+    elapsed = time.perf_counter() - start
+    crawler.producer.close()
+
+    label = mode if mode == 'sync' else f'async ({compression or "none"})'
+    result = f'{label:<20} {elapsed:7.2f}s {len(docs) / elapsed:10.0f} msgs/sec  ' \
+             f'requests={broker.requests} bytes={broker.bytes_received}'
+    if summary:
+        result += f"  failed={summary['failed']} errors={summary['errors']}"
+    print(result)
+
+def main():
+    parser = argparse.ArgumentParser(description='Kafka producer throughput benchmark')
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--doc-bytes', type=int, default=4000)
+    parser.add_argument('--rtt-ms', type=float, default=2.0, help='Broker round trip per produce request')
+    parser.add_argument('--linger-ms', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=256 * 1024)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of produce requests that fail')
+    args = parser.parse_args()
+
+    os.environ.setdefault('FIRECRAWL_API_KEY', 'benchmark')
+    # Failures are reported in the summary line instead of per message
+    logging.getLogger('crawler').setLevel(logging.CRITICAL)
+    random.seed(0)
+    docs = make_docs(args.docs, args.doc_bytes)
+
+    compressions = [None, 'gzip']
+    compressions += ['lz4'] if has_lz4() else []
+    compressions += ['zstd'] if has_zstd() else []
+
+    run('sync', docs, args, None)
+    for compression in compressions:
+        run('async', docs, args, compression)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Message size and decode cost of the JSON and binary serializers
+
+Usage:
+    python benchmark_serializers.py --docs 2000 --doc-bytes 20000
+"""
+
+import argparse
+import random
+import time
+
+from benchmark_producer import make_docs
+from serializers import BinarySerializer, JSONSerializer
+
+def measure(name, encoded, decode):
+    start = time.perf_counter()
+    for data in encoded:
+        decode(data)
+    elapsed = time.perf_counter() - start
+    size = sum(len(data) for data in encoded) / len(encoded)
+    print(f'{name:<34} {size:10.0f} bytes/msg {elapsed / len(encoded) * 1e6:10.1f} us/decode')
+
+def main():
+    parser = argparse.ArgumentParser(description='Serializer benchmark')
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--doc-bytes', type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    docs = make_docs(args.docs, args.doc_bytes)
+    for doc in docs:
+        doc.update({'content_hash': '0' * 64, 'change_type': 'changed'})
+
+    json_serializer = JSONSerializer()
+    encoded = [json_serializer.serialize(doc) for doc in docs]
+    measure('json', encoded, json_serializer.deserialize)
+
+    for compression in (None, 'zlib'):
+        serializer = BinarySerializer(compression=compression)
+        encoded = [serializer.serialize(doc) for doc in docs]
+        measure(f'binary ({compression or "none"}), full decode', encoded, serializer.deserialize)
+        measure(f'binary ({compression or "none"}), header only', encoded, serializer.deserialize_header)
+
+if __name__ == '__main__':
+    main()
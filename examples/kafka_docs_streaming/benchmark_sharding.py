@@ -0,0 +1,171 @@
+"""
+Multi-process sharding check for DocsCrawler
+
+Runs several crawler replicas as separate processes that share a lease
+directory. All of them crawl the local documentation fixture from
+benchmark_incremental. Each cycle is a full crawl of every replica's share.
+It reports the pages each replica fetched, pages fetched twice or not at
+all, pages that moved between replicas, and the new and changed pages
+published. A replica joins before the
+second cycle and one leaves before the third. Messages are keyed by URL,
+and the run ends by checking that no URL was published to more than one
+partition.
+
+Usage:
+    python benchmark_sharding.py --replicas 3 --pages 600
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer
+
+import yaml
+
+from benchmark_incremental import DocsSite, FixtureCrawler, make_handler
+from benchmark_producer import InProcessBroker, StandInProducer
+from hash_store import ContentHashStore
+
+def replica(replica_id, config_path, directory, commands, results):
+    """Crawler replica process: runs one crawl cycle per command"""
+    os.environ['REPLICA_ID'] = replica_id
+    os.environ.setdefault('FIRECRAWL_API_KEY', 'benchmark')
+
+    crawler = FixtureCrawler(
+        config_path=config_path,
+        producer=object(),
+        hash_store=ContentHashStore(os.path.join(directory, f'{replica_id}.db'))
+    )
+    crawler.producer = StandInProducer(
+        InProcessBroker(rtt_ms=1),
+        value_serializer=crawler.serializer.serialize,
+        partitions=crawler.config['kafka']['partitions'],
+        **crawler.producer_config()
+    )
+    sent = []
+    send = crawler.producer.send
+    crawler.producer.send = lambda topic, value=None, key=None: sent.append((key, value, send(topic, value, key))) or sent[-1][2]
+    for name in ('crawler', 'sharding'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    results.put(('ready', replica_id))
+
+    for command in iter(commands.get, 'stop'):
+        sent.clear()
+        docs, all_urls, validators, report = crawler.crawl_cycle()
+        failed = crawler.publish_changes(docs, all_urls)
+        if failed is not None:
+            crawler.record_validators(docs, all_urls, validators, failed)
+        partitions = {key: future.get().partition for key, _, future in sent}
+        change_types = Counter(value['change_type'] for _, value, _ in sent)
+        results.put(('cycle', replica_id, [doc['url'] for doc in docs or []], partitions, change_types))
+
+    crawler.shard.stop()
+    crawler.producer.close()
+    results.put(('stopped', replica_id))
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-process sharding check')
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--pages', type=int, default=600)
+    parser.add_argument('--page-bytes', type=int, default=2000)
+    parser.add_argument('--churn', type=float, default=0.05)
+    args = parser.parse_args()
+
+    random.seed(0)
+    site = DocsSite(args.pages, args.page_bytes)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(site, {}))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    replicas = {}
+
+    with open('config.yaml') as f:
+        config = yaml.safe_load(f)
+
+    with tempfile.TemporaryDirectory() as directory:
+        config['crawler'].update({
+            'base_url': base_url,
+            'include_paths': ['/documentation/*'],
+            'exclude_paths': [],
+            'incremental': {'enabled': True, 'sitemap_url': f'{base_url}/sitemap.xml', 'full_crawl_every': 1},
+            'sharding': {'enabled': True, 'lease_dir': os.path.join(directory, 'leases'), 'lease_ttl': 30}
+        })
+        config['kafka']['producer'] = {'mode': 'async', 'linger_ms': 5, 'compression_type': None}
+        config['kafka']['serializer'] = {'format': 'json'}
+        config_path = os.path.join(directory, 'config.yaml')
+        with open(config_path, 'w') as f:
+            yaml.safe_dump(config, f)
+
+        def start(replica_id):
+            commands = context.Queue()
+            process = context.Process(target=replica, args=(replica_id, config_path, directory, commands, results))
+            process.start()
+            replicas[replica_id] = (process, commands)
+            assert results.get(timeout=60) == ('ready', replica_id)
+
+        def stop(replica_id):
+            process, commands = replicas.pop(replica_id)
+            commands.put('stop')
+            assert results.get(timeout=60) == ('stopped', replica_id)
+            process.join()
+
+        for i in range(args.replicas):
+            start(f'replica-{i}')
+
+        owners = {}
+        url_partitions = {}
+        print(f'{"cycle":>5} {"replicas":>8} {"fetched per replica":<28} {"twice":>6} {"missed":>7} {"moved":>6} '
+              f'{"new":>5} {"changed":>8}')
+        try:
+            for cycle, event in enumerate(['start', f'replica-{args.replicas} joins', 'replica-0 leaves']):
+                if cycle:
+                    for path in random.sample(list(site.pages), int(len(site.pages) * args.churn)):
+                        site.edit(path)
+                if event.endswith('joins'):
+                    start(event.split()[0])
+                elif event.endswith('leaves'):
+                    stop(event.split()[0])
+
+                for _, commands in replicas.values():
+                    commands.put('cycle')
+                fetched = {}
+                published = Counter()
+                for _ in replicas:
+                    _, replica_id, urls, partitions, change_types = results.get(timeout=300)
+                    fetched[replica_id] = urls
+                    published.update(change_types)
+                    for url, partition in partitions.items():
+                        url_partitions.setdefault(url, set()).add(partition)
+
+                counts = {}
+                new_owners = {}
+                for replica_id, urls in fetched.items():
+                    for url in urls:
+                        counts[url] = counts.get(url, 0) + 1
+                        new_owners[url] = replica_id
+                site_urls = {f'{base_url}{path}' for path in site.pages}
+                moved = sum(1 for url, owner in new_owners.items() if url in owners and owners[url] != owner)
+                owners = new_owners
+
+                per_replica = ' '.join(str(len(fetched[replica_id])) for replica_id in sorted(fetched))
+                print(f'{cycle:>5} {len(replicas):>8} {per_replica:<28} '
+                      f'{sum(1 for count in counts.values() if count > 1):>6} '
+                      f'{len(site_urls - set(counts)):>7} {moved:>6} {published["new"]:>5} '
+                      f'{published["changed"]:>8}  ({event})')
+        finally:
+            for replica_id in list(replicas):
+                stop(replica_id)
+            server.shutdown()
+
+        split = sum(1 for partitions in url_partitions.values() if len(partitions) > 1)
+        print(f'{len(url_partitions)} URLs published, {split} of them to more than one partition')
+
+if __name__ == '__main__':
+    main()
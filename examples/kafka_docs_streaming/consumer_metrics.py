@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+class ConsumerMetrics:
+    """
+    Processing rate, batch latency and lag of a consumer
+
+    The rate is measured over the last `window` seconds. Lag is the
+    difference between each assigned partition's end offset and the
+    consumer's position, refreshed by update_lag().
+    """
+
+    def __init__(self, window=60):
+        self.window = window
+        self.messages = 0
+        self.batches = 0
+        self.errors = 0
+        self.lag = {}
+        self._recent = deque()
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def record_batch(self, count, latency):
+        """Record a processed batch of count messages that took latency seconds"""
+        now = time.monotonic()
+        with self._lock:
+            self.messages += count
+            self.batches += 1
+            self._latencies.append(latency)
+            self._recent.append((now, count))
+            while self._recent and self._recent[0][0] < now - self.window:
+                self._recent.popleft()
+
+    def record_error(self, count=1):
+        with self._lock:
+            self.errors += count
+
+    def update_lag(self, consumer):
+        """Refresh per-partition lag from the consumer's assignment"""
+        partitions = list(consumer.assignment())
+        if not partitions:
+            return
+        end_offsets = consumer.end_offsets(partitions)
+        lag = {
+            f'{tp.topic}-{tp.partition}': max(end_offsets[tp] - consumer.position(tp), 0)
+            for tp in partitions
+        }
+        with self._lock:
+            self.lag = lag
+
+    def rate(self):
+        """Messages per second over the window"""
+        now = time.monotonic()
+        with self._lock:
+            recent = [count for timestamp, count in self._recent if timestamp >= now - self.window]
+        return sum(recent) / max(min(self.window, now - self._started), 1e-6)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            lag = dict(self.lag)
+            messages, batches, errors = self.messages, self.batches, self.errors
+        return {
+            'messages': messages,
+            'batches': batches,
+            'errors': errors,
+            'rate': round(self.rate(), 2),
+            'batch_latency_ms': {
+                'p50': round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+                'p99': round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else None,
+                'max': round(latencies[-1] * 1000, 2) if latencies else None
+            },
+            'lag': sum(lag.values()),
+            'partition_lag': lag
+        }
+
+    def write(self, path):
+        """Write the current snapshot as JSON for external scraping"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
@@ -1,6 +1,5 @@
 import os
 import time
-import yaml
 import json
 from datetime import datetime
 from dotenv import load_dotenv
@@ -8,6 +7,15 @@ from firecrawl import FirecrawlApp
 from kafka import KafkaProducer
 from kafka.errors import KafkaError
 import logging
+import threading
+from collections import Counter
+
+from hash_store import ContentHashStore
+from incremental import IncrementalPlanner, normalize_url, url_allowed
+from payloads import encode_change
+from serializers import create_serializer
+from settings import load_config
+from sharding import create_shard
 
 # Configure logging
 logging.basicConfig(
@@ -16,22 +24,115 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class DocsCrawler:
+class DeliveryReport:
+    """
+    Collects delivery results from producer callbacks
+
+    Only URLs confirmed by on_success count as delivered. After a flush
+    timeout, expire() counts messages still waiting for a result as
+    failed, and results that arrive later are ignored.
+    """
+
     def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.errors = Counter()
+        self.delivered_urls = []
+        self.failed_urls = []
+        self._expired = False
+        self._lock = threading.Lock()
+
+    def on_success(self, url, record_metadata):
+        with self._lock:
+            if not self._expired:
+                self.sent += 1
+                self.delivered_urls.append(url)
+
+    def on_error(self, url, error):
+        with self._lock:
+            if not self._expired:
+                self._fail(url, error)
+
+    def _fail(self, url, error):
+        self.failed += 1
+        self.errors[type(error).__name__] += 1
+        self.failed_urls.append(url)
+
+    def expire(self, urls, error):
+        """Count urls that have no delivery result yet as failed"""
+        with self._lock:
+            self._expired = True
+            answered = set(self.delivered_urls).union(self.failed_urls)
+            for url in urls:
+                if url not in answered:
+                    self._fail(url, error)
+
+    def summary(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'errors': dict(self.errors),
+            'delivered_urls': list(self.delivered_urls),
+            'failed_urls': list(self.failed_urls)
+        }
+
+class DocsCrawler:
+    def __init__(self, config_path=None, producer=None, hash_store=None):
         # Load environment variables
         load_dotenv()
 
         # Load configuration
-        with open('config.yaml', 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = load_config(config_path)
 
         # Initialize Firecrawl
         self.firecrawl = FirecrawlApp(api_key=os.getenv('FIRECRAWL_API_KEY'))
 
         # Initialize Kafka producer
-        self.producer = KafkaProducer(
+        self.serializer = create_serializer(self.config)
+        self.producer = producer or self.create_producer()
+
+        # URL -> content hash of everything published so far
+        self.hash_store = hash_store or ContentHashStore(
+            self.config['crawler'].get('hash_store', 'content_hashes.db')
+        )
+
+        # Incremental re-crawl from the sitemap and HTTP validators
+        self.incremental = self.config['crawler'].get('incremental', {})
+        self.planner = None
+        if self.incremental.get('enabled'):
+            self.planner = IncrementalPlanner(
+                self.hash_store,
+                self.incremental['sitemap_url'],
+                include_paths=self.config['crawler']['include_paths'],
+                exclude_paths=self.config['crawler']['exclude_paths'],
+                check_workers=self.incremental.get('check_workers', 8)
+            )
+        self.cycle = 0
+
+        # Share of the URL frontier when several replicas crawl the same site
+        self.shard = create_shard(self.config)
+
+    def producer_config(self):
+        """Producer settings for the configured send mode"""
+        settings = self.config['kafka'].get('producer', {})
+        if settings.get('mode', 'sync') == 'sync':
+            return {}
+        return {
+            'linger_ms': settings.get('linger_ms', 20),
+            'batch_size': settings.get('batch_size', 256 * 1024),
+            'compression_type': settings.get('compression_type'),
+            'acks': settings.get('acks', 1),
+            'max_in_flight_requests_per_connection': settings.get('max_in_flight_requests', 5)
+        }
+
+    def create_producer(self):
+        """Create the Kafka producer from the configuration"""
+        return KafkaProducer(
             bootstrap_servers=self.config['kafka']['bootstrap_servers'],
-            value_serializer=lambda x: json.dumps(x).encode('utf-8')
+            key_serializer=lambda k: k.encode('utf-8'),
+            # None is sent as-is: a tombstone on the compacted snapshot topic
+            value_serializer=lambda x: self.serializer.serialize(x) if x is not None else None,
+            **self.producer_config()
         )
 
     def crawl_docs(self):
@@ -55,6 +156,142 @@ class DocsCrawler:
             logger.error(f"Error crawling documentation: {str(e)}")
             return None
 
+    def scrape_urls(self, urls):
+        """Scrape a list of URLs using Firecrawl"""
+        try:
+            return self.firecrawl.batch_scrape_urls(
+                urls,
+                params={"formats": self.config['firecrawl']['formats']}
+            )
+        except Exception as e:
+            logger.error(f"Error scraping documentation: {str(e)}")
+            return None
+
+    def crawl_cycle(self):
+        """
+        Fetch documentation for one update cycle
+
+        In incremental mode only pages that are new or likely changed are
+        scraped, with a full crawl every `full_crawl_every` cycles.
+
+        Returns:
+            (docs, all_urls, validators, report). all_urls is every URL that
+            still exists, or None when that is exactly the crawled docs.
+            A full crawl that Firecrawl could not take to every sitemap page
+            does not delete the others, and an incremental cycle only
+            deletes pages that have been listed in the sitemap.
+        """
+        if self.shard is not None:
+            return self.crawl_shard()
+
+        full_crawl_every = self.incremental.get('full_crawl_every', 24)
+        full = self.planner is None or self.cycle % full_crawl_every == 0
+        self.cycle += 1
+
+        all_urls, sitemap_urls, validators, report = None, None, {}, {'bytes_saved': 0}
+        if self.planner is not None:
+            try:
+                sitemap_urls, changed_urls, validators, report = self.planner.plan(force=full)
+                all_urls = self.sitemap_frontier(sitemap_urls)
+            except Exception as e:
+                logger.warning(f"Incremental check failed, falling back to a full crawl: {str(e)}")
+                full = True
+
+        if full:
+            docs = self.process_docs(self.crawl_docs())
+            all_urls = None
+            if docs and sitemap_urls is not None:
+                all_urls = [doc['url'] for doc in docs] + sitemap_urls
+        elif changed_urls:
+            docs = self.process_docs(self.scrape_urls(changed_urls))
+            if docs is None:
+                # Keep the stored state so the same pages are tried next cycle
+                all_urls = None
+        else:
+            docs = []
+
+        report.update({
+            'mode': 'full' if full else 'incremental',
+            'pages_fetched': len(docs or []),
+            'bytes_fetched': sum(len((doc['content'] or '').encode('utf-8')) for doc in docs or []),
+        })
+        return docs, all_urls, validators, report
+
+    def sitemap_frontier(self, sitemap_urls):
+        """
+        Every URL that exists as far as the sitemap can tell
+
+        Published pages that the sitemap has never listed, because only a
+        full crawl found them, are kept; the next full crawl decides
+        whether they still exist.
+        """
+        listed = self.hash_store.sitemap_urls()
+        self.hash_store.update_sitemap(sitemap_urls)
+        current = set(sitemap_urls)
+        return sitemap_urls + [url for url in self.hash_store.hashes() if url not in listed and url not in current]
+
+    def map_urls(self):
+        """Every allowed URL under base_url, from Firecrawl's site map"""
+        result = self.firecrawl.map_url(self.config['crawler']['base_url'])
+        links = result.get('links', []) if isinstance(result, dict) else result
+        return list(dict.fromkeys(
+            normalize_url(url) for url in links
+            if url_allowed(url, self.config['crawler']['include_paths'], self.config['crawler']['exclude_paths'])
+        ))
+
+    def crawl_shard(self):
+        """
+        Fetch this replica's share of the documentation for one update cycle
+
+        The URL frontier (the sitemap in incremental mode, otherwise
+        Firecrawl's site map) is split across the live replicas by consistent
+        hashing and only owned URLs are scraped. State of pages that moved
+        to another replica is forgotten without publishing a deletion, and
+        pages taken over from another replica adopt the state it shared, so
+        they are only published if they changed.
+
+        Returns:
+            (docs, all_urls, validators, report) like crawl_cycle, with
+            all_urls always set to the whole frontier
+        """
+        full_crawl_every = self.incremental.get('full_crawl_every', 24)
+        full = self.planner is None or self.cycle % full_crawl_every == 0
+        self.cycle += 1
+        members = self.shard.refresh()
+
+        validators, report = {}, {'bytes_saved': 0}
+        try:
+            if self.planner is not None:
+                all_urls, urls, validators, report = self.planner.plan(force=full, owns=self.shard.owns)
+            else:
+                all_urls = self.map_urls()
+                urls = [url for url in all_urls if self.shard.owns(url)]
+                report['owned_urls'] = len(urls)
+        except Exception as e:
+            # A full crawl would fetch every replica's pages, so skip the cycle
+            logger.error(f"Could not build the URL frontier, skipping this cycle: {str(e)}")
+            return None, None, {}, {'mode': 'sharded', 'pages_fetched': 0, 'bytes_fetched': 0, 'bytes_saved': 0}
+
+        frontier = set(all_urls)
+        known = self.hash_store.hashes()
+        moved = [url for url in known if url in frontier and not self.shard.owns(url)]
+        if moved:
+            logger.info(f"{len(moved)} pages moved to other replicas")
+            self.hash_store.forget(moved)
+        adopted = self.shard.shared_pages([url for url in urls if url not in known])
+        if adopted:
+            logger.info(f"{len(adopted)} pages taken over from other replicas")
+            self.hash_store.adopt(adopted)
+
+        docs = self.process_docs(self.scrape_urls(urls)) if urls else []
+        report.update({
+            'mode': 'full' if full else 'incremental',
+            'replicas': len(members),
+            'pages_fetched': len(docs or []),
+            'bytes_fetched': sum(len((doc['content'] or '').encode('utf-8')) for doc in docs or []),
+        })
+        return docs, all_urls, validators, report
+
     def process_docs(self, docs):
         """Process crawled documentation"""
         if not docs:
@@ -62,8 +299,9 @@ class DocsCrawler:
 
         processed_docs = []
         for doc in docs['data']:
+            url = doc.get('url') or doc.get('metadata', {}).get('sourceURL')
             processed_doc = {
-                'url': doc['url'],
+                'url': normalize_url(url) if url else url,
                 'title': doc.get('title', ''),
                 'content': doc.get('markdown', doc.get('html', '')),
                 'timestamp': datetime.now().isoformat(),
@@ -74,46 +312,243 @@ class DocsCrawler:
         return processed_docs
 
     def send_to_kafka(self, docs):
-        """Send processed documentation to Kafka"""
+        """Send processed documentation to Kafka, keyed by URL"""
         if not docs:
             return
 
-        topic = self.config['kafka']['topic']
+        return self.send_records([(doc['url'], doc) for doc in docs], self.config['kafka']['topic'])
 
-        for doc in docs:
+    def send_records(self, records, topic):
+        """Send (key, value) records to a topic with the configured send mode"""
+        if self.config['kafka'].get('producer', {}).get('mode', 'sync') == 'async':
+            return self.send_records_async(records, topic)
+
+        report = DeliveryReport()
+
+        for url, doc in records:
             try:
-                future = self.producer.send(topic, value=doc)
+                future = self.producer.send(topic, key=url, value=doc)
                 # Block until the message is sent
                 record_metadata = future.get(timeout=10)
-                logger.info(f"Sent doc update to Kafka: {doc['url']}")
+                report.on_success(url, record_metadata)
+                logger.info(f"Sent doc update to Kafka: {url}")
                 logger.debug(f"Partition: {record_metadata.partition}, Offset: {record_metadata.offset}")
             except KafkaError as e:
+                report.on_error(url, e)
                 logger.error(f"Error sending to Kafka: {str(e)}")
 
+        return report.summary()
+
+    def send_records_async(self, records, topic):
+        """
+        Send processed documentation without waiting for each message
+
+        Messages are batched by the producer according to linger_ms and
+        batch_size. Delivery results arrive through callbacks and the
+        producer is flushed once at the end, so many messages are in flight
+        at a time. Failures are aggregated into a single report.
+        """
+        flush_timeout = self.config['kafka'].get('producer', {}).get('flush_timeout', 60)
+        report = DeliveryReport()
+        sent_urls = []
+
+        for url, doc in records:
+            try:
+                future = self.producer.send(topic, key=url, value=doc)
+            except KafkaError as e:
+                report.on_error(url, e)
+                continue
+            future.add_callback(lambda metadata, url=url: report.on_success(url, metadata))
+            future.add_errback(lambda e, url=url: report.on_error(url, e))
+            sent_urls.append(url)
+
+        try:
+            self.producer.flush(timeout=flush_timeout)
+        except KafkaError as e:
+            logger.error(f"Error flushing Kafka producer: {str(e)}")
+            # Messages still in flight may or may not arrive; send them again next cycle
+            report.expire(sent_urls, e)
+
+        summary = report.summary()
+        logger.info(f"Sent {summary['sent']} doc updates to Kafka")
+        if summary['failed']:
+            logger.error(f"Failed to send {summary['failed']} doc updates: {summary['errors']}")
+            logger.debug(f"Failed URLs: {summary['failed_urls']}")
+        return summary
+
+    def detect_changes(self, docs, all_urls=None):
+        """Messages for new, changed and deleted pages since the last publish"""
+        changes, deleted_urls = self.hash_store.diff(docs, all_urls)
+        timestamp = datetime.now().isoformat()
+        deletions = [
+            {
+                'url': url,
+                'title': '',
+                'content': None,
+                'timestamp': timestamp,
+                'metadata': {},
+                'content_hash': None,
+                'change_type': 'deleted'
+            }
+            for url in deleted_urls
+        ]
+        return changes, deletions
+
+    def publish_changes(self, docs, all_urls=None):
+        """
+        Publish only pages whose content changed and record what was delivered
+
+        Args:
+            docs: Processed docs fetched this cycle
+            all_urls: Every URL on the site for an incremental cycle, or None
+                when docs is a full crawl
+
+        Returns:
+            URLs whose delivery failed, or None if nothing was compared
+        """
+        if docs is None or not (docs if all_urls is None else all_urls):
+            # An empty crawl is far more likely a failure than a deleted site
+            logger.warning("Crawl returned no pages, skipping change detection")
+            return None
+
+        changes, deletions = self.detect_changes(docs, all_urls)
+        if not changes and not deletions:
+            logger.info(f"No documentation changes in {len(docs)} fetched pages")
+            return set()
+
+        payload = self.config['kafka'].get('payload', {})
+        mirror_failed = set()
+        if payload.get('format', 'full') == 'delta':
+            messages, states = self.encode_changes(changes)
+            # Readers bootstrap from the snapshot topic, so it gets each version first
+            mirror_failed = self.mirror_current(changes, states, deletions)
+            messages = [message for message in messages if message['url'] not in mirror_failed]
+            deletions = [doc for doc in deletions if doc['url'] not in mirror_failed]
+        else:
+            messages, states = changes, {}
+
+        summary = self.send_to_kafka(messages + deletions) if messages or deletions else {'delivered_urls': []}
+        # Anything not confirmed delivered is sent again next cycle
+        failed = mirror_failed | ({doc['url'] for doc in messages + deletions} - set(summary['delivered_urls']))
+        delivered_deletions = [doc['url'] for doc in deletions if doc['url'] not in failed]
+        self.hash_store.record([doc for doc in changes if doc['url'] not in failed], delivered_deletions)
+
+        if states:
+            self.hash_store.record_content(
+                {url: state for url, state in states.items() if url not in failed},
+                delivered_deletions
+            )
+        if self.shard is not None:
+            self.share_published(changes, states, failed, delivered_deletions)
+        logger.info(
+            f"Published {len(changes)} new or changed and {len(deletions)} deleted pages "
+            f"out of {len(docs)} fetched ({len(failed)} failed, will retry next crawl)"
+        )
+        return failed
+
+    def share_published(self, changes, states, failed, deleted_urls):
+        """Share the state of delivered pages with replicas that may take them over"""
+        shared = {
+            doc['url']: {
+                'content_hash': doc['content_hash'],
+                'version': states[doc['url']][0] if doc['url'] in states else None
+            }
+            for doc in changes if doc['url'] not in failed
+        }
+        try:
+            self.shard.share_pages(shared, deleted_urls)
+        except Exception as e:
+            # Only costs a repeated 'new' message if another replica takes a page over
+            logger.warning(f"Could not share the state of {len(shared)} published pages: {str(e)}")
+
+    def encode_changes(self, changes):
+        """Turn changes into delta or snapshot messages against the last published content"""
+        payload = self.config['kafka'].get('payload', {})
+        messages, states = [], {}
+        for doc in changes:
+            message, state = encode_change(
+                doc,
+                self.hash_store.published_content(doc['url']),
+                snapshot_every=payload.get('snapshot_every', 10),
+                max_delta_ratio=payload.get('max_delta_ratio', 0.5)
+            )
+            messages.append(message)
+            states[doc['url']] = state
+        return messages, states
+
+    def mirror_current(self, changes, states, deletions):
+        """
+        Write the full current version of changed pages to the compacted snapshot topic
+
+        Every version is mirrored, not only snapshot messages, so a reader
+        that loads the topic has the base version of the next delta on
+        the updates topic. Deleted pages get a tombstone.
+
+        Returns:
+            URLs whose mirror write failed; their changes must not be
+            published or recorded yet
+        """
+        topic = self.config['kafka']['payload'].get('snapshot_topic')
+        if not topic or not (changes or deletions):
+            return set()
+        records = [
+            (doc['url'], {**doc, 'format': 'snapshot', 'version': states[doc['url']][0]}) for doc in changes
+        ] + [(doc['url'], None) for doc in deletions]
+        summary = self.send_records(records, topic)
+        failed = {url for url, _ in records} - set(summary['delivered_urls'])
+        if failed:
+            logger.warning(f"Failed to mirror {len(failed)} pages to {topic}, will retry next crawl")
+        return failed
+
+    def record_validators(self, docs, all_urls, validators, failed):
+        """Remember validators of delivered pages for the next incremental cycle"""
+        if self.planner is None:
+            return
+        fresh = {}
+        for doc in docs:
+            if doc['url'] in failed:
+                continue
+            fresh[doc['url']] = {
+                **validators.get(doc['url'], {}),
+                'size': len((doc['content'] or '').encode('utf-8'))
+            }
+        current = set(all_urls if all_urls is not None else fresh)
+        deleted = [url for url in self.hash_store.validators() if url not in current]
+        self.hash_store.record_validators(fresh, deleted)
+
     def run(self):
         """Main crawler loop"""
-        while True:
-            try:
-                logger.info("Starting documentation crawl...")
+        try:
+            while True:
+                try:
+                    logger.info("Starting documentation crawl...")
 
-                # Crawl docs
-                raw_docs = self.crawl_docs()
+                    # Crawl and process docs
+                    processed_docs, all_urls, validators, report = self.crawl_cycle()
 
-                # Process docs
-                processed_docs = self.process_docs(raw_docs)
+                    # Send new, changed and deleted pages to Kafka
+                    failed = self.publish_changes(processed_docs, all_urls)
+                    if failed is not None:
+                        self.record_validators(processed_docs, all_urls, validators, failed)
 
-                # Send to Kafka
-                self.send_to_kafka(processed_docs)
+                    logger.info(
+                        f"{report['mode'].capitalize()} crawl fetched {report['pages_fetched']} pages "
+                        f"({report['bytes_fetched']} bytes), saved {report['bytes_saved']} bytes"
+                    )
 
-                logger.info("Documentation crawl completed successfully")
+                    logger.info("Documentation crawl completed successfully")
 
-                # Wait for next update interval
-                time.sleep(self.config['crawler']['update_interval'])
+                    # Wait for next update interval
+                    time.sleep(self.config['crawler']['update_interval'])
 
-            except Exception as e:
-                logger.error(f"Error in crawler loop: {str(e)}")
-                # Wait before retrying
-                time.sleep(60)
+                except Exception as e:
+                    logger.error(f"Error in crawler loop: {str(e)}")
+                    # Wait before retrying
+                    time.sleep(60)
+        finally:
+            if self.shard is not None:
+                # Hand this replica's pages to the others right away
+                self.shard.stop()
 
 if __name__ == "__main__":
     crawler = DocsCrawler()
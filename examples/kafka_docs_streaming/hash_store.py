@@ -0,0 +1,195 @@
+import hashlib
+import sqlite3
+import time
+import zlib
+
+def content_hash(doc):
+    """SHA-256 of the parts of a processed doc that readers see"""
+    digest = hashlib.sha256()
+    digest.update(doc.get('title', '').encode('utf-8'))
+    digest.update(b'\0')
+    digest.update((doc.get('content') or '').encode('utf-8'))
+    return digest.hexdigest()
+
+class ContentHashStore:
+    """Persistent URL -> content hash map of what has been published"""
+
+    def __init__(self, path='content_hashes.db'):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        # HTTP and sitemap validators of the last scraped version of each page
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                sitemap_lastmod TEXT,
+                size INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            """
+        )
+        # Last published content per URL, for delta payloads
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS published_content (
+                url TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                since_snapshot INTEGER NOT NULL,
+                content BLOB NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        # Published URLs that have been listed in the sitemap
+        self.conn.execute('CREATE TABLE IF NOT EXISTS sitemap_pages (url TEXT PRIMARY KEY) WITHOUT ROWID')
+        self.conn.commit()
+
+    def hashes(self):
+        """All published URLs and their content hashes"""
+        return dict(self.conn.execute('SELECT url, content_hash FROM pages'))
+
+    def diff(self, docs, all_urls=None):
+        """
+        Compare crawled docs with the published state
+
+        Args:
+            docs: Processed docs that were fetched
+            all_urls: Every URL that currently exists, when only some of them
+                were fetched. Defaults to the URLs of docs (a full crawl).
+
+        Returns:
+            (changes, deleted_urls) where changes are the new or changed docs,
+            each with 'content_hash' and 'change_type' set
+        """
+        known = self.hashes()
+        changes = []
+        seen = set()
+
+        for doc in docs:
+            url = doc['url']
+            seen.add(url)
+            doc_hash = content_hash(doc)
+            previous = known.get(url)
+            if previous == doc_hash:
+                continue
+            changes.append({
+                **doc,
+                'content_hash': doc_hash,
+                'change_type': 'new' if previous is None else 'changed'
+            })
+
+        if all_urls is not None:
+            seen = set(all_urls)
+        deleted_urls = [url for url in known if url not in seen]
+        return changes, deleted_urls
+
+    def record(self, changes, deleted_urls):
+        """Store the state of changes and deletions that were published"""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO pages (url, content_hash, updated_at) VALUES (?, ?, ?)',
+                ((doc['url'], doc['content_hash'], now) for doc in changes)
+            )
+            self.conn.executemany('DELETE FROM pages WHERE url = ?', ((url,) for url in deleted_urls))
+            self.conn.executemany('DELETE FROM sitemap_pages WHERE url = ?', ((url,) for url in deleted_urls))
+
+    def sitemap_urls(self):
+        """URLs listed in the sitemap now or, for pages still published, earlier"""
+        return {url for (url,) in self.conn.execute('SELECT url FROM sitemap_pages')}
+
+    def update_sitemap(self, urls):
+        """
+        Remember the URLs the sitemap lists now
+
+        Published pages it no longer lists are kept until their deletion
+        is recorded, so a failed deletion is tried again.
+        """
+        with self.conn:
+            self.conn.execute('DELETE FROM sitemap_pages WHERE url NOT IN (SELECT url FROM pages)')
+            self.conn.executemany('INSERT OR IGNORE INTO sitemap_pages (url) VALUES (?)', ((url,) for url in urls))
+
+    def validators(self):
+        """URL -> stored validators for every page scraped so far"""
+        rows = self.conn.execute('SELECT url, etag, last_modified, sitemap_lastmod, size FROM validators')
+        return {
+            url: {'etag': etag, 'last_modified': last_modified, 'sitemap_lastmod': lastmod, 'size': size}
+            for url, etag, last_modified, lastmod, size in rows
+        }
+
+    def record_validators(self, validators, deleted_urls=()):
+        """Store validators of freshly scraped pages and forget deleted ones"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO validators (url, etag, last_modified, sitemap_lastmod, size) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (
+                    (url, v.get('etag'), v.get('last_modified'), v.get('sitemap_lastmod'), v.get('size', 0))
+                    for url, v in validators.items()
+                )
+            )
+            self.conn.executemany('DELETE FROM validators WHERE url = ?', ((url,) for url in deleted_urls))
+
+    def published_content(self, url):
+        """
+        (version, versions_since_snapshot, content) last published for a URL, or None
+
+        content is None for a page adopted from another replica, whose
+        version is known but whose content was never stored here.
+        """
+        row = self.conn.execute(
+            'SELECT version, since_snapshot, content FROM published_content WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], zlib.decompress(row[2]).decode('utf-8') if row[2] else None
+
+    def record_content(self, states, deleted_urls=()):
+        """Store URL -> (version, versions_since_snapshot, content) of delivered messages"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO published_content (url, version, since_snapshot, content) '
+                'VALUES (?, ?, ?, ?)',
+                (
+                    (url, version, since_snapshot, zlib.compress(content.encode('utf-8')))
+                    for url, (version, since_snapshot, content) in states.items()
+                )
+            )
+            self.conn.executemany('DELETE FROM published_content WHERE url = ?', ((url,) for url in deleted_urls))
+
+    def adopt(self, states):
+        """
+        Take over URL -> {'content_hash', 'version'} of pages another replica published
+
+        The page then counts as published, so an unchanged page is not
+        announced as new. Its content is unknown, so the next version
+        after an adopted one is sent as a snapshot.
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO pages (url, content_hash, updated_at) VALUES (?, ?, ?)',
+                ((url, state['content_hash'], now) for url, state in states.items())
+            )
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO published_content (url, version, since_snapshot, content) '
+                "VALUES (?, ?, 0, x'')",
+                ((url, state['version']) for url, state in states.items() if state.get('version'))
+            )
+
+    def forget(self, urls):
+        """Drop all state of URLs this crawler no longer publishes, without deleting them"""
+        with self.conn:
+            for table in ('pages', 'validators', 'published_content', 'sitemap_pages'):
+                self.conn.executemany(f'DELETE FROM {table} WHERE url = ?', ((url,) for url in urls))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,184 @@
+import fnmatch
+import gzip
+import logging
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+def _local_name(tag):
+    """Tag name without its XML namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+def read_sitemap(sitemap_url, timeout=10, max_depth=3):
+    """
+    URL -> lastmod (or None) for every page listed in a sitemap
+
+    Sitemap indexes are followed up to max_depth levels and gzipped
+    sitemaps are decompressed.
+    """
+    with urllib.request.urlopen(sitemap_url, timeout=timeout) as response:
+        body = response.read()
+    if sitemap_url.endswith('.gz') or body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+
+    root = ET.fromstring(body)
+    pages = {}
+    for entry in root:
+        fields = {_local_name(child.tag): (child.text or '').strip() for child in entry}
+        if not fields.get('loc'):
+            continue
+        if _local_name(root.tag) == 'sitemapindex':
+            if max_depth > 0:
+                pages.update(read_sitemap(fields['loc'], timeout, max_depth - 1))
+        else:
+            pages[fields['loc']] = fields.get('lastmod') or None
+    return pages
+
+def normalize_url(url):
+    """
+    URL with a lower-case scheme and host and no fragment or trailing slash
+
+    Sitemaps, site maps and scrape results spell the same page slightly
+    differently, so every URL the crawler compares goes through this.
+    """
+    parts = urlsplit(url)
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+def url_allowed(url, include_paths, exclude_paths):
+    """Apply the crawler's include and exclude path patterns to a URL"""
+    path = urlparse(url).path or '/'
+    if include_paths and not any(fnmatch.fnmatch(path, pattern) for pattern in include_paths):
+        return False
+    return not any(fnmatch.fnmatch(path, pattern) for pattern in exclude_paths or [])
+
+def check_url(url, stored, timeout=10):
+    """
+    Conditional HEAD request for a page
+
+    Returns:
+        (changed, validators) where validators are the page's current ETag
+        and Last-Modified
+    """
+    headers = {}
+    if stored and stored.get('etag'):
+        headers['If-None-Match'] = stored['etag']
+    if stored and stored.get('last_modified'):
+        headers['If-Modified-Since'] = stored['last_modified']
+
+    request = urllib.request.Request(url, method='HEAD', headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+        return False, {'etag': stored.get('etag'), 'last_modified': stored.get('last_modified')}
+
+    validators = {'etag': etag, 'last_modified': last_modified}
+    if stored and (etag or last_modified):
+        # Servers that ignore conditional HEAD still return the same validators
+        if (etag, last_modified) == (stored.get('etag'), stored.get('last_modified')):
+            return False, validators
+    return True, validators
+
+class IncrementalPlanner:
+    """Decides which URLs of a sitemap need to be scraped again"""
+
+    def __init__(self, hash_store, sitemap_url, include_paths=None, exclude_paths=None,
+                 check_workers=8, timeout=10):
+        self.hash_store = hash_store
+        self.sitemap_url = sitemap_url
+        self.include_paths = include_paths or []
+        self.exclude_paths = exclude_paths or []
+        self.check_workers = check_workers
+        self.timeout = timeout
+
+    def plan(self, force=False, owns=None):
+        """
+        Compare the sitemap and HTTP validators with the stored state
+
+        Args:
+            force: Treat every page as changed (used alongside a full
+                crawl, which fetches every page anyway). Pages without a
+                lastmod keep their stored validators for the next
+                conditional check, so only pages seen for the first time
+                get a HEAD request, to learn their validators.
+            owns: Predicate for the URLs this crawler is responsible for;
+                other sitemap URLs are listed in all_urls but never checked
+
+        Returns:
+            (all_urls, changed_urls, validators, report). validators maps each
+            changed URL to the validators to store once it has been published.
+        """
+        sitemap = {
+            normalize_url(url): lastmod for url, lastmod in read_sitemap(self.sitemap_url, self.timeout).items()
+            if url_allowed(url, self.include_paths, self.exclude_paths)
+        }
+        stored = self.hash_store.validators()
+        published = self.hash_store.hashes()
+
+        changed = {}
+        to_check = []
+        unchanged = []
+        owned = [url for url in sitemap if owns is None or owns(url)]
+        for url in owned:
+            lastmod = sitemap[url]
+            previous = stored.get(url)
+            if force or previous is None or url not in published:
+                if lastmod:
+                    changed[url] = {}
+                elif force and previous is not None:
+                    changed[url] = {'etag': previous.get('etag'), 'last_modified': previous.get('last_modified')}
+                else:
+                    to_check.append(url)
+            elif lastmod and previous.get('sitemap_lastmod'):
+                if lastmod == previous['sitemap_lastmod']:
+                    unchanged.append(url)
+                else:
+                    changed[url] = {'sitemap_lastmod': lastmod}
+            else:
+                to_check.append(url)
+
+        # Without a usable lastmod, ask the server with a conditional HEAD
+        not_modified = 0
+        check_errors = 0
+        with ThreadPoolExecutor(max_workers=self.check_workers) as executor:
+            results = executor.map(self._check, to_check, [stored.get(url) for url in to_check])
+            for url, result in zip(to_check, results):
+                if result is None:
+                    check_errors += 1
+                    changed[url] = {}
+                    continue
+                is_changed, validators = result
+                if is_changed or force or url not in published:
+                    changed[url] = validators
+                else:
+                    not_modified += 1
+                    unchanged.append(url)
+
+        for url, validators in changed.items():
+            validators.setdefault('sitemap_lastmod', sitemap[url])
+
+        report = {
+            'sitemap_urls': len(sitemap),
+            'owned_urls': len(owned),
+            'head_requests': len(to_check),
+            'not_modified': not_modified,
+            'check_errors': check_errors,
+            'skipped': len(unchanged),
+            'bytes_saved': sum(stored[url]['size'] for url in unchanged),
+        }
+        return list(sitemap), list(changed), changed, report
+
+    def _check(self, url, stored):
+        try:
+            return check_url(url, stored, self.timeout)
+        except Exception as e:
+            logger.debug(f"Conditional check failed for {url}: {str(e)}")
+            return None
@@ -1,10 +1,18 @@
 import os
-import yaml
 import json
 from kafka import KafkaConsumer
+from kafka.structs import OffsetAndMetadata
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
+from consumer_metrics import ConsumerMetrics
+from monitor_state import MonitorState
+from payloads import DocReconstructor, read_snapshot_topic
+from serializers import create_serializer
+from settings import load_config
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -12,69 +20,300 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def _commit_offset(offset):
+    """OffsetAndMetadata for kafka-python 2.0 as well as later versions, which add leader_epoch"""
+    fields = {'offset': offset, 'metadata': '', 'leader_epoch': -1}
+    return OffsetAndMetadata(*(fields[name] for name in OffsetAndMetadata._fields))
+
 class DocsMonitor:
-    def __init__(self):
+    def __init__(self, config_path=None, consumer=None, state=None):
         # Load configuration
-        with open('config.yaml', 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = load_config(config_path)
         
+        # Decode full messages only when page content is needed; otherwise
+        # just the header fields (url, title, timestamp, hash, change type)
+        self.serializer = create_serializer(self.config)
+        self.settings = self.config.get('monitor', {})
+        self.reconstruct_content = self.settings.get('reconstruct_content', False)
+
+        # In batch mode offsets are committed only after a whole batch has
+        # been handled (at-least-once); stream mode auto-commits
+        self.batch_mode = self.settings.get('mode', 'batch') == 'batch'
+
         # Initialize Kafka consumer
-        self.consumer = KafkaConsumer(
+        self.consumer = consumer or KafkaConsumer(
             self.config['kafka']['topic'],
             bootstrap_servers=self.config['kafka']['bootstrap_servers'],
-            value_deserializer=lambda x: json.loads(x.decode('utf-8')),
+            value_deserializer=self.decode,
             auto_offset_reset='latest',
-            enable_auto_commit=True,
+            enable_auto_commit=not self.batch_mode,
+            max_poll_records=self.settings.get('max_records', 500),
             group_id='docs_monitor_group'
         )
+
+        # Full page content rebuilt from snapshot and delta messages
+        self.reconstructor = DocReconstructor()
+        payload = self.config['kafka'].get('payload', {})
+        if self.reconstruct_content and payload.get('format') == 'delta' and payload.get('snapshot_topic'):
+            self.reconstructor.load_snapshots(read_snapshot_topic(
+                self.config['kafka']['bootstrap_servers'],
+                payload['snapshot_topic'],
+                deserialize=self.serializer.deserialize
+            ))
         
-        # Store last update time for each URL
-        self.last_updates = {}
+        # Last content hash and update time for each URL
+        if state is None:
+            state = MonitorState(self.settings.get('state_path'), max_urls=self.settings.get('max_urls', 100000))
+        self.state = state
 
-    def detect_changes(self, message):
-        """Detect changes in documentation"""
+        # Notification handlers, run on a worker pool in batch mode
+        self.handlers = [self.log_update]
+        self.metrics = ConsumerMetrics()
+
+    def detect_changes(self, message, updates=None):
+        """
+        Detect changes in documentation
+
+        Args:
+            updates: Dict collecting URL -> (content_hash, timestamp), or
+                None for a removed URL, in place of updating self.state.
+                Batch mode applies them only once the batch is committed.
+        """
         url = message['url']
         timestamp = datetime.fromisoformat(message['timestamp'])
-        
-        if url in self.last_updates:
-            last_update = self.last_updates[url]
-            time_diff = timestamp - last_update
+
+        previous = updates[url] if updates is not None and url in updates else self.state.get(url)
+
+        def update(entry):
+            if updates is not None:
+                updates[url] = entry
+            elif entry is None:
+                self.state.remove(url)
+            else:
+                self.state.put(url, *entry)
+
+        if message.get('change_type') == 'deleted':
+            logger.info(f"Documentation removed: {url}")
+            update(None)
+            return True
+
+        content_hash = message.get('content_hash')
+        if content_hash is not None:
+            # The crawler only publishes changed pages, but replays and
+            # restarts can still deliver a hash we have already seen
+            if previous is not None and previous[0] == content_hash:
+                return False
+            if previous is not None:
+                logger.info(f"Documentation updated: {url}")
+                logger.info(f"Time since last update: {timestamp - previous[1]}")
+            else:
+                logger.info(f"New documentation detected: {url}")
+            update((content_hash, timestamp))
+            return True
+
+        if previous is not None:
+            time_diff = timestamp - previous[1]
             
             if time_diff.total_seconds() > 0:
                 logger.info(f"Documentation updated: {url}")
                 logger.info(f"Time since last update: {time_diff}")
-                self.last_updates[url] = timestamp
+                update((None, timestamp))
                 return True
         else:
             logger.info(f"New documentation detected: {url}")
-            self.last_updates[url] = timestamp
+            update((None, timestamp))
             return True
             
         return False
 
+    def log_update(self, message):
+        """Default notification handler"""
+        # Here you could implement notifications
+        # (e.g., send email, Slack message, etc.)
+        logger.info(f"Title: {message.get('title', 'No title')}")
+        logger.info(f"URL: {message['url']}")
+        logger.info("-" * 50)
+
+    def add_handler(self, handler):
+        """Register a callable that is given each detected change"""
+        self.handlers.append(handler)
+
+    def notify(self, message):
+        for handler in self.handlers:
+            handler(message)
+
+    def run_handler(self, handler, message):
+        """Run a handler, retrying failures handler_retries times with a growing delay"""
+        retries = self.settings.get('handler_retries', 2)
+        for attempt in range(retries + 1):
+            try:
+                return handler(message)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"Notification handler failed ({str(e)}), retrying")
+                time.sleep(self.settings.get('handler_retry_backoff', 0.5) * 2 ** attempt)
+
     def process_message(self, message):
         """Process Kafka message"""
         try:
+            if self.reconstruct_content:
+                self.reconstructor.apply(message)
             if self.detect_changes(message):
-                # Here you could implement notifications
-                # (e.g., send email, Slack message, etc.)
-                logger.info(f"Title: {message.get('title', 'No title')}")
-                logger.info(f"URL: {message['url']}")
-                logger.info("-" * 50)
+                self.notify(message)
         except Exception as e:
+            self.metrics.record_error()
             logger.error(f"Error processing message: {str(e)}")
 
+    def process_batch(self, records, executor):
+        """
+        Detect changes in a batch and run the notification handlers
+
+        Change detection runs in order on this thread, so state updates for
+        a URL follow the partition order. Each record is compared with the
+        state left by earlier records of the same batch, so a repeated hash
+        is notified once. Handlers for the detected changes
+        run on the worker pool; this returns once all of them have finished.
+
+        Args:
+            records: TopicPartition -> consumer records, as returned by poll()
+
+        Returns:
+            (failed, updates) where failed maps each partition with a handler
+            that still failed after its retries to the offset of the first
+            such record, and updates lists (partition, offset, URL, entry)
+            state changes, in order, to apply once the batch is committed
+        """
+        futures = []
+        updates = []
+        # URL -> state after the records detected so far in this batch
+        pending = {}
+        for partition, partition_records in records.items():
+            for record in partition_records:
+                message = record.value
+                if message is None:
+                    continue
+                try:
+                    if self.reconstruct_content:
+                        self.reconstructor.apply(message)
+                    if self.detect_changes(message, pending):
+                        futures.extend(
+                            (executor.submit(self.run_handler, handler, message), partition, record.offset)
+                            for handler in self.handlers
+                        )
+                        updates.append((partition, record.offset, message['url'], pending[message['url']]))
+                except Exception as e:
+                    self.metrics.record_error()
+                    logger.error(f"Error processing message: {str(e)}")
+
+        wait([future for future, _, _ in futures])
+        failed = {}
+        for future, partition, offset in futures:
+            if future.exception() is not None:
+                self.metrics.record_error()
+                logger.error(f"Notification handler failed: {future.exception()}")
+                failed[partition] = min(offset, failed.get(partition, offset))
+        return failed, updates
+
+    def commit_batch(self, records, failed, updates):
+        """
+        Commit a processed batch up to its first failed handler per partition
+
+        Partitions with a failed handler are rewound to that record, so it
+        and everything after it are delivered and handled again. State
+        changes are applied and saved only for committed records.
+        """
+        offsets = {}
+        for partition, partition_records in records.items():
+            offset = failed.get(partition, partition_records[-1].offset + 1)
+            offsets[partition] = _commit_offset(offset)
+        self.consumer.commit(offsets)
+        for partition, offset in failed.items():
+            logger.warning(f"Handling of {partition.topic}[{partition.partition}] stopped at offset {offset}, retrying")
+            self.consumer.seek(partition, offset)
+
+        for partition, offset, url, entry in updates:
+            if offset < offsets[partition].offset:
+                if entry is None:
+                    self.state.remove(url)
+                else:
+                    self.state.put(url, *entry)
+        self.state.save()
+
+    def decode(self, data):
+        """Decode a message value, skipping the body unless content is reconstructed"""
+        if data is None:
+            return None
+        if self.reconstruct_content:
+            return self.serializer.deserialize(data)
+        return self.serializer.deserialize_header(data)
+
+    def get_content(self, url):
+        """Full current content of a page, rebuilt from snapshots and deltas (needs reconstruct_content)"""
+        return self.reconstructor.get_content(url)
+
+    def report_metrics(self):
+        try:
+            self.metrics.update_lag(self.consumer)
+        except Exception as e:
+            logger.warning(f"Could not fetch consumer lag: {str(e)}")
+        snapshot = self.metrics.snapshot()
+        logger.info(
+            f"Processed {snapshot['messages']} messages ({snapshot['rate']}/s), "
+            f"batch latency p50 {snapshot['batch_latency_ms']['p50']} ms, lag {snapshot['lag']}"
+        )
+        if self.settings.get('metrics_file'):
+            self.metrics.write(self.settings['metrics_file'])
+
+    def run_batches(self, max_batches=None):
+        """
+        Poll batches of messages until stopped
+
+        Offsets are committed only after every handler of a batch has
+        finished, and never past a record whose handler failed, which is
+        delivered again instead. The URL state is updated and saved after
+        the commit. A crash before the commit redelivers the batch, and
+        because its state was never updated the changes are detected and
+        notified again.
+        """
+        max_records = self.settings.get('max_records', 500)
+        poll_timeout_ms = self.settings.get('poll_timeout_ms', 1000)
+        metrics_interval = self.settings.get('metrics_interval', 30)
+        last_report = time.monotonic()
+        batches = 0
+
+        with ThreadPoolExecutor(max_workers=self.settings.get('workers', 4)) as executor:
+            while max_batches is None or batches < max_batches:
+                records = self.consumer.poll(timeout_ms=poll_timeout_ms, max_records=max_records)
+                records = {partition: batch for partition, batch in records.items() if batch}
+                if records:
+                    start = time.perf_counter()
+                    failed, updates = self.process_batch(records, executor)
+                    self.commit_batch(records, failed, updates)
+                    self.metrics.record_batch(sum(map(len, records.values())), time.perf_counter() - start)
+                    batches += 1
+
+                if time.monotonic() - last_report >= metrics_interval:
+                    self.report_metrics()
+                    last_report = time.monotonic()
+
     def run(self):
         """Main monitor loop"""
         logger.info("Starting documentation monitor...")
         
         try:
-            for message in self.consumer:
-                self.process_message(message.value)
+            if self.batch_mode:
+                self.run_batches()
+            else:
+                for message in self.consumer:
+                    self.process_message(message.value)
         except Exception as e:
             logger.error(f"Error in monitor loop: {str(e)}")
         finally:
+            if not self.batch_mode:
+                self.state.save()
             self.consumer.close()
+            self.state.close()
 
 if __name__ == "__main__":
     monitor = DocsMonitor()
@@ -0,0 +1,84 @@
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime
+
+class MonitorState:
+    """
+    Bounded URL -> (content hash, last update) map for DocsMonitor
+
+    At most max_urls entries are kept; the least recently updated URL is
+    evicted first. With a path, changes are written to SQLite on save() and
+    the most recent entries are reloaded on start, so a restarted monitor
+    does not report known pages as new.
+    """
+
+    def __init__(self, path=None, max_urls=100000):
+        self.max_urls = max_urls
+        self.entries = OrderedDict()
+        self._dirty = set()
+        self._removed = set()
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS monitor_state (
+                    url TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    updated_at TEXT NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            self.conn.commit()
+            rows = self.conn.execute(
+                'SELECT url, content_hash, updated_at FROM monitor_state ORDER BY updated_at DESC LIMIT ?',
+                (max_urls,)
+            ).fetchall()
+            for url, content_hash, updated_at in reversed(rows):
+                self.entries[url] = (content_hash, datetime.fromisoformat(updated_at))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def get(self, url):
+        """(content_hash, timestamp) last seen for a URL, or None"""
+        return self.entries.get(url)
+
+    def put(self, url, content_hash, timestamp):
+        self.entries[url] = (content_hash, timestamp)
+        self.entries.move_to_end(url)
+        self._dirty.add(url)
+        self._removed.discard(url)
+        while len(self.entries) > self.max_urls:
+            evicted, _ = self.entries.popitem(last=False)
+            self._dirty.discard(evicted)
+            self._removed.add(evicted)
+
+    def remove(self, url):
+        if self.entries.pop(url, None) is not None:
+            self._dirty.discard(url)
+            self._removed.add(url)
+
+    def save(self):
+        """Write entries changed since the last save"""
+        if self.conn is not None:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO monitor_state (url, content_hash, updated_at) VALUES (?, ?, ?)',
+                    (
+                        (url, self.entries[url][0], self.entries[url][1].isoformat())
+                        for url in self._dirty
+                    )
+                )
+                self.conn.executemany(
+                    'DELETE FROM monitor_state WHERE url = ?', ((url,) for url in self._removed)
+                )
+        self._dirty.clear()
+        self._removed.clear()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
@@ -0,0 +1,158 @@
+import difflib
+import json
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+def make_delta(old, new):
+    """
+    Line-based diff that turns old into new
+
+    The delta is a list of operations: ["=", n] keeps the next n lines,
+    ["-", n] drops them and ["+", [lines]] inserts lines.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(['=', i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append(['-', i2 - i1])
+        if j2 > j1:
+            ops.append(['+', new_lines[j1:j2]])
+    return ops
+
+def apply_delta(old, ops):
+    """Rebuild new content from old content and a delta"""
+    old_lines = old.splitlines(keepends=True)
+    position = 0
+    parts = []
+    for op, value in ops:
+        if op == '=':
+            parts.extend(old_lines[position:position + value])
+            position += value
+        elif op == '-':
+            position += value
+        elif op == '+':
+            parts.extend(value)
+        else:
+            raise ValueError(f"Unknown delta operation: {op}")
+    return ''.join(parts)
+
+def encode_change(doc, previous, snapshot_every=10, max_delta_ratio=0.5):
+    """
+    Message for a new or changed doc in the delta payload format
+
+    Args:
+        doc: Change with full 'content'
+        previous: (version, versions_since_snapshot, content) last published
+            for this URL, or None. content is None when it is not known.
+        snapshot_every: Send a full snapshot after this many versions
+        max_delta_ratio: Send a snapshot when the delta would be larger than
+            this fraction of the content
+
+    Returns:
+        (message, state) where state is the (version, versions_since_snapshot,
+        content) to store once the message is delivered
+    """
+    content = doc.get('content') or ''
+    if previous is None:
+        version, since_snapshot = 1, snapshot_every
+    elif previous[2] is None:
+        # Only the version is known, for a page adopted from another replica
+        version, since_snapshot = previous[0] + 1, snapshot_every
+    else:
+        version, since_snapshot = previous[0] + 1, previous[1] + 1
+
+    if since_snapshot < snapshot_every:
+        delta = make_delta(previous[2], content)
+        if len(json.dumps(delta)) <= max_delta_ratio * len(content):
+            message = {
+                **doc,
+                'content': None,
+                'format': 'delta',
+                'version': version,
+                'base_version': previous[0],
+                'delta': delta
+            }
+            return message, (version, since_snapshot, content)
+
+    message = {**doc, 'format': 'snapshot', 'version': version}
+    return message, (version, 0, content)
+
+class DocReconstructor:
+    """
+    Rebuilds full page content from snapshot and delta messages
+
+    Content is kept zlib-compressed per URL. Messages in the plain "full"
+    format (no 'format' field) are treated as snapshots. A message whose
+    version is not newer than the one already held is skipped, so updates
+    replayed after loading the snapshot topic are harmless.
+    """
+
+    def __init__(self):
+        self.pages = {}
+
+    def apply(self, message):
+        """
+        Update the state from a message and return the page's full content
+
+        Returns None for deletions and for deltas whose base version is
+        unknown (the consumer needs a snapshot first).
+        """
+        url = message['url']
+        if message.get('change_type') == 'deleted':
+            self.pages.pop(url, None)
+            return None
+
+        current = self.pages.get(url)
+        version = message.get('version')
+        if current is not None and version is not None and current[0] is not None and version <= current[0]:
+            return zlib.decompress(current[1]).decode('utf-8')
+
+        if message.get('format') == 'delta':
+            if current is None or current[0] != message['base_version']:
+                logger.warning(f"Missing base version {message['base_version']} for {url}, waiting for a snapshot")
+                return None
+            content = apply_delta(zlib.decompress(current[1]).decode('utf-8'), message['delta'])
+        else:
+            content = message.get('content') or ''
+
+        self.pages[url] = (version, zlib.compress(content.encode('utf-8')))
+        return content
+
+    def load_snapshots(self, messages):
+        """Seed the state from snapshot messages, e.g. the compacted snapshot topic"""
+        for message in messages:
+            self.apply(message)
+
+    def get_content(self, url):
+        """Latest full content of a URL, or None if it is unknown"""
+        current = self.pages.get(url)
+        return zlib.decompress(current[1]).decode('utf-8') if current else None
+
+def read_snapshot_topic(bootstrap_servers, topic, deserialize=None, timeout_ms=5000):
+    """Yield every snapshot in a compacted topic, stopping once it is idle"""
+    from kafka import KafkaConsumer
+
+    deserialize = deserialize or (lambda x: json.loads(x.decode('utf-8')))
+    consumer = KafkaConsumer(
+        topic,
+        bootstrap_servers=bootstrap_servers,
+        key_deserializer=lambda x: x.decode('utf-8'),
+        value_deserializer=lambda x: deserialize(x) if x is not None else None,
+        auto_offset_reset='earliest',
+        enable_auto_commit=False,
+        consumer_timeout_ms=timeout_ms
+    )
+    try:
+        for record in consumer:
+            # A tombstone removes the URL's snapshot
+            yield record.value if record.value is not None else {'url': record.key, 'change_type': 'deleted'}
+    finally:
+        consumer.close()
@@ -0,0 +1,223 @@
+import json
+import os
+import zlib
+
+# Schema of doc update messages. Header fields come first on the wire so
+# consumers can read them without decoding the body.
+DOC_SCHEMA = {
+    'name': 'DocUpdate',
+    'header': [
+        ['url', 'string'],
+        ['title', 'string'],
+        ['timestamp', 'string'],
+        ['content_hash', 'string'],
+        ['change_type', 'string'],
+        ['format', 'string'],
+        ['version', 'long'],
+        ['base_version', 'long'],
+    ],
+    'body': [
+        ['metadata', 'json'],
+        ['delta', 'json'],
+        ['extra', 'json'],
+        ['content', 'text'],
+    ],
+}
+
+MAGIC_BYTE = 0
+CODECS = {None: 0, 'zlib': 1, 'zstd': 2}
+NULL_CODEC = 255
+
+def schema_id(schema):
+    """Stable id of a schema: CRC32 of its canonical JSON"""
+    return zlib.crc32(json.dumps(schema, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+
+class SchemaRegistry:
+    """
+    Local stand-in for a schema registry
+
+    Schemas are stored by id in a JSON file so that messages written with an
+    older schema can still be decoded after the schema changes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.schemas = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.schemas = {int(key): schema for key, schema in json.load(f).items()}
+        self.register(DOC_SCHEMA)
+
+    def register(self, schema):
+        """Register a schema and return its id"""
+        key = schema_id(schema)
+        if key not in self.schemas:
+            self.schemas[key] = schema
+            if self.path:
+                with open(self.path, 'w') as f:
+                    json.dump({str(k): v for k, v in self.schemas.items()}, f, indent=2)
+        return key
+
+    def get(self, key):
+        try:
+            return self.schemas[key]
+        except KeyError:
+            raise ValueError(f"Unknown schema id: {key}")
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, position):
+    shift = result = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+def _write_bytes(out, value):
+    """Length-prefixed bytes, with length 0 meaning null"""
+    if value is None:
+        out.append(0)
+        return
+    _write_varint(out, len(value) + 1)
+    out += value
+
+def _read_bytes(data, position):
+    length, position = _read_varint(data, position)
+    if length == 0:
+        return None, position
+    end = position + length - 1
+    return bytes(data[position:end]), end
+
+class JSONSerializer:
+    """The original UTF-8 JSON encoding"""
+
+    def serialize(self, doc):
+        return json.dumps(doc).encode('utf-8')
+
+    def deserialize(self, data):
+        return json.loads(data.decode('utf-8'))
+
+    def deserialize_header(self, data):
+        return self.deserialize(data)
+
+class BinarySerializer:
+    """
+    Schema-based binary encoding with an optionally compressed content field
+
+    Wire format: magic byte, 4-byte schema id, then the schema's header
+    fields followed by its body fields. Strings and JSON values are
+    length-prefixed, and longs are zigzag varints. Content of at least
+    compress_min_bytes is compressed with the configured codec.
+    """
+
+    def __init__(self, registry=None, compression='zlib', compress_min_bytes=512, level=6):
+        if compression not in CODECS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        self.registry = registry or SchemaRegistry()
+        self.schema_id = self.registry.register(DOC_SCHEMA)
+        self.schema = DOC_SCHEMA
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self.level = level
+        self._known = {name for name, _ in DOC_SCHEMA['header'] + DOC_SCHEMA['body']} - {'extra'}
+
+    def serialize(self, doc):
+        out = bytearray([MAGIC_BYTE])
+        out += self.schema_id.to_bytes(4, 'big')
+        extra = {key: value for key, value in doc.items() if key not in self._known}
+        values = {**doc, 'extra': extra or None}
+        for name, kind in self.schema['header'] + self.schema['body']:
+            self._write(out, kind, values.get(name))
+        return bytes(out)
+
+    def _write(self, out, kind, value):
+        if kind == 'string':
+            _write_bytes(out, None if value is None else value.encode('utf-8'))
+        elif kind == 'long':
+            # 0 is null, otherwise zigzag(value) + 1
+            _write_varint(out, 0 if value is None else ((value << 1) ^ (value >> 63)) + 1)
+        elif kind == 'json':
+            _write_bytes(out, None if value is None else json.dumps(value, separators=(',', ':')).encode('utf-8'))
+        elif kind == 'text':
+            if value is None:
+                out.append(NULL_CODEC)
+                return
+            data = value.encode('utf-8')
+            codec = self.compression if len(data) >= self.compress_min_bytes else None
+            out.append(CODECS[codec])
+            _write_bytes(out, self._compress(codec, data))
+        else:
+            raise ValueError(f"Unknown field type: {kind}")
+
+    def _compress(self, codec, data):
+        if codec == 'zlib':
+            return zlib.compress(data, self.level)
+        if codec == 'zstd':
+            import zstandard
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return data
+
+    def _read_schema(self, data):
+        if data[0] != MAGIC_BYTE:
+            raise ValueError("Not a binary doc message")
+        return self.registry.get(int.from_bytes(data[1:5], 'big')), 5
+
+    def _read(self, data, position, kind):
+        if kind == 'string':
+            value, position = _read_bytes(data, position)
+            return (None if value is None else value.decode('utf-8')), position
+        if kind == 'long':
+            encoded, position = _read_varint(data, position)
+            if encoded == 0:
+                return None, position
+            encoded -= 1
+            return (encoded >> 1) ^ -(encoded & 1), position
+        if kind == 'json':
+            value, position = _read_bytes(data, position)
+            return (None if value is None else json.loads(value)), position
+        if kind == 'text':
+            codec = data[position]
+            if codec == NULL_CODEC:
+                return None, position + 1
+            value, position = _read_bytes(data, position + 1)
+            if codec == CODECS['zlib']:
+                value = zlib.decompress(value)
+            elif codec == CODECS['zstd']:
+                import zstandard
+                value = zstandard.ZstdDecompressor().decompress(value)
+            return value.decode('utf-8'), position
+        raise ValueError(f"Unknown field type: {kind}")
+
+    def deserialize_header(self, data):
+        """Decode only the header fields, leaving the body untouched"""
+        schema, position = self._read_schema(data)
+        header = {}
+        for name, kind in schema['header']:
+            header[name], position = self._read(data, position, kind)
+        return header
+
+    def deserialize(self, data):
+        schema, position = self._read_schema(data)
+        doc = {}
+        for name, kind in schema['header'] + schema['body']:
+            doc[name], position = self._read(data, position, kind)
+        extra = doc.pop('extra', None) or {}
+        return {**doc, **extra}
+
+def create_serializer(config):
+    """Serializer for the `kafka.serializer` section of the configuration"""
+    settings = config['kafka'].get('serializer', {})
+    if settings.get('format', 'json') == 'json':
+        return JSONSerializer()
+    return BinarySerializer(
+        SchemaRegistry(settings.get('schema_registry')),
+        compression=settings.get('compression', 'zlib'),
+        compress_min_bytes=settings.get('compress_min_bytes', 512)
+    )
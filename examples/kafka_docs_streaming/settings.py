@@ -0,0 +1,18 @@
+import os
+
+import yaml
+
+def load_config(config_path=None):
+    """
+    Load the YAML configuration
+
+    The path defaults to the CONFIG_PATH environment variable, else
+    config.yaml in the working directory. KAFKA_BOOTSTRAP_SERVERS, when
+    set, overrides kafka.bootstrap_servers, so a deployment can mount one
+    configuration file and pass the cluster address separately.
+    """
+    with open(config_path or os.getenv('CONFIG_PATH', 'config.yaml'), 'r') as f:
+        config = yaml.safe_load(f)
+    if os.getenv('KAFKA_BOOTSTRAP_SERVERS'):
+        config['kafka']['bootstrap_servers'] = os.environ['KAFKA_BOOTSTRAP_SERVERS']
+    return config
@@ -0,0 +1,261 @@
+import bisect
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def default_replica_id():
+    """REPLICA_ID, else the pod name (HOSTNAME), else host and process id"""
+    return os.getenv('REPLICA_ID') or os.getenv('HOSTNAME') or f'{socket.gethostname()}-{os.getpid()}'
+
+class HashRing:
+    """
+    Consistent hash ring of replica ids
+
+    Each replica is placed at `vnodes` points on the ring and a key belongs
+    to the first point clockwise from its hash, so adding or removing a
+    replica only moves about 1/n of the keys.
+    """
+
+    def __init__(self, members, vnodes=64):
+        self.members = sorted(set(members))
+        points = sorted((_hash(f'{member}#{i}'), member) for member in self.members for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key):
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+class LeaseFileMembership:
+    """
+    Replica membership through lease files in a shared directory
+
+    Each replica keeps a `<replica_id>.lease` file holding its expiry time;
+    replicas whose lease has expired are no longer members. Published page
+    state is shared through a SQLite file in the same directory.
+    """
+
+    def __init__(self, directory, replica_id, ttl=120):
+        self.directory = directory
+        self.replica_id = replica_id
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'{replica_id}.lease')
+        self.pages = sqlite3.connect(os.path.join(directory, 'pages.db'), timeout=30)
+        with self.pages:
+            self.pages.execute(
+                'CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, state TEXT NOT NULL) WITHOUT ROWID'
+            )
+
+    def heartbeat(self):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'replica_id': self.replica_id, 'expires_at': time.time() + self.ttl}, f)
+        os.replace(tmp_path, self.path)
+
+    def members(self):
+        now = time.time()
+        members = set()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.lease'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'r') as f:
+                    lease = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if lease['expires_at'] > now:
+                members.add(lease['replica_id'])
+        return members
+
+    def share_pages(self, states, deleted_urls=()):
+        with self.pages:
+            self.pages.executemany(
+                'INSERT OR REPLACE INTO pages (url, state) VALUES (?, ?)',
+                ((url, json.dumps(state)) for url, state in states.items())
+            )
+            self.pages.executemany('DELETE FROM pages WHERE url = ?', ((url,) for url in deleted_urls))
+
+    def shared_pages(self, urls):
+        states = {}
+        for url in urls:
+            row = self.pages.execute('SELECT state FROM pages WHERE url = ?', (url,)).fetchone()
+            if row is not None:
+                states[url] = json.loads(row[0])
+        return states
+
+    def release(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.pages.close()
+
+class KafkaMembership:
+    """
+    Replica membership through heartbeats on a compacted Kafka control topic
+
+    Heartbeats are keyed by replica id and carry an expiry time; a released
+    replica sends a tombstone. Published page state is kept on the same
+    topic under `page:<url>` keys. Every replica reads the whole topic, so
+    all of them see the same members and pages once they have caught up.
+    """
+
+    PAGE_PREFIX = 'page:'
+
+    def __init__(self, bootstrap_servers, topic, replica_id, ttl=120):
+        from kafka import KafkaConsumer, KafkaProducer, TopicPartition
+
+        self.topic = topic
+        self.replica_id = replica_id
+        self.ttl = ttl
+        self.leases = {}
+        self.pages = {}
+        self.producer = KafkaProducer(
+            bootstrap_servers=bootstrap_servers,
+            key_serializer=lambda k: k.encode('utf-8'),
+            value_serializer=lambda x: json.dumps(x).encode('utf-8') if x is not None else None
+        )
+        self.consumer = KafkaConsumer(
+            bootstrap_servers=bootstrap_servers,
+            key_deserializer=lambda x: x.decode('utf-8'),
+            value_deserializer=lambda x: json.loads(x.decode('utf-8')) if x is not None else None,
+            enable_auto_commit=False
+        )
+        partitions = self.consumer.partitions_for_topic(topic) or {0}
+        self.consumer.assign([TopicPartition(topic, partition) for partition in partitions])
+        self.consumer.seek_to_beginning()
+        self._lock = threading.Lock()
+
+    def heartbeat(self):
+        self.producer.send(self.topic, key=self.replica_id, value={'expires_at': time.time() + self.ttl})
+        self.producer.flush()
+
+    def _catch_up(self):
+        while True:
+            records = self.consumer.poll(timeout_ms=500)
+            if not records:
+                break
+            for record in (record for partition in records.values() for record in partition):
+                if record.key.startswith(self.PAGE_PREFIX):
+                    table, key, value = self.pages, record.key[len(self.PAGE_PREFIX):], record.value
+                else:
+                    table, key, value = self.leases, record.key, record.value and record.value['expires_at']
+                if value is None:
+                    table.pop(key, None)
+                else:
+                    table[key] = value
+
+    def members(self):
+        with self._lock:
+            self._catch_up()
+            now = time.time()
+            return {replica_id for replica_id, expires_at in self.leases.items() if expires_at > now}
+
+    def share_pages(self, states, deleted_urls=()):
+        for url, state in states.items():
+            self.producer.send(self.topic, key=self.PAGE_PREFIX + url, value=state)
+        for url in deleted_urls:
+            self.producer.send(self.topic, key=self.PAGE_PREFIX + url, value=None)
+        self.producer.flush()
+
+    def shared_pages(self, urls):
+        with self._lock:
+            self._catch_up()
+            return {url: self.pages[url] for url in urls if url in self.pages}
+
+    def release(self):
+        self.producer.send(self.topic, key=self.replica_id, value=None)
+        self.producer.flush()
+        self.producer.close()
+        self.consumer.close()
+
+class Shard:
+    """
+    This replica's share of the URL frontier
+
+    A background thread renews the membership lease. refresh() rebuilds the
+    hash ring from the live members; it is called once per crawl cycle so
+    ownership only changes between cycles.
+
+    The owner of a page shares its published state (content hash and
+    version) with share_pages(), so a replica that takes the page over can
+    pick it up with shared_pages() instead of announcing it as new.
+    """
+
+    def __init__(self, membership, vnodes=64, heartbeat_interval=30):
+        self.membership = membership
+        self.replica_id = membership.replica_id
+        self.vnodes = vnodes
+        self.heartbeat_interval = heartbeat_interval
+        self.membership.heartbeat()
+        self.ring = HashRing([self.replica_id], vnodes)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._renew, daemon=True)
+        self._thread.start()
+
+    def _renew(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            try:
+                self.membership.heartbeat()
+            except Exception as e:
+                logger.warning(f"Could not renew lease for {self.replica_id}: {str(e)}")
+
+    def refresh(self):
+        """Rebuild the ring from the current members and return them"""
+        members = self.membership.members() | {self.replica_id}
+        if set(self.ring.members) != members:
+            logger.info(f"Replica {self.replica_id} sharding across {len(members)} replicas: {sorted(members)}")
+            self.ring = HashRing(members, self.vnodes)
+        return members
+
+    def owns(self, url):
+        return self.ring.owner(url) == self.replica_id
+
+    def share_pages(self, states, deleted_urls=()):
+        """Share URL -> published state of pages this replica published or deleted"""
+        self.membership.share_pages(states, deleted_urls)
+
+    def shared_pages(self, urls):
+        """URL -> last shared state of those URLs that any replica has published"""
+        return self.membership.shared_pages(urls)
+
+    def stop(self):
+        """Stop renewing and give up the lease so others take over at once"""
+        self._stopped.set()
+        self._thread.join()
+        self.membership.release()
+
+def create_shard(config):
+    """Shard for the `crawler.sharding` section of the configuration, or None"""
+    settings = config['crawler'].get('sharding', {})
+    if not settings.get('enabled'):
+        return None
+    replica_id = settings.get('replica_id') or default_replica_id()
+    ttl = settings.get('lease_ttl', 120)
+    if settings.get('coordination', 'lease_file') == 'kafka':
+        membership = KafkaMembership(
+            config['kafka']['bootstrap_servers'],
+            settings.get('control_topic', 'kafka_docs_crawler_control'),
+            replica_id,
+            ttl
+        )
+    else:
+        membership = LeaseFileMembership(settings.get('lease_dir', 'leases'), replica_id, ttl)
+    return Shard(
+        membership,
+        vnodes=settings.get('vnodes', 64),
+        heartbeat_interval=settings.get('heartbeat_interval', ttl / 4)
+    )
@@ -0,0 +1,99 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from benchmark_incremental import DocsSite, make_handler
+from hash_store import ContentHashStore
+from incremental import IncrementalPlanner, normalize_url, url_allowed
+
+@pytest.fixture
+def site():
+    site = DocsSite(20, 200)
+    counters = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(site, counters))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    site.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    site.counters = counters
+    yield site
+    server.shutdown()
+    server.server_close()
+
+def publish(store, urls, validators):
+    """Record pages as published, as the crawler does after delivery"""
+    store.record([{'url': url, 'content_hash': f'hash-{url}'} for url in urls], [])
+    store.record_validators({url: {**validators.get(url, {}), 'size': 200} for url in urls})
+
+def test_normalize_url():
+    """Test spellings of the same page normalize to one key"""
+    expected = 'https://kafka.apache.org/documentation'
+    for url in ['HTTPS://Kafka.Apache.org/documentation/', 'https://kafka.apache.org/documentation#intro']:
+        assert normalize_url(url) == expected
+    assert normalize_url('https://kafka.apache.org') == 'https://kafka.apache.org/'
+    assert normalize_url('https://kafka.apache.org/a/?q=1') == 'https://kafka.apache.org/a?q=1'
+
+def test_url_allowed():
+    """Test include patterns are required and exclude patterns win"""
+    include, exclude = ['/documentation/*'], ['/documentation/old/*']
+    assert url_allowed('https://kafka.apache.org/documentation/streams', include, exclude)
+    assert not url_allowed('https://kafka.apache.org/documentation/old/intro', include, exclude)
+    assert not url_allowed('https://kafka.apache.org/downloads', include, exclude)
+
+def test_hash_store_diff():
+    """Test new, changed, unchanged and deleted pages against the published hashes"""
+    store = ContentHashStore(':memory:')
+    docs = [{'url': 'a', 'title': 'A', 'content': 'alpha'}, {'url': 'b', 'title': 'B', 'content': 'beta'}]
+    changes, _ = store.diff(docs)
+    store.record(changes, [])
+
+    changes, deleted = store.diff([{**docs[0], 'content': 'alpha 2'}, {'url': 'c', 'content': 'gamma'}], ['a', 'c'])
+    assert [(doc['url'], doc['change_type']) for doc in changes] == [('a', 'changed'), ('c', 'new')]
+    assert deleted == ['b']
+    assert store.diff(docs[:1], ['a', 'b']) == ([], [])
+
+def test_planner_scrapes_only_changed_pages(site):
+    """Test lastmod and conditional HEAD requests skip unchanged pages"""
+    store = ContentHashStore(':memory:')
+    planner = IncrementalPlanner(store, f'{site.base_url}/sitemap.xml', include_paths=['/documentation/*'])
+
+    all_urls, changed, validators, _ = planner.plan()
+    assert sorted(changed) == sorted(all_urls) and len(all_urls) == 20
+    publish(store, changed, validators)
+
+    # Even pages have a sitemap lastmod, odd pages only HTTP validators
+    site.edit('/documentation/page-2')
+    site.edit('/documentation/page-3')
+    site.add_page()
+    all_urls, changed, validators, report = planner.plan()
+
+    assert sorted(changed) == sorted(f'{site.base_url}/documentation/page-{i}' for i in (2, 3, 20))
+    assert len(all_urls) == 21
+    assert report['not_modified'] == 9
+    assert validators[f'{site.base_url}/documentation/page-3']['etag'] == '"/documentation/page-3-v1"'
+
+def test_forced_plan_reuses_validators(site):
+    """Test a full crawl only sends HEAD requests for pages without validators"""
+    store = ContentHashStore(':memory:')
+    planner = IncrementalPlanner(store, f'{site.base_url}/sitemap.xml', include_paths=['/documentation/*'])
+    _, changed, validators, _ = planner.plan()
+    publish(store, changed, validators)
+    # Page 20 has a sitemap lastmod, page 21 needs a HEAD request for its validators
+    site.add_page()
+    site.add_page()
+
+    all_urls, changed, _, report = planner.plan(force=True)
+
+    assert sorted(changed) == sorted(all_urls)
+    assert report['head_requests'] == 1
+
+def test_planner_checks_only_owned_urls(site):
+    """Test a shard lists every sitemap URL but only checks the ones it owns"""
+    store = ContentHashStore(':memory:')
+    planner = IncrementalPlanner(store, f'{site.base_url}/sitemap.xml', include_paths=['/documentation/*'])
+    owned = {f'{site.base_url}/documentation/page-{i}' for i in range(5)}
+
+    all_urls, changed, _, report = planner.plan(owns=owned.__contains__)
+
+    assert len(all_urls) == 20
+    assert set(changed) == owned
+    assert report['owned_urls'] == 5
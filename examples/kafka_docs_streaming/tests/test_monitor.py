@@ -0,0 +1,142 @@
+import logging
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import yaml
+from kafka import TopicPartition
+
+from monitor import DocsMonitor
+from monitor_state import MonitorState
+
+Record = namedtuple('Record', ['offset', 'value'])
+PARTITION = TopicPartition('kafka_docs_updates', 0)
+CONFIG = os.path.join(os.path.dirname(__file__), '..', 'config.yaml')
+
+class FakeConsumer:
+    """Hands out queued polls and records commits and seeks"""
+
+    def __init__(self, polls):
+        self.polls = list(polls)
+        self.commits = []
+        self.seeks = []
+
+    def poll(self, timeout_ms=0, max_records=None):
+        return self.polls.pop(0) if self.polls else {}
+
+    def commit(self, offsets):
+        self.commits.append({partition: meta.offset for partition, meta in offsets.items()})
+
+    def seek(self, partition, offset):
+        self.seeks.append((partition, offset))
+
+def message(url, content_hash, timestamp, change_type='changed'):
+    return {'url': url, 'title': url, 'timestamp': timestamp, 'content_hash': content_hash, 'change_type': change_type}
+
+def make_monitor(tmp_path, polls):
+    with open(CONFIG) as f:
+        config = yaml.safe_load(f)
+    config['kafka']['serializer'] = {'format': 'json'}
+    config['monitor'].update({'handler_retries': 0, 'metrics_file': None})
+    config_path = str(tmp_path / 'config.yaml')
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(config, f)
+    monitor = DocsMonitor(config_path, consumer=FakeConsumer(polls), state=MonitorState())
+    monitor.handlers = []
+    return monitor
+
+def batch(*messages):
+    return {PARTITION: [Record(offset, value) for offset, value in enumerate(messages)]}
+
+def test_repeated_hash_in_one_batch_notifies_once(tmp_path):
+    """Test records of a batch are compared with earlier records of the same batch"""
+    monitor = make_monitor(tmp_path, [batch(
+        message('u', 'h1', '2024-01-01T00:00:00'),
+        message('u', 'h1', '2024-01-01T00:05:00'),
+        message('u', 'h2', '2024-01-01T01:00:00'),
+    )])
+    notified = []
+    monitor.add_handler(notified.append)
+
+    monitor.run_batches(max_batches=1)
+
+    assert [m['content_hash'] for m in notified] == ['h1', 'h2']
+    assert monitor.state.get('u')[0] == 'h2'
+    assert monitor.consumer.commits == [{PARTITION: 3}]
+
+def test_update_time_measured_from_earlier_record(tmp_path, caplog):
+    """Test the time since the last update uses the state left earlier in the batch"""
+    monitor = make_monitor(tmp_path, [batch(
+        message('u', 'h1', '2024-01-01T00:00:00'),
+        message('u', 'h2', '2024-01-01T00:10:00'),
+    )])
+
+    with caplog.at_level(logging.INFO, logger='monitor'):
+        monitor.run_batches(max_batches=1)
+
+    assert 'Time since last update: 0:10:00' in caplog.text
+
+def test_deletion_then_new_page_in_one_batch(tmp_path):
+    """Test a page deleted and published again in one batch is notified both times"""
+    monitor = make_monitor(tmp_path, [batch(
+        message('u', 'h1', '2024-01-01T00:00:00'),
+        message('u', None, '2024-01-01T00:01:00', 'deleted'),
+        message('u', 'h1', '2024-01-01T00:02:00', 'new'),
+    )])
+    notified = []
+    monitor.add_handler(notified.append)
+
+    monitor.run_batches(max_batches=1)
+
+    assert [m['change_type'] for m in notified] == ['changed', 'deleted', 'new']
+    assert monitor.state.get('u')[0] == 'h1'
+
+def test_failed_handler_stops_commit_and_is_redelivered(tmp_path):
+    """Test offsets stop at a failed handler, state skips it and redelivery notifies again"""
+    first = batch(
+        message('a', 'h1', '2024-01-01T00:00:00'),
+        message('b', 'h1', '2024-01-01T00:00:00'),
+        message('c', 'h1', '2024-01-01T00:00:00'),
+    )
+    redelivered = {PARTITION: first[PARTITION][1:]}
+    monitor = make_monitor(tmp_path, [first, redelivered])
+    notified = []
+    failures = ['b']
+
+    def handler(m):
+        if m['url'] in failures:
+            failures.remove(m['url'])
+            raise RuntimeError('notification service down')
+        notified.append(m['url'])
+    monitor.add_handler(handler)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        records = monitor.consumer.poll()
+        failed, updates = monitor.process_batch(records, executor)
+        monitor.commit_batch(records, failed, updates)
+
+        assert failed == {PARTITION: 1}
+        assert monitor.consumer.commits == [{PARTITION: 1}]
+        assert monitor.consumer.seeks == [(PARTITION, 1)]
+        assert 'a' in monitor.state and 'b' not in monitor.state and 'c' not in monitor.state
+
+        records = monitor.consumer.poll()
+        failed, updates = monitor.process_batch(records, executor)
+        monitor.commit_batch(records, failed, updates)
+
+    assert sorted(notified) == ['a', 'b', 'c', 'c']
+    assert monitor.consumer.commits[-1] == {PARTITION: 3}
+    assert all(url in monitor.state for url in 'abc')
+
+@pytest.mark.parametrize('bad', [{'url': 'x', 'timestamp': 'not a date'}, {'timestamp': '2024-01-01T00:00:00'}])
+def test_bad_message_is_skipped(tmp_path, bad):
+    """Test a malformed message is counted as an error without stopping the batch"""
+    monitor = make_monitor(tmp_path, [batch(bad, message('u', 'h1', '2024-01-01T00:00:00'))])
+    notified = []
+    monitor.add_handler(notified.append)
+
+    monitor.run_batches(max_batches=1)
+
+    assert [m['url'] for m in notified] == ['u']
+    assert monitor.consumer.commits == [{PARTITION: 2}]
@@ -0,0 +1,62 @@
+from payloads import DocReconstructor, apply_delta, encode_change, make_delta
+
+OLD = ''.join(f'Line {i}\n' for i in range(50))
+NEW = OLD.replace('Line 10\n', 'Line ten\n').replace('Line 30\n', '') + 'Line 50\n'
+
+def test_delta_round_trip():
+    """Test applying a delta to the old content gives the new content"""
+    for old, new in [(OLD, NEW), (NEW, OLD), ('', NEW), (OLD, ''), ('a\nb', 'a\nc')]:
+        assert apply_delta(old, make_delta(old, new)) == new
+
+def test_encode_change_snapshots_and_deltas():
+    """Test the first version is a snapshot, later ones deltas until snapshot_every"""
+    doc = {'url': 'u', 'content': OLD}
+    message, state = encode_change(doc, None, snapshot_every=3)
+    assert (message['format'], message['version']) == ('snapshot', 1)
+
+    formats = []
+    for i in range(4):
+        content = OLD + f'Edit {i}\n'
+        message, state = encode_change({**doc, 'content': content}, state, snapshot_every=3)
+        formats.append(message['format'])
+        if message['format'] == 'delta':
+            assert message['content'] is None
+            assert message['base_version'] == message['version'] - 1
+    assert formats == ['delta', 'delta', 'snapshot', 'delta']
+
+def test_large_change_sent_as_snapshot():
+    """Test a diff larger than max_delta_ratio of the page is sent as a snapshot"""
+    _, state = encode_change({'url': 'u', 'content': OLD}, None)
+    message, _ = encode_change({'url': 'u', 'content': 'Rewritten\n' * 50}, state, max_delta_ratio=0.5)
+
+    assert message['format'] == 'snapshot'
+
+def test_reconstructor_applies_deltas():
+    """Test snapshots and deltas rebuild each version in order"""
+    reconstructor = DocReconstructor()
+    messages = []
+    state = None
+    for content in [OLD, NEW, NEW + 'More\n']:
+        message, state = encode_change({'url': 'u', 'content': content}, state)
+        messages.append(message)
+        assert reconstructor.apply(message) == content
+
+    assert [message['format'] for message in messages] == ['snapshot', 'delta', 'delta']
+    assert reconstructor.get_content('u') == NEW + 'More\n'
+
+def test_reconstructor_skips_replays_and_waits_for_base():
+    """Test stale versions are ignored and a delta without its base waits for a snapshot"""
+    snapshot, state = encode_change({'url': 'u', 'content': OLD}, None)
+    delta, _ = encode_change({'url': 'u', 'content': NEW}, state)
+
+    fresh = DocReconstructor()
+    assert fresh.apply(delta) is None
+    assert fresh.get_content('u') is None
+
+    loaded = DocReconstructor()
+    loaded.load_snapshots([{**delta, 'format': 'snapshot', 'content': NEW}])
+    assert loaded.apply(snapshot) == NEW
+    assert loaded.apply(delta) == NEW
+
+    assert loaded.apply({'url': 'u', 'change_type': 'deleted', 'content': None}) is None
+    assert loaded.get_content('u') is None
@@ -0,0 +1,82 @@
+import pytest
+
+from serializers import BinarySerializer, JSONSerializer, SchemaRegistry, create_serializer
+
+DOC = {
+    'url': 'https://kafka.apache.org/documentation/',
+    'title': 'Kafka — Documentation',
+    'timestamp': '2024-01-01T00:00:00',
+    'content_hash': 'abc123',
+    'change_type': 'changed',
+    'format': 'delta',
+    'version': 12,
+    'base_version': 11,
+    'metadata': {'sourceURL': 'https://kafka.apache.org/documentation/'},
+    'delta': [['=', 3], ['+', ['New line\n']]],
+    'content': 'Apache Kafka is an event streaming platform.\n' * 40,
+    'priority': 'high'
+}
+
+def codecs():
+    yield None
+    yield 'zlib'
+    try:
+        import zstandard  # noqa: F401
+        yield 'zstd'
+    except ImportError:
+        pass
+
+def test_json_round_trip():
+    """Test the JSON serializer returns the original message"""
+    serializer = JSONSerializer()
+    assert serializer.deserialize(serializer.serialize(DOC)) == DOC
+
+@pytest.mark.parametrize('compression', list(codecs()))
+def test_binary_round_trip(compression):
+    """Test binary messages decode to the original, extra fields included"""
+    serializer = BinarySerializer(compression=compression, compress_min_bytes=64)
+    data = serializer.serialize(DOC)
+
+    assert serializer.deserialize(data) == DOC
+    if compression:
+        assert len(data) < len(JSONSerializer().serialize(DOC))
+
+def test_binary_nulls_and_negative_numbers():
+    """Test missing fields decode as None and longs keep their sign"""
+    serializer = BinarySerializer()
+    doc = serializer.deserialize(serializer.serialize({'url': 'u', 'version': -3, 'content': None}))
+
+    assert doc['url'] == 'u'
+    assert doc['version'] == -3
+    assert doc['content'] is None
+    assert doc['base_version'] is None
+
+def test_binary_header_only():
+    """Test the header decodes without the body fields"""
+    serializer = BinarySerializer()
+    header = serializer.deserialize_header(serializer.serialize(DOC))
+
+    assert header['url'] == DOC['url']
+    assert header['version'] == 12
+    assert 'content' not in header
+
+def test_registry_reads_older_schemas(tmp_path):
+    """Test a message written with an older schema decodes after the schema changes"""
+    path = str(tmp_path / 'schemas.json')
+    writer = BinarySerializer(SchemaRegistry(path))
+    old_schema = {
+        'name': 'DocUpdate',
+        'header': [['url', 'string'], ['version', 'long']],
+        'body': [['extra', 'json'], ['content', 'text']],
+    }
+    writer.schema_id = writer.registry.register(old_schema)
+    writer.schema = old_schema
+    data = writer.serialize({'url': 'u', 'version': 2, 'content': 'old'})
+
+    reader = create_serializer({'kafka': {'serializer': {'format': 'binary', 'schema_registry': path}}})
+    assert reader.deserialize(data) == {'url': 'u', 'version': 2, 'content': 'old'}
+
+def test_unknown_compression_rejected():
+    """Test an unsupported content codec fails up front"""
+    with pytest.raises(ValueError):
+        BinarySerializer(compression='lzma')
@@ -0,0 +1,68 @@
+from hash_store import ContentHashStore
+from payloads import encode_change
+from sharding import HashRing, LeaseFileMembership
+
+KEYS = [f'https://kafka.apache.org/documentation/page-{i}' for i in range(6000)]
+
+def owners(ring):
+    return {key: ring.owner(key) for key in KEYS}
+
+def test_ring_join_moves_about_one_nth():
+    """Test a joining replica takes about 1/n of the keys, all from the others"""
+    before = owners(HashRing(['replica-0', 'replica-1', 'replica-2']))
+    after = owners(HashRing(['replica-0', 'replica-1', 'replica-2', 'replica-3']))
+
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+    assert all(after[key] == 'replica-3' for key in moved)
+
+def test_ring_leave_moves_only_the_leavers_keys():
+    """Test only keys of the replica that left change owner"""
+    before = owners(HashRing(['replica-0', 'replica-1', 'replica-2', 'replica-3']))
+    after = owners(HashRing(['replica-1', 'replica-2', 'replica-3']))
+
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert set(moved) == {key for key in KEYS if before[key] == 'replica-0'}
+    assert 0.15 < len(moved) / len(KEYS) < 0.35
+
+def test_ring_is_balanced_and_stable():
+    """Test every replica owns a fair share and key order does not matter"""
+    ring = HashRing(['replica-2', 'replica-0', 'replica-1'])
+    counts = {}
+    for owner in owners(ring).values():
+        counts[owner] = counts.get(owner, 0) + 1
+
+    assert owners(HashRing(['replica-0', 'replica-1', 'replica-2'])) == owners(ring)
+    assert all(0.2 < count / len(KEYS) < 0.45 for count in counts.values())
+    assert HashRing([]).owner(KEYS[0]) is None
+
+def test_lease_file_membership(tmp_path):
+    """Test leases make replicas members until they are released"""
+    first = LeaseFileMembership(str(tmp_path), 'replica-0')
+    second = LeaseFileMembership(str(tmp_path), 'replica-1')
+    first.heartbeat()
+    second.heartbeat()
+
+    assert first.members() == {'replica-0', 'replica-1'}
+    second.release()
+    assert first.members() == {'replica-0'}
+
+def test_shared_pages_seed_the_new_owner(tmp_path):
+    """Test a page taken over from another replica is not published again as new"""
+    previous_owner = LeaseFileMembership(str(tmp_path), 'replica-0')
+    new_owner = LeaseFileMembership(str(tmp_path), 'replica-1')
+    doc = {'url': 'https://kafka.apache.org/documentation/', 'title': 'Docs', 'content': 'Kafka'}
+    changes, _ = ContentHashStore(':memory:').diff([doc])
+    previous_owner.share_pages({doc['url']: {'content_hash': changes[0]['content_hash'], 'version': 4}})
+
+    store = ContentHashStore(':memory:')
+    store.adopt(new_owner.shared_pages([doc['url'], 'https://kafka.apache.org/other']))
+
+    assert store.diff([doc]) == ([], [])
+    changes, _ = store.diff([{**doc, 'content': 'Kafka 4'}])
+    assert changes[0]['change_type'] == 'changed'
+    message, _ = encode_change(changes[0], store.published_content(doc['url']))
+    assert (message['format'], message['version']) == ('snapshot', 5)
+
+    previous_owner.share_pages({}, [doc['url']])
+    assert new_owner.shared_pages([doc['url']]) == {}
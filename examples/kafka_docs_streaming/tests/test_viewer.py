@@ -0,0 +1,80 @@
+import pytest
+
+pytest.importorskip('tkinter')
+
+from viewer import DocsViewModel
+
+def message(url, timestamp='2024-01-01T00:00:00', title=None, change_type='changed'):
+    return {'url': url, 'title': title or url, 'timestamp': timestamp, 'change_type': change_type}
+
+def test_updates_coalesce_per_url():
+    """Test a page updated several times in one batch gives one upsert with its latest row"""
+    model = DocsViewModel()
+    upserts, removed = model.apply([
+        message('a', title='A1'),
+        message('b'),
+        message('a', '2024-01-01T00:05:00', title='A2'),
+    ])
+
+    assert list(upserts) == ['b', 'a']
+    assert upserts['a'] == ('A2', 'a', '2024-01-01 00:05:00')
+    assert removed == set()
+    assert list(model.rows) == ['b', 'a']
+
+def test_deletions_remove_rows():
+    """Test a deletion drops a known row and cancels an upsert of the same batch"""
+    model = DocsViewModel()
+    model.apply([message('a'), message('b')])
+
+    upserts, removed = model.apply([
+        message('c'),
+        message('a', change_type='deleted'),
+        message('c', change_type='deleted'),
+        message('unknown', change_type='deleted'),
+    ])
+
+    # Rows added earlier in the batch are listed too; the view skips rows it never showed
+    assert upserts == {}
+    assert removed == {'a', 'c'}
+    assert list(model.rows) == ['b']
+
+def test_deleted_then_updated_row_comes_back():
+    """Test an update after a deletion in the same batch keeps the row"""
+    model = DocsViewModel()
+    model.apply([message('a')])
+
+    upserts, removed = model.apply([message('a', change_type='deleted'), message('a')])
+
+    assert list(upserts) == ['a']
+    assert removed == set()
+
+def test_eviction_drops_least_recently_updated():
+    """Test rows beyond max_rows are evicted oldest update first"""
+    model = DocsViewModel(max_rows=3)
+    model.apply([message(url) for url in 'abc'])
+
+    upserts, removed = model.apply([message('a'), message('d'), message('e')])
+
+    assert list(model.rows) == ['a', 'd', 'e']
+    assert removed == {'b', 'c'}
+    assert list(upserts) == ['a', 'd', 'e']
+
+    upserts, removed = model.apply([message(url) for url in 'fghi'])
+    assert list(model.rows) == ['g', 'h', 'i']
+    assert list(upserts) == ['g', 'h', 'i']
+    assert removed == {'a', 'd', 'e', 'f'}
+
+def test_bad_message_skipped_without_losing_the_batch():
+    """Test a message with a bad timestamp is skipped and the rest still apply"""
+    model = DocsViewModel()
+
+    upserts, removed = model.apply([
+        message('a'),
+        message('bad', timestamp='yesterday'),
+        {'title': 'no url', 'timestamp': '2024-01-01T00:00:00'},
+        message('b'),
+    ])
+
+    assert list(upserts) == ['a', 'b']
+    assert list(model.rows) == ['a', 'b']
+    assert len(model) == 2
@@ -1,13 +1,19 @@
 import os
-import yaml
 import json
 from kafka import KafkaConsumer
 import logging
+import queue
+import threading
 import tkinter as tk
+from collections import OrderedDict
 from tkinter import ttk
 import webbrowser
 from datetime import datetime
 
+from payloads import DocReconstructor, read_snapshot_topic
+from serializers import create_serializer
+from settings import load_config
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -15,21 +21,102 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class DocsViewModel:
+    """
+    One row per URL, most recently updated first, for the documentation list
+
+    At most max_rows URLs are kept; the least recently updated rows are
+    dropped first. apply() coalesces a batch of messages into the row
+    changes the view has to make.
+    """
+
+    def __init__(self, max_rows=5000):
+        self.max_rows = max_rows
+        self.rows = OrderedDict()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def apply(self, messages):
+        """
+        Update rows from a batch of messages
+
+        A message that cannot be read, e.g. with a bad timestamp, is
+        logged and skipped without affecting the others.
+
+        Returns:
+            (upserts, removed) where upserts maps each URL to insert or
+            update to its row values, oldest update first, and removed lists
+            the URLs whose rows must be deleted
+        """
+        upserts = OrderedDict()
+        removed = set()
+        for message in messages:
+            try:
+                url = message['url']
+                if message.get('change_type') != 'deleted':
+                    timestamp = datetime.fromisoformat(message['timestamp'])
+                    row = (message.get('title', 'No title'), url, timestamp.strftime('%Y-%m-%d %H:%M:%S'))
+            except Exception as e:
+                # Skip only the bad message; the rest of the batch still applies
+                logger.error(f"Error updating GUI: {str(e)}")
+                continue
+
+            if message.get('change_type') == 'deleted':
+                upserts.pop(url, None)
+                if self.rows.pop(url, None) is not None:
+                    removed.add(url)
+                continue
+
+            self.rows[url] = row
+            self.rows.move_to_end(url)
+            upserts[url] = row
+            upserts.move_to_end(url)
+            removed.discard(url)
+
+        while len(self.rows) > self.max_rows:
+            url, _ = self.rows.popitem(last=False)
+            upserts.pop(url, None)
+            removed.add(url)
+        return upserts, removed
+
 class DocsViewer:
-    def __init__(self):
+    def __init__(self, config_path=None, consumer=None):
         # Load configuration
-        with open('config.yaml', 'r') as f:
-            self.config = yaml.safe_load(f)
+        self.config = load_config(config_path)
         
+        # Decode full messages only when page content is needed; otherwise
+        # just the header fields (url, title, timestamp, hash, change type)
+        self.serializer = create_serializer(self.config)
+        self.settings = self.config.get('viewer', {})
+        self.reconstruct_content = self.settings.get('reconstruct_content', True)
+
         # Initialize Kafka consumer
-        self.consumer = KafkaConsumer(
+        self.consumer = consumer or KafkaConsumer(
             self.config['kafka']['topic'],
             bootstrap_servers=self.config['kafka']['bootstrap_servers'],
-            value_deserializer=lambda x: json.loads(x.decode('utf-8')),
+            value_deserializer=self.decode,
             auto_offset_reset='latest',
             enable_auto_commit=True,
             group_id='docs_viewer_group'
         )
+
+        # Full page content rebuilt from snapshot and delta messages
+        self.reconstructor = DocReconstructor()
+        payload = self.config['kafka'].get('payload', {})
+        if self.reconstruct_content and payload.get('format') == 'delta' and payload.get('snapshot_topic'):
+            self.reconstructor.load_snapshots(read_snapshot_topic(
+                self.config['kafka']['bootstrap_servers'],
+                payload['snapshot_topic'],
+                deserialize=self.serializer.deserialize
+            ))
+
+        # Messages are consumed on a background thread and handed to the Tk
+        # loop through a bounded queue, so a busy UI slows down consumption
+        # instead of buffering without limit
+        self.messages = queue.Queue(maxsize=self.settings.get('queue_size', 10000))
+        self.stopped = threading.Event()
+        self.model = DocsViewModel(self.settings.get('max_rows', 5000))
         
         # Setup GUI
         self.setup_gui()
@@ -59,6 +146,10 @@ class DocsViewer:
         # Bind double-click event
         self.tree.bind('<Double-1>', self.open_url)
 
+        # Row count and queue backlog
+        self.status = ttk.Label(main_frame, text="Waiting for updates...")
+        self.status.grid(row=1, column=0, sticky=tk.W)
+
         # Configure grid weights
         main_frame.columnconfigure(0, weight=1)
         main_frame.rowconfigure(0, weight=1)
@@ -67,52 +158,107 @@ class DocsViewer:
 
     def open_url(self, event):
         """Open URL in default browser when item is double-clicked"""
-        selected_item = self.tree.selection()[0]
-        url = self.tree.item(selected_item)['values'][1]
+        # Rows are identified by their URL
+        url = self.tree.selection()[0]
         webbrowser.open(url)
 
-    def update_gui(self, message):
-        """Update GUI with new documentation"""
+    def decode(self, data):
+        """Decode a message value, skipping the body unless content is reconstructed"""
+        if data is None:
+            return None
+        if self.reconstruct_content:
+            return self.serializer.deserialize(data)
+        return self.serializer.deserialize_header(data)
+
+    def get_content(self, url):
+        """Full current content of a page, rebuilt from snapshots and deltas (needs reconstruct_content)"""
+        return self.reconstructor.get_content(url)
+
+    def consume(self):
+        """Poll Kafka on a background thread and queue messages for the GUI"""
         try:
-            # Format timestamp
-            timestamp = datetime.fromisoformat(message['timestamp'])
-            formatted_time = timestamp.strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Insert new item
-            self.tree.insert(
-                '',
-                'end',
-                values=(
-                    message.get('title', 'No title'),
-                    message['url'],
-                    formatted_time
-                )
-            )
-        except Exception as e:
-            logger.error(f"Error updating GUI: {str(e)}")
+            while not self.stopped.is_set():
+                try:
+                    records = self.consumer.poll(timeout_ms=500)
+                except Exception as e:
+                    logger.error(f"Error checking messages: {str(e)}")
+                    continue
+                for message in (record.value for partition in records.values() for record in partition):
+                    if message is None:
+                        continue
+                    if self.reconstruct_content:
+                        try:
+                            self.reconstructor.apply(message)
+                        except Exception as e:
+                            logger.error(f"Error reconstructing content: {str(e)}")
+                    while not self.stopped.is_set():
+                        try:
+                            self.messages.put(message, timeout=0.5)
+                            break
+                        except queue.Full:
+                            pass
+        finally:
+            self.consumer.close()
+
+    def drain(self, limit):
+        """Up to limit queued messages, without blocking"""
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def update_gui(self, messages):
+        """Apply a batch of messages to the documentation list in one pass"""
+        upserts, removed = self.model.apply(messages)
+        existing = [url for url in removed if self.tree.exists(url)]
+        if existing:
+            self.tree.delete(*existing)
+        # Oldest first, so the latest update ends up at the top
+        for url, values in upserts.items():
+            if self.tree.exists(url):
+                self.tree.item(url, values=values)
+                self.tree.move(url, '', 0)
+            else:
+                self.tree.insert('', 0, iid=url, values=values)
 
     def run(self):
         """Main viewer loop"""
         logger.info("Starting documentation viewer...")
-        
+        refresh_ms = self.settings.get('refresh_ms', 250)
+        max_batch = self.settings.get('max_batch', 2000)
+
         def check_messages():
-            """Check for new Kafka messages"""
-            try:
-                # Non-blocking check for messages
-                for message in self.consumer.poll(timeout_ms=100).values():
-                    for record in message:
-                        self.update_gui(record.value)
-            except Exception as e:
-                logger.error(f"Error checking messages: {str(e)}")
+            """Apply the messages queued since the last tick"""
+            batch = self.drain(max_batch)
+            if batch:
+                self.update_gui(batch)
+                self.status.configure(
+                    text=f"{len(self.model)} pages, {self.messages.qsize()} updates waiting"
+                )
             
             # Schedule next check
-            self.root.after(1000, check_messages)
+            self.root.after(refresh_ms, check_messages)
+
+        def close():
+            self.stopped.set()
+            self.root.destroy()
+
+        consumer_thread = threading.Thread(target=self.consume, daemon=True)
+        consumer_thread.start()
+        self.root.protocol('WM_DELETE_WINDOW', close)
 
         # Start checking messages
         check_messages()
         
         # Start GUI main loop
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.stopped.set()
+            consumer_thread.join(timeout=5)
 
 if __name__ == "__main__":
     viewer = DocsViewer()